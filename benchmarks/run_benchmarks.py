@@ -0,0 +1,360 @@
+#!/usr/bin/env python
+"""End to end benchmarks for pixETL.
+
+Generates synthetic source tiles and a tiles.geojson catalog in a local
+S3 stand-in, runs pixetl() for a set of scenarios and records wall time,
+pixels per second, peak RSS and bytes written for each stage of the
+pipe, as measured in the run report returned by pixetl().
+
+Results are written as JSON, stage metrics use the fields of the run
+report. Save them as baseline once, and compare later runs against it
+to catch regressions:
+
+    python benchmarks/run_benchmarks.py --save-baseline
+    python benchmarks/run_benchmarks.py --compare
+
+Unless AWS_ENDPOINT_URL is set, an in-process moto server is started.
+"""
+
+import json
+import os
+import platform
+import shutil
+import socket
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import click
+import numpy as np
+import psutil
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE = os.path.join(BENCHMARK_DIR, "baseline.json")
+RESULTS = os.path.join(BENCHMARK_DIR, "results.json")
+
+SRC_BUCKET = "gfw-pixetl-benchmark"
+
+# Source tiles cover 10E - 12E, 8N - 10N
+SRC_EXTENT = (10, 8, 12, 10)
+SRC_TILE_DEGREES = 1
+SRC_TILE_PIXELS = 1000
+
+SCENARIOS: List[Dict[str, Any]] = [
+    {
+        "name": "uint8_dense_latlng",
+        "data_type": "uint8",
+        "no_data": 0,
+        "nodata_density": 0.0,
+        "src_crs": "EPSG:4326",
+        "grid": "1/4000",
+        "subset": ["10N_010E", "10N_011E"],
+    },
+    {
+        "name": "int16_sparse_latlng",
+        "data_type": "int16",
+        "no_data": -1,
+        "nodata_density": 0.8,
+        "src_crs": "EPSG:4326",
+        "grid": "1/4000",
+        "subset": ["10N_010E", "10N_011E"],
+    },
+    {
+        "name": "float32_utm_latlng",
+        "data_type": "float32",
+        "no_data": -9999,
+        "nodata_density": 0.3,
+        "src_crs": "EPSG:32633",
+        "grid": "1/4000",
+        "subset": ["10N_010E"],
+    },
+    {
+        "name": "uint8_dense_webmercator",
+        "data_type": "uint8",
+        "no_data": 0,
+        "nodata_density": 0.0,
+        "src_crs": "EPSG:4326",
+        "grid": "zoom_5",
+        "subset": None,
+    },
+]
+
+
+def setup_environment() -> Optional[Any]:
+    """Point AWS clients and GDAL to a local S3 stand-in.
+
+    Must run before any gfw_pixetl module is imported, since settings
+    are read from environment on import.
+    """
+    server = None
+    if not os.environ.get("AWS_ENDPOINT_URL"):
+        from moto.server import ThreadedMotoServer
+
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            port = s.getsockname()[1]
+        server = ThreadedMotoServer(ip_address="127.0.0.1", port=port)
+        server.start()
+        os.environ["AWS_ENDPOINT_URL"] = f"http://127.0.0.1:{port}"
+
+    for key, value in {
+        "ENV": "test",
+        "AWS_ACCESS_KEY_ID": "testing",
+        "AWS_SECRET_ACCESS_KEY": "testing",  # pragma: allowlist secret
+        "AWS_HTTPS": "NO",
+        "AWS_VIRTUAL_HOSTING": "FALSE",
+        "GDAL_DISABLE_READDIR_ON_OPEN": "YES",
+    }.items():
+        os.environ.setdefault(key, value)
+
+    return server
+
+
+def create_sources(scenario: Dict[str, Any], work_dir: str) -> str:
+    """Write synthetic source tiles and tiles.geojson to S3, returns URI of
+    catalog."""
+    import rasterio
+    from rasterio.transform import from_bounds
+    from rasterio.warp import transform_bounds
+    from shapely.geometry import box, mapping
+
+    from gfw_pixetl.utils.aws import get_s3_client
+
+    s3_client = get_s3_client()
+    name = scenario["name"]
+    dtype = np.dtype(scenario["data_type"])
+    rng = np.random.default_rng(seed=0)
+
+    features = list()
+    left, bottom, right, top = SRC_EXTENT
+    for x in range(left, right, SRC_TILE_DEGREES):
+        for y in range(bottom, top, SRC_TILE_DEGREES):
+            bounds = (x, y, x + SRC_TILE_DEGREES, y + SRC_TILE_DEGREES)
+            src_bounds = transform_bounds("EPSG:4326", scenario["src_crs"], *bounds)
+
+            if np.issubdtype(dtype, np.integer):
+                info = np.iinfo(dtype)
+                data = rng.integers(
+                    max(info.min, 0), min(info.max, 1000), (SRC_TILE_PIXELS,) * 2
+                )
+            else:
+                data = rng.random((SRC_TILE_PIXELS,) * 2) * 1000
+            data = data.astype(dtype)
+            data[rng.random(data.shape) < scenario["nodata_density"]] = scenario[
+                "no_data"
+            ]
+
+            file_name = f"{x}_{y}.tif"
+            local_file = os.path.join(work_dir, file_name)
+            with rasterio.open(
+                local_file,
+                "w",
+                driver="GTiff",
+                width=SRC_TILE_PIXELS,
+                height=SRC_TILE_PIXELS,
+                count=1,
+                dtype=dtype.name,
+                crs=scenario["src_crs"],
+                transform=from_bounds(*src_bounds, SRC_TILE_PIXELS, SRC_TILE_PIXELS),
+                nodata=scenario["no_data"],
+                tiled=True,
+                compress="DEFLATE",
+            ) as dst:
+                dst.write(data, 1)
+
+            key = f"{name}/{file_name}"
+            s3_client.upload_file(local_file, SRC_BUCKET, key)
+            features.append(
+                {
+                    "type": "Feature",
+                    "geometry": mapping(box(*bounds)),
+                    "properties": {"name": f"/vsis3/{SRC_BUCKET}/{key}"},
+                }
+            )
+
+    catalog_key = f"{name}/tiles.geojson"
+    s3_client.put_object(
+        Bucket=SRC_BUCKET,
+        Key=catalog_key,
+        Body=json.dumps({"type": "FeatureCollection", "features": features}),
+    )
+    return f"s3://{SRC_BUCKET}/{catalog_key}"
+
+
+def run_scenario(scenario: Dict[str, Any], work_dir: str) -> Dict[str, Any]:
+    from gfw_pixetl.models.pydantic import LayerModel
+    from gfw_pixetl.pixetl import pixetl
+
+    source_uri = create_sources(scenario, work_dir)
+    layer_def = LayerModel.parse_obj(
+        {
+            "dataset": f"benchmark_{scenario['name']}",
+            "version": "v1",
+            "pixel_meaning": "value",
+            "data_type": scenario["data_type"],
+            "no_data": scenario["no_data"],
+            "grid": scenario["grid"],
+            "source_type": "raster",
+            "source_uri": source_uri,
+            "resampling": "nearest",
+            "compute_stats": True,
+        }
+    )
+
+    start = time.monotonic()
+    tiles, skipped_tiles, failed_tiles, report = pixetl(
+        layer_def, subset=scenario["subset"], overwrite=True
+    )
+    wall_time = time.monotonic() - start
+
+    if failed_tiles:
+        raise RuntimeError(f"Scenario {scenario['name']} failed: {failed_tiles}")
+
+    pixels = sum(
+        tile.dst[tile.default_format].profile["width"]
+        * tile.dst[tile.default_format].profile["height"]
+        for tile in tiles
+    )
+    pixels_per_tile = pixels / len(tiles) if tiles else 0
+
+    # Same stages and numbers pixetl reports in report.json
+    stages: Dict[str, Dict[str, Any]] = dict()
+    for name, metrics in report.stages.items():
+        stages[name] = {
+            **metrics.dict(),
+            "pixels_per_second": round(
+                metrics.tiles * pixels_per_tile / metrics.wall_time, 1
+            )
+            if metrics.tiles and metrics.wall_time
+            else None,
+        }
+
+    return {
+        "grid": scenario["grid"],
+        "data_type": scenario["data_type"],
+        "src_crs": scenario["src_crs"],
+        "nodata_density": scenario["nodata_density"],
+        "tiles": len(tiles),
+        "skipped_tiles": len(skipped_tiles),
+        "pixels": pixels,
+        "wall_time": round(wall_time, 3),
+        "pixels_per_second": round(pixels / wall_time, 1) if wall_time else None,
+        "stages": stages,
+    }
+
+
+def compare(
+    results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float
+) -> List[str]:
+    """List scenarios which are slower than baseline by more than
+    tolerance."""
+    regressions: List[str] = list()
+    for name, result in results["scenarios"].items():
+        base = baseline["scenarios"].get(name)
+        if base is None:
+            continue
+        if result["wall_time"] > base["wall_time"] * (1 + tolerance):
+            regressions.append(
+                f"{name}: wall time {result['wall_time']}s, "
+                f"baseline {base['wall_time']}s"
+            )
+        for stage, stats in result["stages"].items():
+            base_stats = base["stages"].get(stage)
+            if base_stats and stats["wall_time"] > base_stats["wall_time"] * (
+                1 + tolerance
+            ):
+                regressions.append(
+                    f"{name}: stage {stage} took {stats['wall_time']:.3f}s, "
+                    f"baseline {base_stats['wall_time']:.3f}s"
+                )
+    return regressions
+
+
+@click.command()
+@click.option(
+    "--scenario",
+    "names",
+    type=click.Choice([s["name"] for s in SCENARIOS]),
+    multiple=True,
+    help="Only run given scenarios",
+)
+@click.option("--output", default=RESULTS, help="Write results to this file")
+@click.option(
+    "--save-baseline", is_flag=True, default=False, help="Save results as baseline"
+)
+@click.option(
+    "--compare",
+    "compare_baseline",
+    is_flag=True,
+    default=False,
+    help="Compare results with baseline and fail on regressions",
+)
+@click.option(
+    "--tolerance",
+    type=float,
+    default=0.2,
+    help="Allowed slow down compared to baseline",
+)
+def cli(
+    names: List[str],
+    output: str,
+    save_baseline: bool,
+    compare_baseline: bool,
+    tolerance: float,
+) -> None:
+    """Run pixETL benchmarks."""
+    server = setup_environment()
+
+    from gfw_pixetl.utils import get_bucket
+    from gfw_pixetl.utils.aws import get_s3_client
+
+    s3_client = get_s3_client()
+    for bucket in [SRC_BUCKET, get_bucket()]:
+        try:
+            s3_client.create_bucket(Bucket=bucket)
+        except s3_client.exceptions.BucketAlreadyOwnedByYou:
+            pass
+
+    results: Dict[str, Any] = {
+        "created": datetime.utcnow().isoformat(),
+        "host": {
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "memory": psutil.virtual_memory().total,
+        },
+        "scenarios": dict(),
+    }
+
+    work_dir = tempfile.mkdtemp(prefix="pixetl_benchmark_")
+    try:
+        for scenario in SCENARIOS:
+            if names and scenario["name"] not in names:
+                continue
+            click.echo(f"Run scenario {scenario['name']}")
+            results["scenarios"][scenario["name"]] = run_scenario(scenario, work_dir)
+    finally:
+        shutil.rmtree(work_dir)
+        if server is not None:
+            server.stop()
+
+    for path in [output] + ([BASELINE] if save_baseline else []):
+        with open(path, "w") as f:
+            json.dump(results, f, indent=2)
+        click.echo(f"Wrote results to {path}")
+
+    if compare_baseline:
+        with open(BASELINE) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, tolerance)
+        for regression in regressions:
+            click.echo(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+        click.echo("No regressions compared to baseline")
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,274 @@
+import ast
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+from numpy.ma import MaskedArray
+
+from gfw_pixetl import get_module_logger
+
+LOGGER = get_module_logger(__name__)
+
+Array = Union[np.ndarray, MaskedArray]
+
+# Target size of the input slice evaluated at once.
+# All temporary arrays of an expression are bound by this size.
+CHUNK_BYTES = 16 * 1024 * 1024
+
+ALLOWED_NAMES = ("A", "np")
+
+ALLOWED_NODES = (
+    ast.Expression,
+    ast.BinOp,
+    ast.UnaryOp,
+    ast.Compare,
+    ast.Call,
+    ast.keyword,
+    ast.Attribute,
+    ast.Name,
+    ast.Constant,
+    ast.Tuple,
+    ast.List,
+    ast.Subscript,
+    ast.Slice,
+    ast.Load,
+    ast.operator,
+    ast.unaryop,
+    ast.cmpop,
+)
+
+# Numpy functions which are not ufuncs but still operate element by element
+ELEMENTWISE_FUNCTIONS = {
+    "np.where",
+    "np.select",
+    "np.clip",
+    "np.around",
+    "np.round",
+    "np.nan_to_num",
+    "np.isclose",
+    "np.ma.where",
+    "np.ma.clip",
+    "np.ma.filled",
+    "np.ma.masked_where",
+    "np.ma.masked_equal",
+    "np.ma.masked_not_equal",
+    "np.ma.masked_greater",
+    "np.ma.masked_greater_equal",
+    "np.ma.masked_less",
+    "np.ma.masked_less_equal",
+    "np.ma.masked_inside",
+    "np.ma.masked_outside",
+    "np.ma.masked_values",
+    "np.ma.masked_invalid",
+}
+
+# Array methods which operate element by element
+ELEMENTWISE_METHODS = {"astype", "clip", "round", "filled"}
+
+UFUNCS = (np.ufunc, getattr(np.ma.core, "_MaskedUFunc", np.ufunc))
+
+
+class CalcExpression(object):
+    """User defined calculation, parsed and validated once.
+
+    Expressions may only reference the input array `A` and numpy `np`.
+    Element wise expressions are evaluated in chunks of rows and written
+    into a preallocated output array, which limits temporary arrays
+    to the size of a chunk. All other expressions are evaluated on the
+    full array at once.
+    """
+
+    def __init__(self, expression: str) -> None:
+        self.expression: str = expression
+
+        try:
+            tree = ast.parse(expression.strip(), mode="eval")
+        except SyntaxError as e:
+            raise ValueError(f"Invalid calc expression `{expression}`: {e}")
+
+        _Validator(expression).visit(tree)
+
+        self.elementwise: bool = _is_elementwise(tree.body)
+        self.temporaries: int = _temporaries(tree.body)[0]
+        self._code = compile(tree, "<calc>", "eval")
+
+        LOGGER.debug(
+            f"Compiled calc expression `{expression}`: elementwise={self.elementwise}, "
+            f"temporaries={self.temporaries}"
+        )
+
+    @property
+    def memory_factor(self) -> int:
+        """Number of arrays, sized like the input, which are allocated while
+        evaluating the expression.
+
+        Element wise expressions only hold the output buffer, while
+        other expressions hold all their temporary arrays at once.
+        """
+        return 1 if self.elementwise else max(self.temporaries, 1)
+
+    def evaluate(self, array: Array) -> Array:
+        """Apply expression to array."""
+        if not self.elementwise or array.ndim < 2:
+            return self._eval(array)
+
+        rows: int = array.shape[-2]
+        row_bytes: int = max(array[..., :1, :].nbytes, 1)
+        chunk_rows: int = max(CHUNK_BYTES // row_bytes, 1)
+
+        if chunk_rows >= rows:
+            return self._eval(array)
+
+        out: Optional[Array] = None
+        for row in range(0, rows, chunk_rows):
+            rows_slice = (Ellipsis, slice(row, row + chunk_rows), slice(None))
+            chunk = array[rows_slice]
+            result = self._eval(chunk)
+
+            if np.shape(result) != chunk.shape:
+                LOGGER.debug(
+                    f"Calc expression `{self.expression}` changes shape of input. "
+                    "Evaluate full array instead."
+                )
+                return self._eval(array)
+
+            if out is None:
+                out = _empty_like(result, array.shape)
+
+            if isinstance(out, MaskedArray):
+                out.data[rows_slice] = np.ma.getdata(result)
+                out.mask[rows_slice] = np.ma.getmaskarray(result)
+            else:
+                out[rows_slice] = result
+
+        return out
+
+    def _eval(self, array: Array) -> Any:
+        namespace: Dict[str, Any] = {"__builtins__": {}, "np": np, "A": array}
+        return eval(self._code, namespace)
+
+
+@lru_cache(maxsize=32)
+def get_calc_expression(expression: str) -> CalcExpression:
+    """Parse and compile calc expression once per process."""
+    return CalcExpression(expression)
+
+
+def _empty_like(result: Array, shape: Tuple[int, ...]) -> Array:
+    data = np.empty(shape, dtype=np.result_type(result))
+    if isinstance(result, MaskedArray):
+        out = np.ma.MaskedArray(data, mask=np.zeros(shape, dtype=bool))
+        out.fill_value = result.fill_value
+        return out
+    return data
+
+
+class _Validator(ast.NodeVisitor):
+    def __init__(self, expression: str) -> None:
+        self.expression = expression
+
+    def generic_visit(self, node: ast.AST) -> None:
+        if not isinstance(node, ALLOWED_NODES):
+            self._fail(f"{type(node).__name__} is not allowed")
+        super().generic_visit(node)
+
+    def visit_Name(self, node: ast.Name) -> None:
+        if node.id not in ALLOWED_NAMES:
+            self._fail(f"unknown name `{node.id}`, use `A` to refer to the tile")
+
+    def visit_Attribute(self, node: ast.Attribute) -> None:
+        if node.attr.startswith("_"):
+            self._fail(f"private attribute `{node.attr}` is not allowed")
+        self.generic_visit(node)
+
+    def _fail(self, reason: str) -> None:
+        raise ValueError(f"Invalid calc expression `{self.expression}`: {reason}")
+
+
+def _dotted_name(node: ast.AST) -> Optional[str]:
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        value = _dotted_name(node.value)
+        return f"{value}.{node.attr}" if value else None
+    return None
+
+
+def _is_numpy(node: ast.AST) -> bool:
+    return (_dotted_name(node) or "").startswith("np.")
+
+
+def _operands(node: ast.Call) -> List[ast.AST]:
+    operands: List[ast.AST] = list(node.args) + [k.value for k in node.keywords]
+    if isinstance(node.func, ast.Attribute) and not _is_numpy(node.func):
+        # method call, the object is an operand as well
+        operands.insert(0, node.func.value)
+    return operands
+
+
+def _is_elementwise_call(node: ast.Call) -> bool:
+    if _is_numpy(node.func):
+        name = str(_dotted_name(node.func))
+        func: Any = np
+        for attr in name.split(".")[1:]:
+            func = getattr(func, attr, None)
+        return isinstance(func, UFUNCS) or name in ELEMENTWISE_FUNCTIONS
+
+    # method call on an array, ie A.astype(...)
+    return (
+        isinstance(node.func, ast.Attribute) and node.func.attr in ELEMENTWISE_METHODS
+    )
+
+
+def _is_elementwise(node: ast.AST) -> bool:
+    """Check if result at each position only depends on input at the same
+    position."""
+    if isinstance(node, ast.Subscript):
+        return False
+    if isinstance(node, ast.Attribute):
+        return _is_numpy(node)
+    if isinstance(node, ast.Call):
+        return _is_elementwise_call(node) and all(
+            _is_elementwise(operand) for operand in _operands(node)
+        )
+    return all(_is_elementwise(child) for child in ast.iter_child_nodes(node))
+
+
+def _temporaries(node: ast.AST) -> Tuple[int, bool, bool]:
+    """Sethi-Ullman style count of how many temporary arrays are alive at
+    the same time when evaluating node with plain numpy.
+
+    Returns peak number of temporaries, whether node evaluates to an
+    array and whether this array is a new temporary (and not the input
+    itself).
+    """
+    if isinstance(node, ast.Name):
+        return 0, node.id == "A", False
+    if isinstance(node, ast.Constant) or _is_numpy(node):
+        return 0, False, False
+
+    if isinstance(node, ast.Call):
+        operands = _operands(node)
+    else:
+        operands = [
+            child
+            for child in ast.iter_child_nodes(node)
+            if not isinstance(child, (ast.operator, ast.unaryop, ast.cmpop, ast.Load))
+        ]
+
+    peak: int = 0
+    held: int = 0
+    is_array: bool = False
+    for operand in operands:
+        operand_peak, operand_is_array, operand_is_temporary = _temporaries(operand)
+        peak = max(peak, held + operand_peak)
+        held += int(operand_is_temporary)
+        is_array = is_array or operand_is_array
+
+    if isinstance(node, (ast.Tuple, ast.List)):
+        return peak, is_array, held > 0
+
+    # result is allocated while operands are still alive
+    if is_array:
+        peak = max(peak, held + 1)
+    return peak, is_array, is_array
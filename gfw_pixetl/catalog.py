@@ -0,0 +1,102 @@
+import json
+from functools import lru_cache
+from numbers import Integral
+from typing import Dict, List, Sequence, Tuple, Union
+from urllib.parse import urlparse
+
+from shapely.geometry import MultiPolygon, Polygon, shape
+from shapely.geometry.base import BaseGeometry
+from shapely.ops import unary_union
+from shapely.prepared import PreparedGeometry, prep
+from shapely.strtree import STRtree
+
+from gfw_pixetl import get_module_logger
+from gfw_pixetl.decorators import lazy_property
+from gfw_pixetl.utils.aws import get_s3_client
+
+LOGGER = get_module_logger(__name__)
+
+InputFile = Tuple[Polygon, str]
+
+
+class SourceCatalog(object):
+    """Spatial index over the source files listed in a tiles.geojson file.
+
+    Footprints are stored in an STRtree next to their prepared
+    geometries. Intersection tests for a destination tile only look at
+    the few candidates returned by the tree instead of scanning all
+    features.
+    """
+
+    def __init__(self, input_files: Sequence[InputFile]) -> None:
+        self.input_files: List[InputFile] = list(input_files)
+
+    def __len__(self) -> int:
+        return len(self.input_files)
+
+    @lazy_property
+    def tree(self) -> STRtree:
+        LOGGER.debug(f"Build spatial index for {len(self)} source files")
+        return STRtree([f[0] for f in self.input_files])
+
+    @lazy_property
+    def prepared(self) -> List[PreparedGeometry]:
+        return [prep(f[0]) for f in self.input_files]
+
+    @lazy_property
+    def footprint(self) -> Union[Polygon, MultiPolygon]:
+        LOGGER.debug("Create Polygon from input tile bounds")
+        return unary_union([f[0] for f in self.input_files])
+
+    @lazy_property
+    def _index_by_id(self) -> Dict[int, int]:
+        return {id(f[0]): i for i, f in enumerate(self.input_files)}
+
+    def candidates(self, geom: BaseGeometry) -> List[int]:
+        """Positions of all source files whose envelope intersects with
+        geometry, in catalog order."""
+
+        # Shapely 2 returns positions, earlier versions the indexed geometries
+        return sorted(
+            int(hit) if isinstance(hit, Integral) else self._index_by_id[id(hit)]
+            for hit in self.tree.query(geom)
+        )
+
+    def intersecting_files(self, geom: BaseGeometry) -> List[InputFile]:
+        """Source files which share more than an exterior point with
+        geometry."""
+        return [
+            self.input_files[i] for i in self.candidates(geom) if self._overlaps(i, geom)
+        ]
+
+    def intersects(self, geom: BaseGeometry) -> bool:
+        """Check if any source file shares more than an exterior point with
+        geometry."""
+        return any(self._overlaps(i, geom) for i in self.candidates(geom))
+
+    def _overlaps(self, i: int, geom: BaseGeometry) -> bool:
+        # must intersect, but we don't want geometries that only share an exterior point
+        return self.prepared[i].intersects(geom) and not self.prepared[i].touches(geom)
+
+
+@lru_cache(maxsize=8)
+def get_source_catalog(src_uri: str) -> SourceCatalog:
+    """Download and parse tiles.geojson once per process."""
+    s3_client = get_s3_client()
+
+    o = urlparse(src_uri, allow_fragments=False)
+    bucket: str = str(o.netloc)
+    key: str = str(o.path).lstrip("/")
+
+    LOGGER.debug(f"Get input files using {bucket} {key}")
+    response = s3_client.get_object(Bucket=bucket, Key=key)
+    body = response["Body"].read()
+
+    features = json.loads(body.decode("utf-8"))["features"]
+    input_files: List[InputFile] = [
+        (shape(feature["geometry"]), feature["properties"]["name"])
+        for feature in features
+    ]
+    LOGGER.info(f"Found {len(input_files)} source files in {src_uri}")
+
+    return SourceCatalog(input_files)
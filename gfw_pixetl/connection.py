@@ -1,3 +1,10 @@
+import os
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+from psycopg2.extensions import connection
+from psycopg2.pool import ThreadedConnectionPool
+
 from gfw_pixetl.settings.globals import GLOBALS
 
 
@@ -10,3 +17,43 @@ class PgConn(object):
 
     def pg_conn(self):
         return f"PG:dbname={self.db_name} port={self.db_port} host={self.db_host} user={self.db_user} password={self.db_password}"
+
+    @contextmanager
+    def connect(self) -> Iterator[connection]:
+        """Borrow a connection from the connection pool of the current
+        process."""
+        pool = get_connection_pool(self)
+        conn = pool.getconn()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            pool.putconn(conn)
+
+
+# Pools by process id. Pools inherited from a parent process are kept
+# referenced, closing their connections would also close them for the parent.
+_pools: Dict[int, ThreadedConnectionPool] = dict()
+
+
+def get_connection_pool(pg_conn: PgConn) -> ThreadedConnectionPool:
+    """Connection pool of current process.
+
+    Connections must not be shared across forked processes, so every
+    process creates its own pool.
+    """
+    pid: int = os.getpid()
+    if pid not in _pools:
+        _pools[pid] = ThreadedConnectionPool(
+            minconn=0,
+            maxconn=GLOBALS.db_pool_size,
+            dbname=pg_conn.db_name,
+            user=pg_conn.db_user,
+            password=str(pg_conn.db_password) if pg_conn.db_password else None,
+            host=pg_conn.db_host,
+            port=pg_conn.db_port,
+        )
+    return _pools[pid]
@@ -0,0 +1,176 @@
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Set, Tuple
+
+# Row and column of a grid cell, rows count from top to bottom
+Cell = Tuple[int, int]
+
+# Corner between grid cells as (column, -row), so that y increases upwards
+Vertex = Tuple[int, int]
+
+# Unit steps in order of preference when a ring continues from a vertex:
+# turn left, go straight, turn right
+_TURNS: List[int] = [1, 0, 3]
+_DIRECTIONS: List[Vertex] = [(1, 0), (0, 1), (-1, 0), (0, -1)]
+
+
+def cell_polygons(
+    cells: Iterable[Cell],
+) -> List[Tuple[List[Vertex], List[List[Vertex]]]]:
+    """Outline of a set of grid cells as exterior rings with their holes.
+
+    Each polygon covers cells connected by their edges. Polygons and
+    holes may touch each other at single corners.
+    """
+    occupied: Set[Cell] = set(cells)
+    components: Dict[Cell, int] = _label_components(occupied)
+
+    shells: Dict[int, List[Vertex]] = dict()
+    holes: Dict[int, List[List[Vertex]]] = dict()
+    for ring in cell_rings(occupied):
+        component: int = components[_left_cell(ring)]
+        if ring_area(ring) > 0:
+            shells[component] = ring
+        else:
+            holes.setdefault(component, list()).append(ring)
+
+    return [
+        (shell, holes.get(component, list())) for component, shell in shells.items()
+    ]
+
+
+def cell_rings(cells: Iterable[Cell]) -> List[List[Vertex]]:
+    """Trace the outline of a set of grid cells.
+
+    Returns closed rings of cell corners with the cells to their left.
+    Outer rings run counter clockwise, holes clockwise. Rings never
+    touch themselves, where cells only touch at a corner, rings are
+    split. Corners along straight edges are dropped.
+    """
+    occupied: Set[Cell] = set(cells)
+
+    # Directed boundary edges with the occupied cell on their left
+    edges: Dict[Vertex, List[int]] = dict()
+    for row, col in occupied:
+        x, y = col, -row
+        for direction, (start, neighbor) in enumerate(
+            [
+                ((x, y - 1), (row + 1, col)),  # bottom, heading east
+                ((x + 1, y - 1), (row, col + 1)),  # right, heading north
+                ((x + 1, y), (row - 1, col)),  # top, heading west
+                ((x, y), (row, col - 1)),  # left, heading south
+            ]
+        ):
+            if neighbor not in occupied:
+                edges.setdefault(start, list()).append(direction)
+
+    rings: List[List[Vertex]] = list()
+    for start in sorted(edges):
+        # Left most corner of a ring has only one outgoing edge, so the
+        # ring ends once we are back there
+        if start not in edges:
+            continue
+        direction: int = _pop_edge(edges, start, edges[start][0])
+        vertex: Vertex = start
+        ring: List[Vertex] = [start]
+
+        while True:
+            dx, dy = _DIRECTIONS[direction]
+            vertex = (vertex[0] + dx, vertex[1] + dy)
+            if vertex == start:
+                break
+            next_direction: int = _pop_edge(
+                edges, vertex, _turn(edges, vertex, direction)
+            )
+            if next_direction != direction:
+                ring.append(vertex)
+            direction = next_direction
+
+        ring.append(start)
+        rings.extend(_split_ring(ring))
+
+    return rings
+
+
+def ring_area(ring: List[Vertex]) -> float:
+    """Signed area of ring, positive for counter clockwise rings."""
+    return (
+        sum(x0 * y1 - x1 * y0 for (x0, y0), (x1, y1) in zip(ring[:-1], ring[1:]))
+        / 2
+    )
+
+
+def _label_components(cells: Set[Cell]) -> Dict[Cell, int]:
+    """Number groups of cells connected by their edges."""
+    components: Dict[Cell, int] = dict()
+    for seed in cells:
+        if seed in components:
+            continue
+        label: int = len(components)
+        components[seed] = label
+        queue: Deque[Cell] = deque([seed])
+        while queue:
+            row, col = queue.popleft()
+            for neighbor in [
+                (row + 1, col),
+                (row - 1, col),
+                (row, col + 1),
+                (row, col - 1),
+            ]:
+                if neighbor in cells and neighbor not in components:
+                    components[neighbor] = label
+                    queue.append(neighbor)
+    return components
+
+
+def _left_cell(ring: List[Vertex]) -> Cell:
+    """Cell to the left of the first edge of ring."""
+    (x0, y0), (x1, y1) = ring[0], ring[1]
+    if x1 > x0:  # east
+        return -y0 - 1, x0
+    elif y1 > y0:  # north
+        return -y0 - 1, x0 - 1
+    elif x1 < x0:  # west
+        return -y0, x0 - 1
+    else:  # south
+        return -y0, x0
+
+
+def _split_ring(ring: List[Vertex]) -> List[List[Vertex]]:
+    """Split ring into simple rings wherever it passes a corner twice."""
+    rings: List[List[Vertex]] = list()
+    path: List[Vertex] = list()
+    positions: Dict[Vertex, int] = dict()
+
+    for vertex in ring[:-1]:
+        if vertex in positions:
+            i: int = positions[vertex]
+            rings.append(path[i:] + [vertex])
+            for v in path[i + 1 :]:
+                del positions[v]
+            path = path[: i + 1]
+        else:
+            positions[vertex] = len(path)
+            path.append(vertex)
+
+    rings.append(path + [path[0]])
+    return rings
+
+
+def _turn(edges: Dict[Vertex, List[int]], vertex: Vertex, direction: int) -> int:
+    """Direction in which ring continues from vertex.
+
+    Prefer left turns, so that rings do not cross at corners where
+    diagonal cells touch.
+    """
+    for turn in _TURNS:
+        candidate: int = (direction + turn) % 4
+        if candidate in edges.get(vertex, list()):
+            return candidate
+    raise ValueError(f"Outline of grid cells is not closed at {vertex}")
+
+
+def _pop_edge(edges: Dict[Vertex, List[int]], vertex: Vertex, direction: int) -> int:
+    edges[vertex].remove(direction)
+    if not edges[vertex]:
+        del edges[vertex]
+    return direction
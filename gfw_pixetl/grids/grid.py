@@ -1,11 +1,13 @@
 import math
 from abc import ABC, abstractmethod
-from typing import Set, Tuple
+from typing import Dict, Iterable, List, Set, Tuple, Union
 
 from pyproj import CRS, Transformer
 from rasterio.coords import BoundingBox
+from shapely.geometry import MultiPolygon, Polygon
 
 from gfw_pixetl import get_module_logger
+from gfw_pixetl.grids.extent import Cell, Vertex, cell_polygons
 from gfw_pixetl.models.named_tuples import AreaOfUse
 
 LOGGER = get_module_logger(__name__)
@@ -96,6 +98,49 @@ class Grid(ABC):
 
         return top, left
 
+    def extent(self, tile_ids: Iterable[str]) -> Union[Polygon, MultiPolygon]:
+        """Outline of given tiles in WGS84.
+
+        Tiles are cells of the grid, so we can trace the outline of
+        occupied cells instead of merging tile polygons. Tile edges are
+        parallel to the axes in grid CRS and in WGS84.
+        """
+        tile_bounds: Dict[str, BoundingBox] = {
+            tile_id: self.get_tile_bounds(tile_id) for tile_id in set(tile_ids)
+        }
+        if not tile_bounds:
+            return Polygon()
+
+        # Position cells relative to first tile
+        origin: BoundingBox = next(iter(tile_bounds.values()))
+        tile_width: float = origin.right - origin.left
+        tile_height: float = origin.top - origin.bottom
+        cells: Set[Cell] = {
+            (
+                round((origin.top - bounds.top) / tile_height),
+                round((bounds.left - origin.left) / tile_width),
+            )
+            for bounds in tile_bounds.values()
+        }
+
+        transformer = Transformer.from_crs(
+            self.crs, CRS.from_epsg(4326), always_xy=True
+        )
+
+        def to_wgs84(ring: List[Vertex]) -> List[Tuple[float, float]]:
+            xs, ys = transformer.transform(
+                [origin.left + x * tile_width for x, _ in ring],
+                [origin.top + y * tile_height for _, y in ring],
+            )
+            return list(zip(xs, ys))
+
+        polygons: List[Polygon] = [
+            Polygon(to_wgs84(shell), [to_wgs84(hole) for hole in holes])
+            for shell, holes in cell_polygons(cells)
+        ]
+
+        return polygons[0] if len(polygons) == 1 else MultiPolygon(polygons)
+
     @property
     @abstractmethod
     def is_snapped_grid(self) -> bool:
@@ -32,7 +32,7 @@ class WebMercatorGrid(Grid):
         """Initialize Webmercator tile grid of a given Zoom level."""
 
         self.zoom: int = zoom
-        self.nb_tiles = max(1, int(2 ** self.zoom / 256)) ** 2
+        self.nb_tiles = self._tiles_per_side(zoom) ** 2
         super().__init__(crs)
 
     def get_tile_ids(self) -> Set[str]:
@@ -62,6 +62,33 @@ class WebMercatorGrid(Grid):
         col = row_col[1]
         return f"{str(row).zfill(3)}R_{str(col).zfill(3)}C"
 
+    def get_parent_tile_id(self, tile_id: str) -> str:
+        """Tile of the next lower zoom level, which covers given tile."""
+        assert self.zoom > 0, "Zoom level 0 has no parent tiles"
+        row, col = self._row_col(tile_id)
+        if self._tiles_per_side(self.zoom - 1) < self._tiles_per_side(self.zoom):
+            row, col = row // 2, col // 2
+        return self._get_tile_ids((row, col))
+
+    def get_child_tile_ids(self, tile_id: str) -> List[str]:
+        """Tiles of the next higher zoom level, which cover given tile."""
+        row, col = self._row_col(tile_id)
+        if self._tiles_per_side(self.zoom + 1) == self._tiles_per_side(self.zoom):
+            return [tile_id]
+        return [
+            self._get_tile_ids((2 * row + i, 2 * col + j))
+            for i, j in itertools.product(range(2), range(2))
+        ]
+
+    @staticmethod
+    def _tiles_per_side(zoom: int) -> int:
+        return max(1, int(2 ** zoom / 256))
+
+    @staticmethod
+    def _row_col(tile_id: str) -> Tuple[int, int]:
+        _row, _col = tile_id.split("_")
+        return int(_row[:-1]), int(_col[:-1])
+
     def get_tile_bounds(self, grid_id) -> BoundingBox:
         """BBox for a given tile."""
         nb_tiles = int(math.sqrt(self.nb_tiles))
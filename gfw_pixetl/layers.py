@@ -1,20 +1,19 @@
-import json
 import os
 from typing import Any, Dict, List, Optional, Tuple, Union
-from urllib.parse import urlparse
 
 from rasterio.warp import Resampling
-from shapely.geometry import MultiPolygon, Polygon, shape
-from shapely.ops import unary_union
+from shapely.geometry import MultiPolygon, Polygon
 
 from gfw_pixetl import get_module_logger
+from gfw_pixetl.calc import get_calc_expression
+from gfw_pixetl.catalog import SourceCatalog, get_source_catalog
 from gfw_pixetl.data_type import DataType, data_type_factory
-from gfw_pixetl.grids import Grid, grid_factory
+from gfw_pixetl.decorators import lazy_property
+from gfw_pixetl.grids import Grid, LatLngGrid, grid_factory
 from gfw_pixetl.models.pydantic import LayerModel, Symbology
 from gfw_pixetl.resampling import resampling_factory
 from gfw_pixetl.sources import VectorSource
-
-from .utils.aws import get_s3_client
+from gfw_pixetl.symbology import Colorizer
 
 LOGGER = get_module_logger(__name__)
 
@@ -41,6 +40,26 @@ class Layer(object):
         self.compute_stats: bool = layer_def.compute_stats
         self.compute_histogram: bool = layer_def.compute_histogram
         self.process_locally: bool = layer_def.process_locally
+        self.probe_overviews: bool = layer_def.probe_overviews
+        self.create_cog: bool = layer_def.create_cog
+        self.overview_resampling: Resampling = resampling_factory(
+            layer_def.overview_resampling or layer_def.resampling
+        )
+
+        self.create_zarr: bool = layer_def.create_zarr
+        if self.create_zarr and not isinstance(grid, LatLngGrid):
+            raise ValueError("Zarr stores require a lat/lng grid")
+        if self.create_zarr and self.symbology:
+            raise ValueError("Cannot write symbology to Zarr stores")
+
+    @lazy_property
+    def colorizer(self) -> Optional[Colorizer]:
+        """Renders symbology, built once per layer."""
+        if not self.symbology:
+            return None
+        return Colorizer(
+            self.symbology, self.dst_profile["dtype"], self.dst_profile["nodata"]
+        )
 
     def _get_prefix(
         self,
@@ -107,37 +126,34 @@ class RasterSrcLayer(Layer):
 
         self._src_uri = layer_def.source_uri
 
-        # self.input_files = self._input_files()
-        # self.geom = self._geom()
+        # fail early for invalid expressions
+        if self.calc:
+            get_calc_expression(self.calc)
 
     @property
-    def input_files(self) -> List[Tuple[Polygon, str]]:
-        s3_client = get_s3_client()
-        input_files = list()
+    def has_catalog(self) -> bool:
+        return bool(self._src_uri)
 
-        o = urlparse(self._src_uri, allow_fragments=False)
-        bucket: Union[str, bytes] = o.netloc
-        prefix: str = str(o.path).lstrip("/")
-
-        LOGGER.debug(
-            f"Get input files for layer {self.name} using {str(bucket)} {prefix}"
-        )
-        response = s3_client.get_object(Bucket=bucket, Key=prefix)
-        body = response["Body"].read()
+    @property
+    def catalog(self) -> SourceCatalog:
+        assert self._src_uri, "No source URI specified."
+        return get_source_catalog(self._src_uri)
 
-        features = json.loads(body.decode("utf-8"))["features"]
-        for feature in features:
-            LOGGER.debug(f"{feature}")
-            input_files.append(
-                (shape(feature["geometry"]), feature["properties"]["name"])
-            )
-        return input_files
+    @property
+    def input_files(self) -> List[Tuple[Polygon, str]]:
+        return self.catalog.input_files
 
     @property
-    def geom(self) -> MultiPolygon:
-        LOGGER.debug("Create Polygon from input tile bounds")
-        geoms: List[Polygon] = [tile[0] for tile in self.input_files]
-        return unary_union(geoms)
+    def geom(self) -> Union[Polygon, MultiPolygon]:
+        return self.catalog.footprint
+
+    def preload_catalog(self) -> None:
+        """Parse source catalog before forking any worker processes, so that
+        all workers inherit the spatial index instead of building their
+        own."""
+        if self._src_uri:
+            LOGGER.debug(f"Preload source catalog for layer {self.name}")
+            _ = self.catalog.tree, self.catalog.prepared  # trigger build of index
 
 
 def layer_factory(layer_def: LayerModel) -> Layer:
@@ -24,3 +24,5 @@ class ColorMapType(str, Enum):
 class DstFormat(str, Enum):
     geotiff = "geotiff"
     gdal_geotiff = "gdal-geotiff"
+    cog = "cog"
+    zarr = "zarr"
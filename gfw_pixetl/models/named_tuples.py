@@ -1,4 +1,6 @@
-from typing import NamedTuple, Optional
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+from rasterio.enums import Resampling
 
 
 class AreaOfUse(NamedTuple):
@@ -25,3 +27,111 @@ class AreaOfUse(NamedTuple):
 
     def __str__(self):
         return f"- name: {self.name}\n" f"- bounds: {self.bounds}"
+
+
+class JobResources(NamedTuple):
+    """Estimated work and resources of an AWS Batch job."""
+
+    #: Number of grid tiles intersecting with the source.
+    tiles: int
+    #: Bytes of source files intersecting with these tiles.
+    source_bytes: int
+    #: vCPUs to request.
+    vcpus: int
+    #: Memory to request in MB.
+    memory: int
+    #: Timeout of each attempt in seconds.
+    timeout: int
+
+
+class ReadProbe(NamedTuple):
+    """Read performance of a source file, measured with byte range
+    requests."""
+
+    #: Median time to first byte of small requests in seconds.
+    latency: float
+    #: Bytes per second of a single stream, without latency.
+    throughput: float
+    #: Bytes per second of several concurrent streams, without latency.
+    aggregate_throughput: float
+
+
+class ReadProfile(NamedTuple):
+    """GDAL and worker settings for reading remote source files."""
+
+    #: Bytes fetched by each HTTP range request.
+    chunk_size: int
+    #: Multiplex requests over a single HTTP/2 connection.
+    multiplex: bool
+    #: Merge requests for consecutive byte ranges into one.
+    merge_consecutive_ranges: bool
+    #: Bytes cached in RAM for each open file.
+    vsi_cache_size: int
+    #: Bytes of downloaded chunks cached in RAM for all files of a process.
+    curl_cache_size: int
+    #: Number of processes reading windows at the same time.
+    read_concurrency: int
+
+    def gdal_env(self) -> Dict[str, str]:
+        env: Dict[str, str] = {
+            "CPL_VSIL_CURL_CHUNK_SIZE": str(self.chunk_size),
+            "CPL_VSIL_CURL_CACHE_SIZE": str(self.curl_cache_size),
+            "VSI_CACHE_SIZE": str(self.vsi_cache_size),
+            "GDAL_HTTP_MULTIPLEX": "YES" if self.multiplex else "NO",
+            "GDAL_HTTP_MERGE_CONSECUTIVE_RANGES": (
+                "YES" if self.merge_consecutive_ranges else "NO"
+            ),
+        }
+        if self.multiplex:
+            # multiplexing requires HTTP/2, which is negotiated over TLS
+            env["GDAL_HTTP_VERSION"] = "2TLS"
+        return env
+
+
+class SourceLayout(NamedTuple):
+    """Block layout of source files, measured in pixels of the destination
+    tile."""
+
+    #: Width of source blocks.
+    block_width: float
+    #: Height of source blocks.
+    block_height: float
+    #: Column of the first source block boundary.
+    col_off: float
+    #: Row of the first source block boundary.
+    row_off: float
+    #: Source blocks are strips, which span the entire width of source files.
+    strips: bool
+
+
+class Overview(NamedTuple):
+    """Overview file which is written together with a tile."""
+
+    #: Local path of overview file.
+    uri: str
+    #: Rasterio profile of overview file.
+    profile: Dict[str, Any]
+    #: Method to combine 2x2 pixels of the level above.
+    resampling: Resampling
+
+
+class ZarrArray(NamedTuple):
+    """Global Zarr array of a layer, of which a tile holds one chunk
+    aligned section."""
+
+    #: Local path of Zarr store.
+    uri: str
+    #: Rows and columns of global array.
+    shape: Tuple[int, int]
+    #: Rows and columns of each chunk.
+    chunks: Tuple[int, int]
+    #: Data type of array.
+    dtype: str
+    #: Value of pixels which were never written.
+    fill_value: Any
+    #: First row of tile in global array.
+    row_off: int
+    #: First column of tile in global array.
+    col_off: int
+    #: Attributes of array, such as CRS and geo transform.
+    attrs: Dict[str, Any]
@@ -43,6 +43,11 @@ class LayerModel(BaseModel):
     compute_stats: bool = False
     compute_histogram: bool = False
     process_locally: bool = False
+    min_zoom: Optional[int] = Field(None, ge=0)
+    create_cog: bool = False
+    create_zarr: bool = False
+    overview_resampling: Optional[ResamplingMethodEnum]
+    probe_overviews: bool = False
 
 
 class Histogram(BaseModel):
@@ -79,3 +84,59 @@ class Metadata(BaseModel):
     driver: str
     compression: Optional[str]
     bands: List[Band] = list()
+
+
+class UploadMetrics(BaseModel):
+    uri: str
+    size: int
+    seconds: float
+    throughput: float = Field(..., description="Throughput in MB/s")
+
+
+class StageMetrics(BaseModel):
+    wall_time: float = Field(0.0, description="Wall time in seconds")
+    cpu_time: float = Field(
+        0.0, description="CPU time in seconds, including finished child processes"
+    )
+    peak_rss: int = Field(0, description="Peak resident memory in bytes")
+    bytes_read: int = 0
+    bytes_written: int = 0
+    tiles: int = 0
+    windows: int = 0
+    skipped_windows: int = Field(
+        0, description="Windows skipped without reading them, b/c they have no data"
+    )
+    cache_hits: int = Field(0, description="Chunks read from the source cache")
+    cache_misses: int = Field(
+        0, description="Chunks fetched from remote sources into the source cache"
+    )
+
+    @property
+    def cache_hit_rate(self) -> float:
+        reads: int = self.cache_hits + self.cache_misses
+        return self.cache_hits / reads if reads else 0.0
+
+    def merge(self, other: "StageMetrics") -> None:
+        """Add metrics of other tiles or processes to this stage."""
+        self.wall_time += other.wall_time
+        self.cpu_time += other.cpu_time
+        self.peak_rss = max(self.peak_rss, other.peak_rss)
+        self.bytes_read += other.bytes_read
+        self.bytes_written += other.bytes_written
+        self.tiles += other.tiles
+        self.windows += other.windows
+        self.skipped_windows += other.skipped_windows
+        self.cache_hits += other.cache_hits
+        self.cache_misses += other.cache_misses
+
+
+class RunReport(BaseModel):
+    dataset: str
+    version: str
+    grid: str
+    started: str
+    wall_time: float
+    processed_tiles: int
+    skipped_tiles: int
+    failed_tiles: int
+    stages: Dict[str, StageMetrics] = dict()
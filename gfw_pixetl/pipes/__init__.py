@@ -6,4 +6,5 @@ isort:skip_file
 from gfw_pixetl.pipes.pipe import Pipe  # noqa: F401
 from gfw_pixetl.pipes.raster_pipe import RasterPipe  # noqa: F401
 from gfw_pixetl.pipes.vector_pipe import VectorPipe  # noqa: F401
+from gfw_pixetl.pipes.pyramid_pipe import PyramidPipe  # noqa: F401
 from gfw_pixetl.pipes.pipe_factory import pipe_factory  # noqa: F401
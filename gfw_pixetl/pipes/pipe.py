@@ -1,16 +1,25 @@
+import os
 from abc import ABC, abstractmethod
-from typing import Iterator, List, Optional, Set, Tuple
+from collections import deque
+from typing import Deque, Dict, Iterator, List, Optional, Set, Tuple
 
 from parallelpipe import stage
 
 from gfw_pixetl import get_module_logger
 from gfw_pixetl.layers import Layer
+from gfw_pixetl.models.pydantic import StageMetrics
 from gfw_pixetl.settings.globals import GLOBALS
+from gfw_pixetl.sources import DestinationIndex
 from gfw_pixetl.tiles.tile import Tile
-from gfw_pixetl.utils import upload_geometries
+from gfw_pixetl.utils import get_bucket, upload_geometries
+from gfw_pixetl.utils.report import add_metrics, measure
+from gfw_pixetl.utils.upload import MB
 
 LOGGER = get_module_logger(__name__)
 
+# Number of finished tiles per process which may wait for their uploads
+MAX_PENDING_UPLOADS = 2
+
 
 class Pipe(ABC):
     """Base Pipe including all the basic stages to seed, filter, delete and
@@ -25,17 +34,26 @@ class Pipe(ABC):
         self.layer = layer
         self.subset = subset
         self.tiles_to_process = 0
+        self._dst_index: Optional[DestinationIndex] = None
+        # Metrics of stages, which run once for all tiles in the main process
+        self.metrics: Dict[str, StageMetrics] = dict()
 
     def collect_tiles(self, overwrite: bool) -> List[Tile]:
         """Raster Pipe."""
 
         LOGGER.info("Start Raster Pipe")
 
+        with measure(self.metrics, "get_grid_tiles", tiles=0):
+            grid_tiles = self.get_grid_tiles()
+        self.metrics["get_grid_tiles"].tiles = len(grid_tiles)
+
         pipe = (
-            self.get_grid_tiles()
+            grid_tiles
             | self.filter_subset_tiles(self.subset)
             | self.filter_src_tiles
-            | self.filter_target_tiles(overwrite=overwrite)
+            | self.filter_target_tiles(
+                overwrite=overwrite, dst_index=self.get_dst_index(overwrite)
+            )
         )
         tiles = list()
 
@@ -48,6 +66,16 @@ class Pipe(ABC):
 
         return tiles
 
+    def get_dst_index(self, overwrite: bool) -> Optional[DestinationIndex]:
+        """List existing tiles in target location once, unless we overwrite
+        them anyways."""
+        if overwrite:
+            return None
+        if self._dst_index is None:
+            prefix = os.path.join(self.layer.prefix, GLOBALS.default_dst_format, "")
+            self._dst_index = DestinationIndex(get_bucket(), prefix)
+        return self._dst_index
+
     @abstractmethod
     def create_tiles(self, overwrite) -> Tuple[List[Tile], List[Tile], List[Tile]]:
         """Override this method when implementing pipes."""
@@ -83,24 +111,32 @@ class Pipe(ABC):
         Useful for testing.
         """
         for tile in tiles:
-            if subset and tile.status == "pending" and tile.tile_id not in subset:
-                LOGGER.debug(f"Tile {tile} not in subset. Skip.")
-                tile.status = "skipped (not in subset)"
+            if subset and tile.status == "pending":
+                with measure(tile.metrics, "filter_subset_tiles"):
+                    in_subset = tile.tile_id in subset
+                if not in_subset:
+                    LOGGER.debug(f"Tile {tile} not in subset. Skip.")
+                    tile.status = "skipped (not in subset)"
             yield tile
 
     @staticmethod
     @stage(workers=GLOBALS.cores)
-    def filter_target_tiles(tiles: Iterator[Tile], overwrite: bool) -> Iterator[Tile]:
+    def filter_target_tiles(
+        tiles: Iterator[Tile],
+        overwrite: bool,
+        dst_index: Optional[DestinationIndex] = None,
+    ) -> Iterator[Tile]:
         """Don't process tiles if they already exists in target location,
         unless overwrite is set to True."""
         for tile in tiles:
-            if (
-                not overwrite
-                and tile.status == "pending"
-                and tile.dst[tile.default_format].exists()
-            ):
-                tile.status = "skipped (tile exists)"
-                LOGGER.debug(f"Tile {tile} already in destination. Skip.")
+            if not overwrite and tile.status == "pending":
+                with measure(tile.metrics, "filter_target_tiles"):
+                    exists = tile.dst[tile.default_format].exists(
+                        dst_index, verify=GLOBALS.verify_existing_tiles
+                    )
+                if exists:
+                    tile.status = "skipped (tile exists)"
+                    LOGGER.debug(f"Tile {tile} already in destination. Skip.")
             yield tile
 
     @staticmethod
@@ -109,24 +145,59 @@ class Pipe(ABC):
         """Copy local file to geotiff format."""
         for tile in tiles:
             if tile.status == "pending":
-                tile.create_gdal_geotiff()
+                with measure(tile.metrics, "create_gdal_geotiff"):
+                    tile.create_gdal_geotiff()
             yield tile
 
     @staticmethod
-    @stage(workers=GLOBALS.cores)
-    def upload_file(tiles: Iterator[Tile]) -> Iterator[Tile]:
-        """Upload tile to target location."""
+    def upload_finalized(tiles: Iterator[Tile]) -> Iterator[Tile]:
+        """Start uploading each tile as soon as it is yielded and pass it on
+        once its upload finished.
+
+        Uploads run in background threads, so the stage producing tiles
+        continues with the next tile in the meantime. At most
+        MAX_PENDING_UPLOADS tiles per process wait for their uploads.
+        """
+        pending: Deque[Tile] = deque()
         for tile in tiles:
             if tile.status == "pending":
-                tile.upload()
-            yield tile
+                tile.upload(wait=False)
+            pending.append(tile)
+
+            while pending and (
+                len(pending) > MAX_PENDING_UPLOADS or pending[0].upload_done()
+            ):
+                yield Pipe._finish_upload(pending.popleft())
+
+        while pending:
+            yield Pipe._finish_upload(pending.popleft())
+
+    @staticmethod
+    def _finish_upload(tile: Tile) -> Tile:
+        tile.wait_upload()
+        if tile.upload_metrics:
+            size = sum(m.size for m in tile.upload_metrics.values())
+            seconds = max(m.seconds for m in tile.upload_metrics.values())
+            # Uploads run in background threads next to other stages,
+            # so we can only attribute their duration and volume
+            add_metrics(
+                tile.metrics,
+                "upload_file",
+                StageMetrics(wall_time=seconds, bytes_written=size, tiles=1),
+            )
+            LOGGER.info(
+                f"Uploaded tile {tile.tile_id} ({size / MB:.1f} MB) "
+                f"at {size / MB / seconds if seconds else 0.0:.1f} MB/s"
+            )
+        return tile
 
     @staticmethod
     @stage(workers=GLOBALS.cores)
     def delete_work_dir(tiles: Iterator[Tile]) -> Iterator[Tile]:
         """Delete local files."""
         for tile in tiles:
-            tile.remove_work_dir()
+            with measure(tile.metrics, "delete_work_dir"):
+                tile.remove_work_dir()
             yield tile
 
     def _process_pipe(self, pipe) -> Tuple[List[Tile], List[Tile], List[Tile]]:
@@ -151,6 +222,9 @@ class Pipe(ABC):
             else:
                 skipped_tiles.append(tile)
 
-        upload_geometries.upload_geojsons(processed_tiles, self.layer.prefix)
+        with measure(self.metrics, "upload_geojsons", tiles=len(processed_tiles)):
+            upload_geometries.upload_geojsons(
+                processed_tiles, self.layer.prefix, grid=self.grid
+            )
 
         return processed_tiles, skipped_tiles, failed_tiles
@@ -0,0 +1,139 @@
+import os
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from parallelpipe import Stage, stage
+
+from gfw_pixetl import get_module_logger
+from gfw_pixetl.grids import WebMercatorGrid
+from gfw_pixetl.layers import Layer
+from gfw_pixetl.pipes import Pipe
+from gfw_pixetl.settings.globals import GLOBALS
+from gfw_pixetl.sources import DestinationIndex
+from gfw_pixetl.tiles import PyramidTile, Tile
+from gfw_pixetl.utils import get_bucket
+from gfw_pixetl.utils.report import measure
+
+LOGGER = get_module_logger(__name__)
+
+
+class PyramidPipe(Pipe):
+    """Build tiles of a WebMercator zoom level from the tiles of the next
+    higher zoom level of the same layer.
+
+    Only tiles covering tiles which were processed at the higher zoom
+    level are built.
+    """
+
+    def __init__(
+        self,
+        layer: Layer,
+        src_layer: Layer,
+        src_tile_ids: Iterable[str],
+        subset: Optional[List[str]] = None,
+    ) -> None:
+        super().__init__(layer, subset)
+        assert isinstance(self.grid, WebMercatorGrid) and isinstance(
+            src_layer.grid, WebMercatorGrid
+        ), "Pyramids require WebMercator grids"
+        assert (
+            src_layer.grid.zoom == self.grid.zoom + 1
+        ), "Source layer must be next higher zoom level"
+        self.src_layer: Layer = src_layer
+        self.src_tile_ids: Set[str] = set(src_tile_ids)
+
+    def get_grid_tiles(self) -> Set[PyramidTile]:  # type: ignore
+        """Seed tiles covering processed tiles of the higher zoom level,
+        together with all existing tiles of the higher zoom level they
+        cover."""
+        assert isinstance(self.src_layer.grid, WebMercatorGrid)
+        src_grid: WebMercatorGrid = self.src_layer.grid
+
+        src_index = DestinationIndex(
+            get_bucket(),
+            os.path.join(self.src_layer.prefix, GLOBALS.default_dst_format, ""),
+        )
+        tiles: Dict[str, PyramidTile] = dict()
+        for src_tile_id in self.src_tile_ids:
+            tile_id = src_grid.get_parent_tile_id(src_tile_id)
+            if tile_id not in tiles:
+                tile = self._get_grid_tile(tile_id)
+                tile.src_tile_ids = [
+                    child
+                    for child in tile.src_tile_ids
+                    if src_index.exists(tile.src_key(child))
+                ]
+                tiles[tile_id] = tile
+
+        LOGGER.info(f"Found {len(tiles)} tiles inside grid {self.grid.name}")
+
+        return set(tiles.values())
+
+    def _get_grid_tile(self, tile_id: str) -> PyramidTile:
+        assert isinstance(self.grid, WebMercatorGrid)
+        return PyramidTile(
+            tile_id=tile_id,
+            grid=self.grid,
+            layer=self.layer,
+            src_layer=self.src_layer,
+            src_tile_ids=self.grid.get_child_tile_ids(tile_id),
+        )
+
+    def create_tiles(
+        self, overwrite: bool
+    ) -> Tuple[List[Tile], List[Tile], List[Tile]]:
+        """Pyramid Pipe."""
+
+        LOGGER.info(f"Start Pyramid Pipe for {self.grid.name}")
+
+        tiles = self.collect_tiles(overwrite=overwrite)
+
+        GLOBALS.workers = max(self.tiles_to_process, 1)
+
+        pipe = (
+            tiles
+            | Stage(self.reduce).setup(workers=GLOBALS.workers)
+            | self.delete_work_dir
+        )
+
+        tiles, skipped_tiles, failed_tiles = self._process_pipe(pipe)
+
+        LOGGER.info(f"Finished Pyramid Pipe for {self.grid.name}")
+        return tiles, skipped_tiles, failed_tiles
+
+    @staticmethod
+    @stage(workers=GLOBALS.cores)
+    def filter_src_tiles(tiles: Iterator[PyramidTile]) -> Iterator[PyramidTile]:
+        """Only process tiles which cover existing tiles of the higher zoom
+        level."""
+        for tile in tiles:
+            if tile.status == "pending":
+                with measure(tile.metrics, "filter_src_tiles"):
+                    within = tile.within()
+                if not within:
+                    LOGGER.info(
+                        f"Tile {tile.tile_id} does not cover any tile "
+                        "of the next zoom level - skip"
+                    )
+                    tile.status = "skipped (does not intersect)"
+            yield tile
+
+    @staticmethod
+    def reduce(tiles: Iterator[PyramidTile]) -> Iterator[PyramidTile]:
+        """Reduce tiles of the higher zoom level into tiles of this zoom
+        level.
+
+        Tiles are uploaded as soon as they are built, while the next
+        tile gets processed.
+        """
+
+        def reduced() -> Iterator[PyramidTile]:
+            for tile in tiles:
+                if tile.status == "pending":
+                    with measure(tile.metrics, "reduce"):
+                        has_data = tile.reduce()
+                    if not has_data:
+                        tile.status = "skipped (has no data)"
+                        LOGGER.info(f"Tile {tile.tile_id} has no data - skip")
+                yield tile
+
+        yield from Pipe.upload_finalized(reduced())  # type: ignore
@@ -9,6 +9,7 @@ from gfw_pixetl.layers import RasterSrcLayer
 from gfw_pixetl.pipes import Pipe
 from gfw_pixetl.settings.globals import GLOBALS
 from gfw_pixetl.tiles import RasterSrcTile, Tile
+from gfw_pixetl.utils.report import measure
 
 LOGGER = get_module_logger(__name__)
 
@@ -42,6 +43,10 @@ class RasterPipe(Pipe):
 
         LOGGER.info("Start Raster Pipe")
 
+        # Parse source catalog before any worker process gets forked
+        assert isinstance(self.layer, RasterSrcLayer)
+        self.layer.preload_catalog()
+
         tiles = self.collect_tiles(overwrite=overwrite)
 
         GLOBALS.workers = self.tiles_to_process
@@ -49,7 +54,6 @@ class RasterPipe(Pipe):
         pipe = (
             tiles
             | Stage(self.transform).setup(workers=GLOBALS.workers)
-            | self.upload_file
             | self.delete_work_dir
         )
 
@@ -63,11 +67,14 @@ class RasterPipe(Pipe):
     def filter_src_tiles(tiles: Iterator[RasterSrcTile]) -> Iterator[RasterSrcTile]:
         """Only process tiles which intersect with source raster."""
         for tile in tiles:
-            if tile.status == "pending" and not tile.within():
-                LOGGER.info(
-                    f"Tile {tile.tile_id} does not intersects with source raster - skip"
-                )
-                tile.status = "skipped (does not intersect)"
+            if tile.status == "pending":
+                with measure(tile.metrics, "filter_src_tiles"):
+                    within = tile.within()
+                if not within:
+                    LOGGER.info(
+                        f"Tile {tile.tile_id} does not intersects with source raster - skip"
+                    )
+                    tile.status = "skipped (does not intersect)"
             yield tile
 
     # We cannot use the @stage decorate here
@@ -76,9 +83,20 @@ class RasterPipe(Pipe):
     # and cannot be changed afterwards anymore. The Stage class gives us more flexibility.
     @staticmethod
     def transform(tiles: Iterator[RasterSrcTile]) -> Iterator[RasterSrcTile]:
-        """Transform input raster to match new tile grid and projection."""
-        for tile in tiles:
-            if tile.status == "pending" and not tile.transform():
-                tile.status = "skipped (has no data)"
-                LOGGER.info(f"Tile {tile.tile_id} has no data - skip")
-            yield tile
+        """Transform input raster to match new tile grid and projection.
+
+        Tiles are uploaded as soon as they are transformed, while the
+        next tile gets processed.
+        """
+
+        def transformed() -> Iterator[RasterSrcTile]:
+            for tile in tiles:
+                if tile.status == "pending":
+                    with measure(tile.metrics, "transform"):
+                        has_data = tile.transform()
+                    if not has_data:
+                        tile.status = "skipped (has no data)"
+                        LOGGER.info(f"Tile {tile.tile_id} has no data - skip")
+                yield tile
+
+        yield from Pipe.upload_finalized(transformed())  # type: ignore
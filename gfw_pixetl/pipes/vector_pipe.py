@@ -1,14 +1,17 @@
 from multiprocessing import Pool
 from multiprocessing.pool import Pool as PoolType
-from typing import Iterator, List, Set, Tuple
+from typing import Iterable, Iterator, List, Set, Tuple
 
 from parallelpipe import stage
+from psycopg2 import sql
+from psycopg2.extras import execute_values
 
 from gfw_pixetl import get_module_logger
 from gfw_pixetl.layers import VectorSrcLayer
 from gfw_pixetl.pipes import Pipe
 from gfw_pixetl.settings.globals import GLOBALS
 from gfw_pixetl.tiles import Tile, VectorSrcTile
+from gfw_pixetl.utils.report import measure
 
 LOGGER = get_module_logger(__name__)
 
@@ -23,9 +26,10 @@ class VectorPipe(Pipe):
             tiles
             | self.filter_subset_tiles
             | self.filter_src_tiles
-            | self.filter_target_tiles(overwrite=overwrite)
+            | self.filter_target_tiles(
+                overwrite=overwrite, dst_index=self.get_dst_index(overwrite)
+            )
             | self.rasterize
-            | self.upload_file
             | self.delete_work_dir
         )
 
@@ -45,8 +49,53 @@ class VectorPipe(Pipe):
         tile_count: int = len(tiles)
         LOGGER.info(f"Found {tile_count} tile inside grid")
 
+        intersecting_ids: Set[str] = self.intersecting_tile_ids(tiles)
+        for tile in tiles:
+            tile.intersects = tile.tile_id in intersecting_ids
+
         return tiles
 
+    def intersecting_tile_ids(self, tiles: Iterable[VectorSrcTile]) -> Set[str]:
+        """Find all tiles which intersect with source table in a single
+        query, joining tile envelopes with the source table."""
+        assert isinstance(self.layer, VectorSrcLayer)
+        src = self.layer.src
+
+        rows: List[Tuple[str, float, float, float, float]] = [
+            (
+                tile.tile_id,
+                tile.bounds.left,
+                tile.bounds.bottom,
+                tile.bounds.right,
+                tile.bounds.top,
+            )
+            for tile in tiles
+        ]
+        if not rows:
+            return set()
+
+        query = sql.SQL(
+            """SELECT tiles.tile_id
+            FROM (VALUES %s) AS tiles(tile_id, xmin, ymin, xmax, ymax)
+            WHERE EXISTS (
+                SELECT 1 FROM {table}
+                WHERE ST_Intersects(
+                    geom,
+                    ST_MakeEnvelope(
+                        tiles.xmin, tiles.ymin, tiles.xmax, tiles.ymax, 4326
+                    )
+                )
+            )"""
+        ).format(table=sql.Identifier(src.schema, src.table))
+
+        LOGGER.info(f"Check which of {len(rows)} tiles intersect with source table")
+        with src.conn.connect() as conn, conn.cursor() as cursor:
+            result = execute_values(cursor, query, rows, page_size=len(rows), fetch=True)
+
+        tile_ids: Set[str] = {row[0] for row in result}
+        LOGGER.info(f"{len(tile_ids)} tiles intersect with source table")
+        return tile_ids
+
     def _get_grid_tile(self, tile_id: str) -> VectorSrcTile:
         assert isinstance(self.layer, VectorSrcLayer)
         return VectorSrcTile(tile_id=tile_id, grid=self.grid, layer=self.layer)
@@ -56,15 +105,24 @@ class VectorPipe(Pipe):
     def filter_src_tiles(tiles: Iterator[VectorSrcTile]) -> Iterator[VectorSrcTile]:
         """Only include tiles which intersect which input vector extent."""
         for tile in tiles:
-            if tile.status == "pending" and not tile.src_vector_intersects():
-                tile.status = "skipped (does not intersect)"
+            if tile.status == "pending":
+                with measure(tile.metrics, "filter_src_tiles"):
+                    intersects = tile.src_vector_intersects()
+                if not intersects:
+                    tile.status = "skipped (does not intersect)"
             yield tile
 
     @staticmethod
     @stage(workers=GLOBALS.workers)
     def rasterize(tiles: Iterator[VectorSrcTile]) -> Iterator[VectorSrcTile]:
-        """Convert vector source to raster tiles."""
-        for tile in tiles:
-            if tile.status == "pending":
-                tile.rasterize()
-            yield tile
+        """Convert vector source to raster tiles and upload them while the
+        next tile gets rasterized."""
+
+        def rasterized() -> Iterator[VectorSrcTile]:
+            for tile in tiles:
+                if tile.status == "pending":
+                    with measure(tile.metrics, "rasterize"):
+                        tile.rasterize()
+                yield tile
+
+        yield from Pipe.upload_finalized(rasterized())  # type: ignore
@@ -3,20 +3,25 @@
 import json
 import os
 import sys
+import time
+from datetime import datetime
 from typing import List, Optional, Tuple
 
 import click
 
 from gfw_pixetl import get_module_logger
+from gfw_pixetl.grids import WebMercatorGrid, grid_factory
 from gfw_pixetl.layers import Layer, layer_factory
 from gfw_pixetl.logo import logo
-from gfw_pixetl.models.pydantic import LayerModel
-from gfw_pixetl.pipes import Pipe, pipe_factory
+from gfw_pixetl.models.pydantic import LayerModel, RunReport
+from gfw_pixetl.pipes import Pipe, PyramidPipe, pipe_factory
 from gfw_pixetl.settings.gdal import (  # noqa: F401, import vars to assure they are initialize right in the beginning
     GDAL_ENV,
 )
 from gfw_pixetl.tiles import Tile
 from gfw_pixetl.utils.cwd import remove_work_directory, set_cwd
+from gfw_pixetl.utils.read_tuning import tune_reads
+from gfw_pixetl.utils.report import create_report, upload_report
 
 LOGGER = get_module_logger(__name__)
 
@@ -56,7 +61,7 @@ def cli(
         raise ValueError("URI specification is required for raster sources")
 
     # Finally, actually process the layer
-    tiles, skipped_tiles, failed_tiles = pixetl(
+    tiles, skipped_tiles, failed_tiles, report = pixetl(
         layer_def,
         subset,
         overwrite,
@@ -82,8 +87,18 @@ def pixetl(
     layer_def: LayerModel,
     subset: Optional[List[str]] = None,
     overwrite: bool = False,
-) -> Tuple[List[Tile], List[Tile], List[Tile]]:
+) -> Tuple[List[Tile], List[Tile], List[Tile], RunReport]:
+    """Process layer and return processed, skipped and failed tiles,
+    together with a report on time and resources used by each stage.
+
+    With min_zoom set, all lower zoom levels down to min_zoom are built
+    from the zoom level above and their tiles are returned as well. A
+    report is uploaded next to tiles.geojson of each zoom level, the
+    report of the requested grid is returned.
+    """
     click.echo(logo)
+    started = datetime.utcnow()
+    start_time = time.monotonic()
 
     LOGGER.info(
         f"Start tile preparation for dataset {layer_def.dataset}, "
@@ -92,6 +107,8 @@ def pixetl(
         f"with overwrite set to {overwrite}."
     )
 
+    zooms: List[int] = _pyramid_zooms(layer_def)
+
     old_cwd = os.getcwd()
     cwd = set_cwd()
 
@@ -105,13 +122,48 @@ def pixetl(
             LOGGER.info("Running on full extent")
 
         layer: Layer = layer_factory(layer_def)
+        tune_reads(layer)
 
         pipe: Pipe = pipe_factory(layer, subset)
 
         tiles, skipped_tiles, failed_tiles = pipe.create_tiles(overwrite)
+        report: RunReport = _report(
+            layer, pipe, started, start_time, tiles, skipped_tiles, failed_tiles
+        )
+
+        # Build each lower zoom level from the one above
+        src_layer, src_tiles = layer, tiles
+        for zoom in zooms:
+            level_started = datetime.utcnow()
+            level_start_time = time.monotonic()
+
+            level_layer: Layer = layer_factory(
+                layer_def.copy(update={"grid": f"zoom_{zoom}"})
+            )
+            level_pipe = PyramidPipe(
+                level_layer, src_layer, [tile.tile_id for tile in src_tiles]
+            )
+            level_tiles, level_skipped, level_failed = level_pipe.create_tiles(
+                overwrite
+            )
+            _report(
+                level_layer,
+                level_pipe,
+                level_started,
+                level_start_time,
+                level_tiles,
+                level_skipped,
+                level_failed,
+            )
+
+            tiles += level_tiles
+            skipped_tiles += level_skipped
+            failed_tiles += level_failed
+            src_layer, src_tiles = level_layer, level_tiles
+
         remove_work_directory(old_cwd, cwd)
 
-        return tiles, skipped_tiles, failed_tiles
+        return tiles, skipped_tiles, failed_tiles, report
 
     except Exception as e:
         remove_work_directory(old_cwd, cwd)
@@ -119,5 +171,47 @@ def pixetl(
         raise
 
 
+def _pyramid_zooms(layer_def: LayerModel) -> List[int]:
+    """Zoom levels to build from the level above, highest first."""
+    if layer_def.min_zoom is None:
+        return list()
+
+    grid = grid_factory(layer_def.grid)
+    if not isinstance(grid, WebMercatorGrid):
+        raise ValueError("Option min_zoom requires a WebMercator grid")
+    if layer_def.min_zoom > grid.zoom:
+        raise ValueError(f"Option min_zoom must not exceed zoom level {grid.zoom}")
+    if layer_def.symbology:
+        raise ValueError("Cannot build zoom levels from tiles with symbology")
+
+    return list(range(grid.zoom - 1, layer_def.min_zoom - 1, -1))
+
+
+def _report(
+    layer: Layer,
+    pipe: Pipe,
+    started: datetime,
+    start_time: float,
+    tiles: List[Tile],
+    skipped_tiles: List[Tile],
+    failed_tiles: List[Tile],
+) -> RunReport:
+    """Create and upload report of a pipe run."""
+    report: RunReport = create_report(
+        layer,
+        started,
+        time.monotonic() - start_time,
+        {
+            "processed": len(tiles),
+            "skipped": len(skipped_tiles),
+            "failed": len(failed_tiles),
+        },
+        [pipe.metrics]
+        + [tile.metrics for tile in tiles + skipped_tiles + failed_tiles],
+    )
+    upload_report(report, layer.prefix)
+    return report
+
+
 if __name__ == "__main__":
     cli()
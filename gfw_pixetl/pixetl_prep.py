@@ -1,5 +1,6 @@
 import os
-from typing import Dict, List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 from urllib.parse import urlparse
 
 import click
@@ -7,10 +8,14 @@ from google.auth.exceptions import DefaultCredentialsError
 from google.cloud import storage
 from retrying import retry
 
+from gfw_pixetl import get_module_logger
 from gfw_pixetl.errors import MissingGCSKeyError, retry_if_missing_gcs_key_error
+from gfw_pixetl.settings.globals import GLOBALS
 from gfw_pixetl.sources import RasterSource
 from gfw_pixetl.utils import get_bucket, upload_geometries
-from gfw_pixetl.utils.aws import get_s3_client
+from gfw_pixetl.utils.aws import list_s3_objects
+
+LOGGER = get_module_logger(__name__)
 
 
 class DummyTile(object):
@@ -22,16 +27,13 @@ class DummyTile(object):
 
 
 def get_aws_files(bucket: str, prefix: str) -> List[str]:
-    """Get all geotiffs in S3."""
-    s3_client = get_s3_client()
-    response = s3_client.list_objects_v2(Bucket=bucket, Prefix=prefix)
-
-    objs = response.get("Contents", [])
+    """Get all geotiffs in S3, following pagination."""
     files = [
         f"/vsis3/{bucket}/{obj['Key']}"
-        for obj in objs
+        for obj in list_s3_objects(bucket, prefix)
         if os.path.splitext(obj["Key"])[1] == ".tif"
     ]
+    LOGGER.info(f"Found {len(files)} geotiffs in s3://{bucket}/{prefix}")
 
     return files
 
@@ -48,12 +50,16 @@ def get_gs_files(bucket: str, prefix: str) -> List[str]:
     except DefaultCredentialsError:
         raise MissingGCSKeyError()
 
-    blobs = storage_client.list_blobs(bucket, prefix=prefix)
+    # Iterator requests next page once current page is exhausted
+    blobs = storage_client.list_blobs(bucket, prefix=prefix, page_size=1000)
     files = [
         f"/vsigs/{bucket}/{blob.name}"
-        for blob in blobs
+        for page in blobs.pages
+        for blob in page
         if os.path.splitext(blob.name)[1] == ".tif"
     ]
+    LOGGER.info(f"Found {len(files)} geotiffs in gs://{bucket}/{prefix}")
+
     return files
 
 
@@ -62,6 +68,43 @@ def get_key_from_vsi(vsi_path: str) -> str:
     return "/".join(key)
 
 
+def read_tile(uri: str) -> DummyTile:
+    """Read header of remote file.
+
+    RasterSource already retries I/O errors while fetching metadata,
+    but not missing files.
+    """
+    return DummyTile(RasterSource(uri))  # type: ignore
+
+
+def _try_read_tile(uri: str) -> Tuple[str, Optional[DummyTile]]:
+    try:
+        return uri, read_tile(uri)
+    except Exception as e:
+        LOGGER.error(f"Could not read header of file {uri}: {e}")
+        return uri, None
+
+
+def read_tiles(files: List[str]) -> List[DummyTile]:
+    """Read headers of all files concurrently.
+
+    Raise an exception listing all files which could not be read, so
+    that we never write an incomplete catalog.
+    """
+    LOGGER.info(
+        f"Read headers of {len(files)} files using "
+        f"{GLOBALS.prep_read_workers} threads"
+    )
+    with ThreadPoolExecutor(max_workers=GLOBALS.prep_read_workers) as executor:
+        results = list(executor.map(_try_read_tile, files))
+
+    failed: List[str] = [uri for uri, tile in results if tile is None]
+    if failed:
+        raise RuntimeError(f"Could not read headers of {len(failed)} files: {failed}")
+
+    return [tile for _, tile in results if tile is not None]
+
+
 def create_geojsons(
     bucket: str,
     key: str,
@@ -74,11 +117,7 @@ def create_geojsons(
 
     get_files = {"s3": get_aws_files, "gs": get_gs_files}
     files = get_files[provider](bucket, key)
-    tiles = list()
-
-    for uri in files:
-        src = RasterSource(uri)
-        tiles.append(DummyTile(src))  # type: ignore
+    tiles = read_tiles(files)
 
     data_lake_bucket = get_bucket()
     upload_geometries.upload_geojsons(
@@ -1,4 +1,8 @@
+import warnings
+
+import numpy as np
 from aenum import Enum, extend_enum
+from numpy.ma import MaskedArray
 from rasterio.enums import Resampling
 
 from gfw_pixetl import get_module_logger
@@ -23,3 +27,62 @@ def resampling_factory(method: str) -> Resampling:
         raise ValueError(f"Resampling method `{method}` is not supported.")
 
     return resampling
+
+
+def downsample(array: MaskedArray, resampling: Resampling) -> MaskedArray:
+    """Halve width and height of a 2D array, combining each block of 2x2
+    pixels using resampling method.
+
+    Masked pixels are ignored and blocks without any valid pixel stay
+    masked. All four pixels of a block have the same weight, so
+    interpolating methods (bilinear, cubic, ...) reduce to average.
+    Results keep the data type of the input array.
+    """
+    height, width = array.shape
+    array = np.ma.masked_array(array, mask=np.ma.getmaskarray(array))
+    if resampling == Resampling.nearest:
+        return array[::2, ::2]
+
+    blocks: MaskedArray = (
+        array.reshape(height // 2, 2, width // 2, 2)
+        .swapaxes(1, 2)
+        .reshape(height // 2, width // 2, 4)
+    )
+    valid: np.ndarray = ~blocks.mask
+    empty: np.ndarray = ~valid.any(axis=2)
+
+    if resampling == Resampling.mode:
+        # Most frequent valid value of each block, first one in case of ties
+        equal = (blocks.data[..., :, None] == blocks.data[..., None, :]) & valid[
+            ..., None, :
+        ]
+        counts = equal.sum(axis=3) * valid
+        first = counts.argmax(axis=2)[..., None]
+        result = np.take_along_axis(blocks.data, first, axis=2)[..., 0]
+    elif resampling == Resampling.max:
+        result = blocks.max(axis=2).data
+    elif resampling == Resampling.min:
+        result = blocks.min(axis=2).data
+    elif resampling == Resampling.sum:
+        result = blocks.sum(axis=2).data
+    elif resampling == Resampling.rms:
+        result = np.sqrt((blocks.astype("float64") ** 2).mean(axis=2).data)
+    elif resampling in (Resampling.med, Resampling.q1, Resampling.q3):
+        percentile = {Resampling.med: 50, Resampling.q1: 25, Resampling.q3: 75}
+        with warnings.catch_warnings():
+            # blocks without valid pixels
+            warnings.simplefilter("ignore", RuntimeWarning)
+            result = np.nanpercentile(
+                blocks.astype("float64").filled(np.nan),
+                percentile[resampling],
+                axis=2,
+            )
+    else:
+        result = blocks.mean(axis=2).data
+
+    if np.issubdtype(array.dtype, np.integer):
+        info = np.iinfo(array.dtype)
+        result = np.clip(np.rint(np.nan_to_num(result)), info.min, info.max)
+    return np.ma.masked_array(
+        result.astype(array.dtype), mask=empty, fill_value=array.fill_value
+    )
@@ -32,6 +32,13 @@ class GdalEnv(EnvSettings):
     gdal_http_max_retry: int = 4
     gdal_http_retry_delay: int = 10
     vsi_cache: str = "YES"  # file can be cached in RAM.  Content in that cache is discarded when the file handle is closed.
+    # Remote read settings, unless set, read tuning chooses them at job start
+    vsi_cache_size: Optional[int] = None
+    cpl_vsil_curl_chunk_size: Optional[int] = None
+    cpl_vsil_curl_cache_size: Optional[int] = None
+    gdal_http_version: Optional[str] = None
+    gdal_http_multiplex: Optional[str] = None
+    gdal_http_merge_consecutive_ranges: Optional[str] = None
     aws_https: Optional[str] = None
     aws_virtual_hosting: Optional[str] = None
     aws_s3_endpoint: Optional[str] = set_aws_s3_endpoint()
@@ -3,7 +3,7 @@ from typing import Optional
 
 import psutil
 import pydantic
-from pydantic import Field, PositiveInt
+from pydantic import Field, PositiveFloat, PositiveInt
 
 from gfw_pixetl import get_module_logger
 from gfw_pixetl.models.enums import DstFormat
@@ -36,6 +36,10 @@ class Globals(EnvSettings):
     #####################
 
     default_dst_format = DstFormat.geotiff
+    verify_existing_tiles: bool = Field(
+        False,
+        description="Open header of tiles found in target location to verify their integrity before skipping them",
+    )
 
     #####################
     # Resource management
@@ -53,6 +57,56 @@ class Globals(EnvSettings):
     workers: PositiveInt = Field(
         1, description="Number of workers to use to execute job."
     )
+    shared_tile_buffer: bool = Field(
+        True,
+        description="Let co-workers write windows into a memory mapped tile buffer "
+        "instead of separate files, which are merged afterwards",
+    )
+    gdal_cache_fraction: PositiveFloat = Field(
+        0.1,
+        description="Fraction of memory per worker reserved for GDAL block caches",
+    )
+    warp_mem_fraction: PositiveFloat = Field(
+        0.1,
+        description="Fraction of memory per worker reserved for warp buffers",
+    )
+    worker_max_rss_fraction: PositiveFloat = Field(
+        0.75,
+        description="Fraction of memory per co-worker a window worker may hold "
+        "before it is replaced by a fresh process",
+    )
+    upload_workers: PositiveInt = Field(
+        4, description="Number of files each process uploads at the same time"
+    )
+    upload_concurrency: PositiveInt = Field(
+        4, description="Number of parts uploaded at the same time per file"
+    )
+    upload_chunk_size: PositiveInt = Field(
+        64, description="Size of multipart upload chunks in MB"
+    )
+    tune_reads: bool = Field(
+        True,
+        description="Probe latency and throughput of the source at job start "
+        "and choose remote read settings accordingly",
+    )
+    read_concurrency: Optional[PositiveInt] = Field(
+        None,
+        description="Minimum number of processes reading windows at the same time "
+        "across all workers, chosen by read tuning unless set",
+    )
+    source_cache_dir: Optional[str] = Field(
+        None,
+        description="Directory on the ephemeral volume in which all workers of a host "
+        "cache byte ranges of remote source files. Caching is disabled if not set",
+    )
+    source_cache_min_free: PositiveInt = Field(
+        10000,
+        description="Free space in MB to keep on the volume of the source cache, "
+        "least recently used chunks are deleted to stay above",
+    )
+    prep_read_workers: PositiveInt = Field(
+        32, description="Number of file headers pixetl_prep reads at the same time"
+    )
 
     ########################
     # PostgreSQL authentication
@@ -68,6 +122,12 @@ class Globals(EnvSettings):
     db_name: Optional[str] = Field(
         None, env="PGDATABASE", description="PostgreSQL database name"
     )
+    db_pool_size: PositiveInt = Field(
+        2, description="Max number of PostgreSQL connections per process"
+    )
+    rasterize_batch_size: PositiveInt = Field(
+        10000, description="Number of geometries fetched and burned at once"
+    )
 
     ######################
     # AWS configuration
@@ -20,6 +20,7 @@ from gfw_pixetl.errors import retry_if_rasterio_error
 from gfw_pixetl.models.types import Bounds
 from gfw_pixetl.settings.gdal import GDAL_ENV
 from gfw_pixetl.utils import get_bucket, utils
+from gfw_pixetl.utils.aws import list_s3_objects
 from gfw_pixetl.utils.gdal import get_metadata
 from gfw_pixetl.utils.type_casting import replace_inf_nan
 
@@ -288,9 +289,25 @@ class Destination(Raster):
     def prefix(self) -> str:
         return "/".join(self.uri.split("/")[:-1])
 
-    def exists(self) -> bool:
+    def exists(
+        self, index: Optional["DestinationIndex"] = None, verify: bool = False
+    ) -> bool:
+        """Check if tile exists in target location.
+
+        When an index of existing objects is provided, we only open the
+        file header if we want to verify integrity of the existing file.
+        """
         if not self.url:
             raise Exception("Tile URL is not set")
+
+        if index is not None:
+            if not index.exists(self.uri):
+                LOGGER.debug(f"File {self.url} not listed in destination index")
+                return False
+            elif not verify:
+                LOGGER.debug(f"File {self.url} listed in destination index")
+                return True
+
         try:
             self.fetch_meta()
             LOGGER.debug(f"File {self.url} exists")
@@ -300,6 +317,43 @@ class Destination(Raster):
             return False
 
 
+class DestinationIndex(object):
+    """In-memory index of all objects which already exist under a given
+    destination prefix.
+
+    Objects are listed once in bulk, so that we don't have to open
+    every single tile header to find out if it already exists.
+    """
+
+    def __init__(self, bucket: str, prefix: str) -> None:
+        self.bucket: str = bucket
+        self.prefix: str = prefix
+
+        LOGGER.info(f"Index existing objects in s3://{bucket}/{prefix}")
+        self.objects: Dict[str, Tuple[int, str]] = {
+            obj["Key"]: (obj["Size"], obj["ETag"].strip('"'))
+            for obj in list_s3_objects(bucket, prefix)
+        }
+        LOGGER.info(f"Found {len(self.objects)} existing objects")
+
+    def __len__(self) -> int:
+        return len(self.objects)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.objects
+
+    def exists(self, key: str) -> bool:
+        """Empty objects can't be valid tiles and are considered
+        missing."""
+        return key in self.objects and self.size(key) > 0
+
+    def size(self, key: str) -> int:
+        return self.objects[key][0]
+
+    def etag(self, key: str) -> str:
+        return self.objects[key][1]
+
+
 def _file_does_not_exist(e: Exception) -> bool:
     """Check if RasterIO can access file.
 
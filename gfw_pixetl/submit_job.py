@@ -1,6 +1,49 @@
+import math
+import os
+from typing import Dict, Iterable, List, Set, Tuple
+
+import numpy as np
 import yaml
+from shapely.geometry import box
+
+from gfw_pixetl import get_module_logger
+from gfw_pixetl.grids import Grid
+from gfw_pixetl.layers import Layer, RasterSrcLayer, layer_factory
+from gfw_pixetl.models.named_tuples import JobResources
+from gfw_pixetl.models.pydantic import LayerModel
+from gfw_pixetl.settings.globals import GLOBALS
+from gfw_pixetl.utils.aws import get_batch_client, list_s3_objects
+
+LOGGER = get_module_logger(__name__)
+
+# vCPUs we request, r5d instances come with 8 GB memory per vCPU
+VCPUS = [2, 4, 8, 16, 32, 48]
+MIN_MEMORY_PER_VCPU = 2000
+MAX_MEMORY_PER_VCPU = 7900
+
+# Memory each worker needs besides its windows (interpreter, GDAL, pools)
+BASE_MEMORY_PER_VCPU = 1500
 
-from gfw_pixetl.utils.aws import get_batch_client
+# Windows of a worker span at least this many block rows of a tile and are
+# held as source, warped and output array, calc adds two intermediate arrays
+WINDOW_BLOCK_ROWS = 8
+WINDOW_BUFFERS = 3
+CALC_BUFFERS = 2
+
+# Throughput of one vCPU in bytes per second, measured as uncompressed
+# output and as compressed source data
+OUTPUT_BYTES_PER_SECOND = 20000000
+SOURCE_BYTES_PER_SECOND = 10000000
+CALC_FACTOR = 1.5
+
+# Jobs should finish within target duration, if enough vCPUs are available.
+# Timeouts leave room for slow instances and are never shorter than the
+# minimum or longer than the maximum
+TARGET_DURATION = 3600
+STARTUP_DURATION = 600
+TIMEOUT_FACTOR = 3
+MIN_TIMEOUT = 1800
+MAX_TIMEOUT = 86400
 
 
 def define_jobs():
@@ -28,6 +71,13 @@ def define_jobs():
                         grid,
                         "--overwrite",
                     ]
+                    layer_def = _layer_def(
+                        layer,
+                        attribute,
+                        layers[layer][attribute],
+                        grid,
+                        layers[layer][attribute]["grids"][grid],
+                    )
 
                     if "uri" in layers[layer][attribute]["grids"][grid].keys():
                         runnable.append(
@@ -36,6 +86,7 @@ def define_jobs():
                                 "job_name": job_name,
                                 "command": command,
                                 "grid": grid,
+                                "layer_def": layer_def,
                             }
                         )
 
@@ -49,6 +100,7 @@ def define_jobs():
                                     "depends_on"
                                 ],
                                 "grid": grid,
+                                "layer_def": layer_def,
                             }
                         )
 
@@ -75,20 +127,18 @@ def jobs():
                 dependent.append(job)
 
 
-def submit_job(job, depends_on=None):
-    batch_client = get_batch_client()
+def submit_job(job, depends_on=None, batch_client=None):
+    if batch_client is None:
+        batch_client = get_batch_client()
 
     job_name = job["job_name"]
     job_queue = "pixetl-job-queue"
     job_definition = "pixetl"
     command = job["command"]
-    grid = job["grid"]
 
-    vcpus = 48 if grid == "10/40000" else 8
-    memory = 380000 if grid == "10/40000" else 63000
+    resources: JobResources = estimate_resources(layer_factory(job["layer_def"]))
 
     attempts = 2
-    attempt_duration_seconds = 7200
 
     if depends_on is None:
         depends_on = list()
@@ -98,13 +148,157 @@ def submit_job(job, depends_on=None):
         jobQueue=job_queue,
         dependsOn=depends_on,
         jobDefinition=job_definition,
-        containerOverrides={"command": command, "vcpus": vcpus, "memory": memory},
+        containerOverrides={
+            "command": command,
+            "vcpus": resources.vcpus,
+            "memory": resources.memory,
+        },
         retryStrategy={"attempts": attempts},
-        timeout={"attemptDurationSeconds": attempt_duration_seconds},
+        timeout={"attemptDurationSeconds": resources.timeout},
     )
 
     return response["jobId"]
 
 
+def estimate_resources(layer: Layer) -> JobResources:
+    """Size job by the amount of data it has to read and write.
+
+    Work grows with the number of tiles intersecting with the source,
+    the size of output pixels, calc expressions and the volume of
+    source files. vCPUs are chosen so that the job finishes within
+    TARGET_DURATION, memory so that each worker can hold windows of
+    a few block rows next to its caches.
+    """
+    tiles, source_files = _intersecting_tiles(layer)
+    source_bytes: int = _source_bytes(source_files)
+
+    grid: Grid = layer.grid
+    itemsize: int = np.dtype(layer.dst_profile["dtype"]).itemsize
+    output_bytes: int = tiles * grid.cols * grid.rows * itemsize
+
+    cpu_seconds: float = output_bytes / OUTPUT_BYTES_PER_SECOND * (
+        CALC_FACTOR if layer.calc else 1
+    ) + (source_bytes / SOURCE_BYTES_PER_SECOND)
+
+    vcpus: int = next(
+        (v for v in VCPUS if cpu_seconds / v <= TARGET_DURATION), VCPUS[-1]
+    )
+
+    buffers: int = WINDOW_BUFFERS + (CALC_BUFFERS if layer.calc else 0)
+    window_bytes: int = (
+        grid.cols
+        * layer.dst_profile["blockysize"]
+        * WINDOW_BLOCK_ROWS
+        * itemsize
+        * buffers
+    )
+    window_fraction: float = 1 - GLOBALS.gdal_cache_fraction - GLOBALS.warp_mem_fraction
+    memory_per_vcpu: float = (
+        BASE_MEMORY_PER_VCPU + window_bytes / window_fraction / 1000000
+    )
+    memory: int = vcpus * int(
+        min(max(memory_per_vcpu, MIN_MEMORY_PER_VCPU), MAX_MEMORY_PER_VCPU)
+    )
+
+    duration: float = STARTUP_DURATION + cpu_seconds / vcpus
+    timeout: int = int(min(max(duration * TIMEOUT_FACTOR, MIN_TIMEOUT), MAX_TIMEOUT))
+    if duration > MAX_TIMEOUT:
+        LOGGER.warning(
+            f"Layer {layer.name} might need {duration:.0f}s, "
+            f"more than the maximum timeout of {MAX_TIMEOUT}s"
+        )
+
+    resources = JobResources(
+        tiles=tiles,
+        source_bytes=source_bytes,
+        vcpus=vcpus,
+        memory=memory,
+        timeout=timeout,
+    )
+    LOGGER.info(f"Estimated resources for layer {layer.name}: {resources}")
+    return resources
+
+
+def _layer_def(
+    dataset: str, pixel_meaning: str, attributes, grid: str, grid_attributes
+) -> LayerModel:
+    """Layer definition of a layer listed in sources.yaml."""
+    return LayerModel(
+        dataset=dataset,
+        version=attributes["version"],
+        source_type=grid_attributes.get("type", "raster"),
+        pixel_meaning=pixel_meaning,
+        data_type=attributes["data_type"].lower(),
+        no_data=attributes.get("no_data"),
+        grid=grid,
+        source_uri=grid_attributes.get("uri"),
+        resampling=grid_attributes.get("resampling", "nearest"),
+        calc=grid_attributes.get("calc"),
+    )
+
+
+def _intersecting_tiles(layer: Layer) -> Tuple[int, Set[str]]:
+    """Number of grid tiles which intersect with the source catalog and the
+    source files they intersect with.
+
+    Without a catalog (vector sources or layers derived from other
+    layers) we assume that the source covers the entire grid.
+    """
+    tile_ids: Iterable[str] = layer.grid.get_tile_ids()
+    if not isinstance(layer, RasterSrcLayer) or not layer.has_catalog:
+        return len(list(tile_ids)), set()
+
+    tiles: int = 0
+    source_files: Set[str] = set()
+    for tile_id in tile_ids:
+        bounds = layer.grid.get_tile_bounds(tile_id)
+        geom = box(
+            *layer.grid.to_wgs84(bounds.left, bounds.bottom),
+            *layer.grid.to_wgs84(bounds.right, bounds.top),
+        )
+        files: List[str] = [f[1] for f in layer.catalog.intersecting_files(geom)]
+        if files:
+            tiles += 1
+            source_files.update(files)
+
+    return tiles, source_files
+
+
+def _source_bytes(source_files: Iterable[str]) -> int:
+    """Size of source files on S3.
+
+    Files are looked up by listing their folders once. Files which are
+    not on S3 or cannot be found are estimated with the mean size of all
+    other files.
+    """
+    folders: Dict[Tuple[str, str], List[str]] = dict()
+    unknown: int = 0
+    for source_file in source_files:
+        parts: List[str] = source_file.split("/")
+        if len(parts) < 4 or parts[1] != "vsis3":
+            unknown += 1
+            continue
+        bucket, key = parts[2], "/".join(parts[3:])
+        folder: str = os.path.dirname(key)
+        folders.setdefault((bucket, f"{folder}/" if folder else ""), list()).append(key)
+
+    sizes: List[int] = list()
+    for (bucket, prefix), keys in folders.items():
+        objects: Dict[str, int] = {
+            obj["Key"]: obj["Size"] for obj in list_s3_objects(bucket, prefix)
+        }
+        for key in keys:
+            if key in objects:
+                sizes.append(objects[key])
+            else:
+                unknown += 1
+
+    if unknown:
+        LOGGER.warning(f"Could not find size of {unknown} source files")
+    if not sizes:
+        return 0
+    return sum(sizes) + math.ceil(unknown * sum(sizes) / len(sizes))
+
+
 if __name__ == "__main__":
     jobs()
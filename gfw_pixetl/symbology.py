@@ -0,0 +1,99 @@
+from typing import Dict, Optional, Union
+
+import numpy as np
+from pydantic.types import StrictInt
+
+from gfw_pixetl import get_module_logger
+from gfw_pixetl.models.enums import ColorMapType
+from gfw_pixetl.models.pydantic import RGBA, Symbology
+from gfw_pixetl.models.types import OrderedColorMap
+
+LOGGER = get_module_logger(__name__)
+
+# Integer data types small enough to precompute colors for every possible value
+LUT_DTYPES = ("uint8", "int8", "uint16", "int16")
+
+
+def ordered_colormap(
+    symbology: Symbology, no_data: Optional[Union[int, float]] = None
+) -> OrderedColorMap:
+    """Create value - quadruplet colormap (GDAL format) including no data
+    value."""
+    colormap: Dict[Union[StrictInt, float], RGBA] = dict(symbology.colormap)
+
+    # add no data value to colormap, if exists
+    if no_data is not None:
+        colormap[no_data] = RGBA(red=0, green=0, blue=0, alpha=0)  # type: ignore
+
+    # make sure values are correctly sorted and convert to value-quadruplet
+    return {value: colormap[value].tuple() for value in sorted(colormap.keys())}
+
+
+class Colorizer(object):
+    """Render single band data as RGBA, same as `gdaldem color-relief
+    -alpha`.
+
+    Gradient colormaps linearly interpolate colors between entries
+    and use the color of the closest entry outside the colormap range.
+    Discrete colormaps only color exact matches, all other pixels are
+    transparent. For small integer data types, colors of all possible
+    values are precomputed into a lookup table.
+    """
+
+    def __init__(
+        self,
+        symbology: Symbology,
+        dtype: str,
+        no_data: Optional[Union[int, float]] = None,
+    ) -> None:
+        self.type: ColorMapType = symbology.type
+        self.dtype: np.dtype = np.dtype(dtype)
+
+        colormap = ordered_colormap(symbology, no_data)
+        self.values: np.ndarray = np.array(list(colormap.keys()), dtype="float64")
+        self.colors: np.ndarray = np.array(list(colormap.values()), dtype="uint8")
+
+        self.lut: Optional[np.ndarray] = None
+        self.lut_offset: int = 0
+        if self.dtype.name in LUT_DTYPES:
+            info = np.iinfo(self.dtype)
+            self.lut_offset = int(info.min)
+            self.lut = self._render(np.arange(info.min, int(info.max) + 1))
+
+    def __call__(self, array: np.ndarray) -> np.ndarray:
+        """Render array of shape (1, rows, cols) or (rows, cols) into RGBA
+        array of shape (4, rows, cols)."""
+        if array.ndim == 3:
+            array = array[0]
+
+        if self.lut is None or not np.issubdtype(array.dtype, np.integer):
+            return self._render(array)
+
+        index = array if not self.lut_offset else array.astype("int32") - self.lut_offset
+        rgba = np.empty((4,) + array.shape, dtype="uint8")
+        for band in range(4):
+            np.take(self.lut[band], index, out=rgba[band], mode="clip")
+        return rgba
+
+    def _render(self, array: np.ndarray) -> np.ndarray:
+        if self.type == ColorMapType.discrete:
+            return self._discrete(array)
+        return self._gradient(array)
+
+    def _gradient(self, array: np.ndarray) -> np.ndarray:
+        rgba = np.zeros((4,) + array.shape, dtype="uint8")
+        valid = ~np.isnan(array) if array.dtype.kind == "f" else Ellipsis
+        for band in range(4):
+            color = np.interp(array[valid], self.values, self.colors[:, band])
+            rgba[band][valid] = np.floor(color + 0.5)
+        return rgba
+
+    def _discrete(self, array: np.ndarray) -> np.ndarray:
+        index = np.searchsorted(self.values, array)
+        index = np.clip(index, 0, self.values.size - 1)
+        match = self.values[index] == array
+
+        rgba = np.zeros((4,) + array.shape, dtype="uint8")
+        for band in range(4):
+            rgba[band][match] = self.colors[index[match], band]
+        return rgba
@@ -6,3 +6,4 @@ isort:skip_file
 from gfw_pixetl.tiles.tile import Tile  # noqa: F401
 from gfw_pixetl.tiles.raster_src_tile import RasterSrcTile  # noqa: F401
 from gfw_pixetl.tiles.vector_src_tile import VectorSrcTile  # noqa: F401
+from gfw_pixetl.tiles.pyramid_tile import PyramidTile  # noqa: F401
@@ -0,0 +1,126 @@
+import os
+from typing import List
+
+import numpy as np
+import rasterio
+from numpy.ma import MaskedArray
+from rasterio.io import DatasetReader
+from rasterio.windows import Window
+from retrying import retry
+
+from gfw_pixetl import get_module_logger, utils
+from gfw_pixetl.errors import retry_if_rasterio_io_error
+from gfw_pixetl.grids import WebMercatorGrid
+from gfw_pixetl.layers import Layer
+from gfw_pixetl.resampling import downsample
+from gfw_pixetl.settings.gdal import GDAL_ENV
+from gfw_pixetl.tiles import Tile
+from gfw_pixetl.tiles.writer import TileWriter
+
+LOGGER = get_module_logger(__name__)
+
+
+class PyramidTile(Tile):
+    """Tile of a lower zoom level, built by reducing the tiles of the next
+    higher zoom level of the same layer.
+
+    Tiles of the higher zoom level are read from the data lake, the
+    original source of the layer is never read again.
+    """
+
+    def __init__(
+        self,
+        tile_id: str,
+        grid: WebMercatorGrid,
+        layer: Layer,
+        src_layer: Layer,
+        src_tile_ids: List[str],
+    ) -> None:
+        super().__init__(tile_id, grid, layer)
+        self.src_layer: Layer = src_layer
+        self.src_tile_ids: List[str] = src_tile_ids
+
+    def within(self) -> bool:
+        """Check if any tile of the next higher zoom level exists."""
+        return bool(self.src_tile_ids)
+
+    def src_key(self, src_tile_id: str) -> str:
+        return os.path.join(
+            self.src_layer.prefix, self.default_format, f"{src_tile_id}.tif"
+        )
+
+    def reduce(self) -> bool:
+        """Write 2x2 reductions of all tiles of the next higher zoom level
+        into this tile, using the resampling method of the layer."""
+        LOGGER.info(f"Build tile {self.tile_id} of {self.grid.name}")
+
+        try:
+            has_data = self._reduce()
+
+        except Exception as e:
+            LOGGER.exception(e)
+            self.status = "failed"
+            has_data = True
+
+        return has_data
+
+    def _reduce(self) -> bool:
+        self.stats = self.new_stats()
+        has_data = False
+        with self.local_dst_writer("w") as writer:
+            for src_tile_id in self.src_tile_ids:
+                has_data |= self._reduce_src_tile(src_tile_id, writer)
+
+        for dst_format in writer.formats:
+            self.set_local_dst(dst_format)
+
+        if has_data:
+            self.postprocessing()
+        return has_data
+
+    def _reduce_src_tile(self, src_tile_id: str, writer: TileWriter) -> bool:
+        """Reduce source tile strip by strip, each strip covering one row of
+        blocks in this tile."""
+        src_bounds = self.src_layer.grid.get_tile_bounds(src_tile_id)
+        col_off = round((src_bounds.left - self.bounds.left) / self.grid.xres)
+        row_off = round((self.bounds.top - src_bounds.top) / self.grid.yres)
+        strip_height = 2 * self.grid.blockysize
+
+        has_data = False
+        with rasterio.Env(**GDAL_ENV), rasterio.open(
+            f"/vsis3/{utils.get_bucket()}/{self.src_key(src_tile_id)}"
+        ) as src:
+            for row in range(0, src.height, strip_height):
+                array = self._read_strip(
+                    src, Window(0, row, src.width, min(strip_height, src.height - row))
+                )
+                if array.mask.all():
+                    continue
+                has_data = True
+
+                reduced: MaskedArray = downsample(array, self.layer.resampling)
+                block = self.render(self._fill(reduced))
+                if self.stats is not None:
+                    self.stats.update(block)
+                writer.write(
+                    block.reshape((-1,) + block.shape[-2:]),
+                    Window(
+                        col_off, row_off + row // 2, reduced.shape[1], reduced.shape[0]
+                    ),
+                )
+
+        return has_data
+
+    @retry(
+        retry_on_exception=retry_if_rasterio_io_error,
+        stop_max_attempt_number=7,
+        wait_exponential_multiplier=1000,
+        wait_exponential_max=300000,
+    )  # Wait 2^x * 1000 ms between retries by to 300 sec, then 300 sec afterwards.
+    def _read_strip(self, src: DatasetReader, window: Window) -> MaskedArray:
+        """Read strip of source tile."""
+        return src.read(1, window=window, masked=True)
+
+    def _fill(self, array: MaskedArray) -> np.ndarray:
+        nodata = self.dst[self.default_format].nodata
+        return array.filled(nodata if nodata is not None else 0)
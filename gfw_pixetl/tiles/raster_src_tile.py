@@ -1,63 +1,85 @@
 import os
+from concurrent.futures import ThreadPoolExecutor
 from copy import deepcopy
-from math import floor, sqrt
-from multiprocessing import Pool
-from multiprocessing.pool import Pool as PoolType
+from functools import partial
+from math import ceil, floor, sqrt
 from typing import Iterator, List, Optional, Tuple
 from urllib.parse import urlparse
 
 import numpy as np
 import rasterio
 from numpy.ma import MaskedArray
+from rasterio.crs import CRS
+from rasterio.enums import Resampling
+from rasterio.env import set_gdal_config
 from rasterio.io import DatasetReader, DatasetWriter
 from rasterio.shutil import copy as raster_copy
 from rasterio.vrt import WarpedVRT
 from rasterio.warp import transform_bounds
-from rasterio.windows import Window, bounds, from_bounds, union
+from rasterio.windows import Window, bounds, from_bounds
 from retrying import retry
+from shapely.geometry import box
 
 from gfw_pixetl import get_module_logger, utils
-from gfw_pixetl.decorators import lazy_property, processify
+from gfw_pixetl.calc import get_calc_expression
+from gfw_pixetl.decorators import lazy_property
 from gfw_pixetl.errors import retry_if_rasterio_io_error
 from gfw_pixetl.grids import Grid
 from gfw_pixetl.layers import RasterSrcLayer
+from gfw_pixetl.models.named_tuples import SourceLayout
+from gfw_pixetl.models.pydantic import StageMetrics
 from gfw_pixetl.models.types import Bounds
 from gfw_pixetl.settings.gdal import GDAL_ENV
 from gfw_pixetl.settings.globals import GLOBALS
-from gfw_pixetl.sources import RasterSource
+from gfw_pixetl.sources import Destination, RasterSource
 from gfw_pixetl.tiles import Tile
 from gfw_pixetl.utils.aws import download_s3
 from gfw_pixetl.utils.gdal import create_vrt
 from gfw_pixetl.utils.google import download_gcs
+from gfw_pixetl.utils.memory import MemoryGovernor, get_memory_governor
 from gfw_pixetl.utils.path import create_dir, from_vsi
+from gfw_pixetl.utils.read_tuning import MAX_CHUNK_SIZE
+from gfw_pixetl.utils.report import (
+    add_cache_usage,
+    add_metrics,
+    add_worker_usage,
+    cache_usage,
+    measure,
+)
+from gfw_pixetl.utils.source_cache import open_source
+from gfw_pixetl.utils.stats import RasterStats
+from gfw_pixetl.utils.worker_pool import WorkerPool
 
 LOGGER = get_module_logger(__name__)
 
 Windows = Tuple[Window, Window]
 
+# Resampling kernels reach up to this many destination pixels beyond a window
+KERNEL_BUFFER = 2
+
 
 class RasterSrcTile(Tile):
     def __init__(self, tile_id: str, grid: Grid, layer: RasterSrcLayer) -> None:
         super().__init__(tile_id, grid, layer)
         self.layer: RasterSrcLayer = layer
+        self._tile_buffer: Optional[np.memmap] = None
         # self.src: RasterSource = RasterSource(uri=self._vrt())
 
     @lazy_property
     def src(self) -> RasterSource:
         LOGGER.debug(f"Find input files for {self.tile_id}")
         input_files = list()
-        for f in self.layer.input_files:
-            if self.dst[self.default_format].geom.intersects(f[0]) and not self.dst[
-                self.default_format
-            ].geom.touches(f[0]):
-                LOGGER.debug(f"Add file {f[1]} to input files for {self.tile_id}")
-
-                if self.layer.process_locally:
-                    input_file = self._download_source_file(f[1])
-                else:
-                    input_file = f[1]
+        for f in self.layer.catalog.intersecting_files(
+            self.dst[self.default_format].geom
+        ):
+            LOGGER.debug(f"Add file {f[1]} to input files for {self.tile_id}")
+
+            if self.layer.process_locally:
+                input_file = self._download_source_file(f[1])
+            else:
+                input_file = f[1]
 
-                input_files.append(input_file)
+            input_files.append(input_file)
 
         if not len(input_files):
             raise Exception(
@@ -105,11 +127,7 @@ class RasterSrcTile(Tile):
 
     def within(self) -> bool:
         """Check if target tile extent intersects with source extent."""
-        return (
-            # must intersect, but we don't want geometries that only share an exterior point
-            self.dst[self.default_format].geom.intersects(self.layer.geom)
-            and not self.dst[self.default_format].geom.touches(self.layer.geom)
-        )
+        return self.layer.catalog.intersects(self.dst[self.default_format].geom)
 
     def transform(self) -> bool:
         """Write input data to output tile."""
@@ -133,26 +151,40 @@ class RasterSrcTile(Tile):
         return has_data
 
     def _src_to_vrt(self) -> Tuple[DatasetReader, WarpedVRT]:
-        chunk_size = (self._block_byte_size() * self._max_blocks(),)
-        with rasterio.Env(
-            VSI_CACHE_SIZE=chunk_size,  # Cache size for current file.
-            CPL_VSIL_CURL_CHUNK_SIZE=chunk_size,  # Chunk size for partial downloads
+        governor: MemoryGovernor = get_memory_governor()
+        processes: int = self._processes()
+
+        # Block cache of this process, in addition to the one of the parent process
+        set_gdal_config("GDAL_CACHEMAX", governor.gdal_cache_bytes(processes + 1))
+
+        # Without a tuned read profile, fetch chunks of a block row,
+        # GDAL ignores chunks larger than 10 MB
+        chunk_size: int = min(
+            self._block_byte_size() * int(sqrt(self._max_blocks())), MAX_CHUNK_SIZE
+        )
+        # Keep options set for the lifetime of the worker. GDAL reads
+        # most of them whenever it fetches data, not only when opening files
+        for key, value in {
+            "VSI_CACHE_SIZE": chunk_size,  # Cache size for current file.
+            "CPL_VSIL_CURL_CHUNK_SIZE": chunk_size,  # Chunk size for partial downloads
             **GDAL_ENV,
-        ):
-            src: DatasetReader = rasterio.open(self.src.uri, "r", sharing=False)
+        }.items():
+            set_gdal_config(key, value)
 
-            transform, width, height = self._vrt_transform(
-                *self.src.reproject_bounds(self.grid.crs)
-            )
-            vrt = WarpedVRT(
-                src,
-                crs=self.dst[self.default_format].crs,
-                transform=transform,
-                width=width,
-                height=height,
-                warp_mem_limit=utils.available_memory_per_process_mb(),
-                resampling=self.layer.resampling,
-            )
+        src: DatasetReader = open_source(self.src.uri)
+
+        transform, width, height = self._vrt_transform(
+            *self.src.reproject_bounds(self.grid.crs)
+        )
+        vrt = WarpedVRT(
+            src,
+            crs=self.dst[self.default_format].crs,
+            transform=transform,
+            width=width,
+            height=height,
+            warp_mem_limit=governor.warp_mem_mb(processes),
+            resampling=self.layer.resampling,
+        )
 
         return src, vrt
 
@@ -173,29 +205,91 @@ class RasterSrcTile(Tile):
         return has_data
 
     def _process_windows_parallel(self, co_workers):
+        """Process windows in parallel.
+
+        Co-workers either fill disjoint windows of a shared tile buffer
+        or write their output into separate files.
+        """
+        LOGGER.info(f"Process tile {self.tile_id} with {co_workers} co_workers")
+
+        if GLOBALS.shared_tile_buffer:
+            return self._process_windows_shared_buffer(co_workers)
+        return self._process_windows_separate_files(co_workers)
+
+    def _process_windows_shared_buffer(self, co_workers):
+        """Process windows in parallel and write output into a memory mapped
+        tile buffer.
+
+        Afterwards, write all windows with data from buffer into final
+        files of all formats, so that every block is only encoded once.
+        """
+        profile = self.local_profile(self.default_format)
+        buffer_file: str = os.path.join(self.tmp_dir, f"{self.tile_id}.buffer")
+
+        LOGGER.debug(f"Create tile buffer {buffer_file} for tile {self.tile_id}")
+        self._tile_buffer = np.memmap(
+            buffer_file,
+            dtype=profile["dtype"],
+            mode="w+",
+            shape=(profile.get("count", 1), profile["height"], profile["width"]),
+        )
+
+        try:
+            windows: List[Tuple[Window, Optional[str]]] = self._map_windows(co_workers)
+            data_windows: List[Window] = [w for w, f in windows if f is not None]
+
+            if data_windows:
+                with self.local_dst_writer("r+") as writer:
+                    for window in data_windows:
+                        LOGGER.debug(
+                            f"Write {window} of tile {self.tile_id} from tile buffer"
+                        )
+                        writer.write(
+                            self._tile_buffer[(slice(None),) + window.toslices()],
+                            window,
+                        )
+        finally:
+            # make sure buffer is not pickled together with tile
+            self._tile_buffer = None
+            LOGGER.debug(f"Delete tile buffer {buffer_file}")
+            os.remove(buffer_file)
+
+        return bool(data_windows)
+
+    def _process_windows_separate_files(self, co_workers):
         """Process windows in parallel and write output into separate files.
 
         Create VRT of output files and copy results into final GTIFF
         """
         has_data = False
 
-        LOGGER.info(f"Process tile {self.tile_id} with {co_workers} co_workers")
-
-        pool: PoolType = Pool(processes=co_workers)
-        out_files: List[Optional[str]] = pool.map(
-            self._parallel_transform, self.windows()
+        windows: List[Tuple[Window, Optional[str]]] = self._map_windows(
+            co_workers, write_to_seperate_files=True
         )
-        all_files: List[str] = [f for f in out_files if f is not None]
+        all_files: List[str] = [f for w, f in windows if f is not None]
         if all_files:
             # merge all data into one VRT and copy to target file
             vrt_name: str = os.path.join(self.tmp_dir, f"{self.tile_id}.vrt")
             create_vrt(all_files, extent=self.bounds, vrt=vrt_name)
-            raster_copy(
-                vrt_name,
-                self.local_dst[self.default_format].uri,
-                strict=False,
-                **self.dst[self.default_format].profile,
-            )
+            # copy into all formats at once
+            with ThreadPoolExecutor() as executor:
+                futures = [
+                    executor.submit(
+                        raster_copy,
+                        vrt_name,
+                        self.local_dst[dst_format].uri,
+                        strict=False,
+                        **self.local_profile(dst_format),
+                    )
+                    for dst_format in self.stream_formats()
+                ]
+            for future in futures:
+                future.result()
+            # windows were not reduced while writing, GDAL computes overviews
+            self.rm_overviews()
+            if self.zarr_array is not None:
+                self.copy_to_zarr()
+
             # Clean up tmp files
             for f in all_files:
                 LOGGER.debug(f"Delete temporary file {f}")
@@ -208,59 +302,117 @@ class RasterSrcTile(Tile):
         """Read on window after the other and update target file."""
         LOGGER.info(f"Process tile {self.tile_id} with a single worker")
 
-        src: DatasetReader
-        vrt: WarpedVRT
-
-        src, vrt = self._src_to_vrt()
-        out_files = list()
-        for window in self.windows():
-            out_files.append(self._processified_transform(vrt, window))
+        windows: List[Tuple[Window, Optional[str]]] = self._map_windows(1)
 
-        has_data = any(value is not None for value in out_files)
+        return any(f is not None for w, f in windows)
 
-        vrt.close()
-        src.close()
+    def _map_windows(
+        self, processes: int, write_to_seperate_files=False
+    ) -> List[Tuple[Window, Optional[str]]]:
+        """Transform all windows using a pool of long lived worker processes.
 
-        return has_data
+        Every worker opens source and VRT only once. Reading float data
+        types can leak memory, so workers are replaced once their
+        resident memory grows too large.
+        """
+        all_windows: List[Window] = self.windows()
+        with measure(self.metrics, "transform.plan_windows"):
+            windows: List[Window] = self._plan_windows(all_windows)
+        add_metrics(
+            self.metrics,
+            "transform.plan_windows",
+            StageMetrics(
+                windows=len(all_windows),
+                skipped_windows=len(all_windows) - len(windows),
+            ),
+        )
 
-    def _parallel_transform(self, window) -> Optional[str]:
-        """When transforming in parallel, we need to read SRC and create VRT in
-        every process."""
-        src: DatasetReader
-        vrt: WarpedVRT
+        governor: MemoryGovernor = get_memory_governor()
+        set_gdal_config("GDAL_CACHEMAX", governor.gdal_cache_bytes(processes + 1))
+
+        with WorkerPool(
+            processes=processes,
+            func=partial(
+                self._transform_in_worker,
+                write_to_seperate_files=write_to_seperate_files,
+            ),
+            initializer=self._src_to_vrt,
+            finalizer=self._close_vrt,
+            max_rss=self._max_worker_rss(processes),
+        ) as pool:
+            results: List[
+                Tuple[Optional[str], Optional[RasterStats], Tuple[int, int]]
+            ] = pool.map(windows)
 
-        src, vrt = self._src_to_vrt()
+        LOGGER.debug(
+            f"Recycled {pool.recycled} workers while processing tile {self.tile_id}"
+        )
+        # learn from memory used by all processes to size windows of next tile
+        governor.observe(pool.peak_rss * processes + governor.rss())
+        add_worker_usage(pool.bytes_read, pool.bytes_written, pool.peak_rss * processes)
+        for _, _, (hits, misses) in results:
+            add_cache_usage(hits, misses)
+
+        # merge statistics of all windows
+        self.stats = self.new_stats()
+        if self.stats is not None:
+            for _, window_stats, _ in results:
+                self.stats.merge(window_stats)
+
+        return [
+            (window, out_file) for window, (out_file, _, _) in zip(windows, results)
+        ]
+
+    def _max_worker_rss(self, processes: int) -> float:
+        """Resident memory limit for each window worker."""
+        return (
+            get_memory_governor().budget() / processes * GLOBALS.worker_max_rss_fraction
+        )
 
-        out_data: Optional[str] = self._transform(vrt, window, True)
+    @staticmethod
+    def _processes() -> int:
+        """Number of processes which transform windows of the tile."""
+        co_workers: int = utils.get_co_workers()
+        return co_workers if co_workers >= 2 else 1
+
+    def _transform_in_worker(
+        self,
+        src_vrt: Tuple[DatasetReader, WarpedVRT],
+        window: Window,
+        write_to_seperate_files=False,
+    ) -> Tuple[Optional[str], Optional[RasterStats], Tuple[int, int]]:
+        """Transform window and report source cache usage of this worker
+        back to the parent process."""
+        hits, misses = cache_usage()
+        out_file, stats = self._transform(src_vrt[1], window, write_to_seperate_files)
+        new_hits, new_misses = cache_usage()
+        return out_file, stats, (new_hits - hits, new_misses - misses)
 
+    @staticmethod
+    def _close_vrt(src_vrt: Tuple[DatasetReader, WarpedVRT]) -> None:
+        src, vrt = src_vrt
         vrt.close()
         src.close()
 
-        return out_data
-
-    @processify
-    def _processified_transform(
-        self, vrt: WarpedVRT, window: Window, write_to_seperate_files=False
-    ) -> Optional[str]:
-        """Wrapper to run _transform in a separate process.
-
-        This will make sure that memory get completely cleared once
-        block is processed. With out this, we might experience memory
-        leakage, in particular for float data types.
-        """
-        return self._transform(vrt, window, write_to_seperate_files)
-
     def _transform(
         self, vrt: WarpedVRT, window: Window, write_to_seperate_files=False
-    ) -> Optional[str]:
+    ) -> Tuple[Optional[str], Optional[RasterStats]]:
         """Reading windows from input VRT, reproject, resample, transform and
-        write to destination."""
+        write to destination.
+
+        Symbology and statistics of the written window are computed
+        from the array already in memory.
+        """
         masked_array: MaskedArray = self._read_window(vrt, window)
+        stats: Optional[RasterStats] = None
         if self._block_has_data(masked_array):
             LOGGER.debug(f"{window} of tile {self.tile_id} has data - continue")
             masked_array = self._calc(masked_array, window)
-            array: np.ndarray = self._set_dtype(masked_array, window)
+            array: np.ndarray = self.render(self._set_dtype(masked_array, window))
             del masked_array
+            stats = self.new_stats()
+            if stats is not None:
+                stats.update(array)
             out_file: Optional[str] = self._write_window(
                 array, window, write_to_seperate_files
             )
@@ -270,36 +422,62 @@ class RasterSrcTile(Tile):
             LOGGER.debug(f"{window} of tile {self.tile_id} has no data - skip")
             del masked_array
             out_file = None
-        return out_file
+        return out_file, stats
 
     def windows(self) -> List[Window]:
-        """Creates local output file and returns list of size optimized windows
-        to process."""
-        LOGGER.debug(f"Create local output file for tile {self.tile_id}")
-        with rasterio.Env(**GDAL_ENV):
-            with rasterio.open(
-                self.get_local_dst_uri(self.default_format),
-                "w",
-                **self.dst[self.default_format].profile,
-            ) as dst:
-                windows = [window for window in self._windows(dst)]
-        self.set_local_dst(self.default_format)
+        """Creates local output files and returns list of size optimized
+        windows to process."""
+        LOGGER.debug(f"Create local output files for tile {self.tile_id}")
+        with self.local_dst_writer("w") as writer:
+            windows = [
+                window for window in self._windows(writer.datasets[self.default_format])
+            ]
+        for dst_format in writer.formats:
+            self.set_local_dst(dst_format)
 
         return windows
 
     def _windows(self, dst: DatasetWriter) -> Iterator[Window]:
-        """Divides raster source into larger windows which will still fit into
-        memory."""
-
-        block_count: int = int(sqrt(self._max_blocks()))
-        x_blocks: int = int(dst.width / dst.block_shapes[0][0])
-        y_blocks: int = int(dst.height / dst.block_shapes[0][1])
-
-        for i in range(0, x_blocks, block_count):
-            for j in range(0, y_blocks, block_count):
-                max_i = min(i + block_count, x_blocks)
-                max_j = min(j + block_count, y_blocks)
-                window = self._union_blocks(dst, i, j, max_i, max_j)
+        """Divides destination tile into larger windows which will still fit
+        into memory.
+
+        Windows are made of whole destination blocks. Their edges follow
+        source block boundaries where possible, so that source blocks are
+        not fetched by more than one window. Strips of strip organized
+        sources are read across the entire width of the tile. Windows are
+        ordered row by row, the order in which GeoTIFFs store their
+        blocks.
+        """
+        max_blocks: int = self._max_blocks()
+        block_height, block_width = dst.block_shapes[0]
+        x_blocks: int = ceil(dst.width / block_width)
+        y_blocks: int = ceil(dst.height / block_height)
+
+        layout: SourceLayout = self._src_layout()
+        LOGGER.debug(f"Source layout of tile {self.tile_id}: {layout}")
+        if layout.strips:
+            max_x_blocks: int = min(x_blocks, max_blocks)
+            max_y_blocks: int = max(max_blocks // max_x_blocks, 1)
+        else:
+            max_x_blocks = max_y_blocks = int(sqrt(max_blocks))
+
+        cols: List[int] = self._axis_breaks(
+            x_blocks, max_x_blocks, block_width, layout.col_off, layout.block_width
+        )
+        rows: List[int] = self._axis_breaks(
+            y_blocks, max_y_blocks, block_height, layout.row_off, layout.block_height
+        )
+
+        for min_j, max_j in zip(rows[:-1], rows[1:]):
+            for min_i, max_i in zip(cols[:-1], cols[1:]):
+                col_off: int = min_i * block_width
+                row_off: int = min_j * block_height
+                window = Window(
+                    col_off,
+                    row_off,
+                    min(max_i * block_width, dst.width) - col_off,
+                    min(max_j * block_height, dst.height) - row_off,
+                )
                 try:
                     yield utils.snapped_window(
                         window.intersection(self.intersecting_window)
@@ -308,6 +486,168 @@ class RasterSrcTile(Tile):
                     if not (str(e) == "windows do not intersect"):
                         raise
 
+    def _src_layout(self) -> SourceLayout:
+        """Block layout of the first source file, in destination pixels."""
+        dst: Destination = self.dst[self.default_format]
+        with rasterio.Env(**GDAL_ENV), rasterio.open(self.src.uri) as vrt:
+            src_file: str = vrt.files[1] if vrt.driver == "VRT" else self.src.uri
+        with rasterio.Env(**GDAL_ENV), rasterio.open(src_file) as src:
+            src_block_height, src_block_width = src.block_shapes[0]
+            left, bottom, right, top = transform_bounds(
+                src.crs,
+                dst.crs,
+                *bounds(Window(0, 0, src_block_width, src_block_height), src.transform),
+            )
+            strips: bool = src_block_width >= src.width and src.width > 1
+
+        return SourceLayout(
+            block_width=(right - left) / self.grid.xres,
+            block_height=(top - bottom) / self.grid.yres,
+            col_off=(left - dst.bounds.left) / self.grid.xres,
+            row_off=(dst.bounds.top - top) / self.grid.yres,
+            strips=strips,
+        )
+
+    @staticmethod
+    def _axis_breaks(
+        blocks: int,
+        max_blocks: int,
+        block_size: int,
+        src_offset: float,
+        src_block_size: float,
+    ) -> List[int]:
+        """Block indices at which windows start along one axis, followed by
+        the total number of blocks.
+
+        Windows span at most max blocks. They end on a source block
+        boundary instead, if this still leaves them with at least half
+        of their size.
+        """
+
+        def on_src_boundary(i: int) -> bool:
+            if src_block_size <= 1:
+                return True
+            remainder: float = (i * block_size - src_offset) % src_block_size
+            return min(remainder, src_block_size - remainder) < 0.5
+
+        # windows span at least one block, or we never reach the end
+        max_blocks = max(max_blocks, 1)
+
+        breaks: List[int] = [0]
+        while breaks[-1] < blocks:
+            start: int = breaks[-1]
+            end: int = min(start + max_blocks, blocks)
+            if end < blocks:
+                end = next(
+                    (
+                        i
+                        for i in range(end, start + max(max_blocks // 2, 1) - 1, -1)
+                        if on_src_boundary(i)
+                    ),
+                    end,
+                )
+            breaks.append(end)
+        return breaks
+
+    def _plan_windows(self, windows: List[Window]) -> List[Window]:
+        """Drop windows which provably have no data before reading them.
+
+        Windows must intersect with the footprint of at least one source
+        file. If the layer trusts source overviews, windows whose
+        overviews hold no data are dropped as well. Overviews are only
+        read at their coarsest level, so that no full resolution blocks
+        are fetched.
+        """
+        planned: List[Window] = [w for w in windows if self._window_in_footprint(w)]
+
+        if planned and self.layer.probe_overviews:
+            with rasterio.Env(**GDAL_ENV), open_source(self.src.uri) as src:
+                factors: List[int] = src.overviews(1)
+                if factors:
+                    planned = [
+                        w for w in planned if self._probe_window(src, w, max(factors))
+                    ]
+                else:
+                    LOGGER.warning(
+                        f"Source of tile {self.tile_id} has no overviews - skip probe"
+                    )
+
+        LOGGER.info(
+            f"Skip {len(windows) - len(planned)} of {len(windows)} windows "
+            f"of tile {self.tile_id} without data"
+        )
+        return planned
+
+    def _window_in_footprint(self, window: Window) -> bool:
+        """Check if window intersects with footprint of any source file."""
+        dst_bounds: Bounds = self._buffered_bounds(window)
+        geom = box(
+            *transform_bounds(
+                self.dst[self.default_format].crs, CRS.from_epsg(4326), *dst_bounds
+            )
+        )
+        return self.layer.catalog.intersects(geom)
+
+    def _probe_window(self, src: DatasetReader, window: Window, factor: int) -> bool:
+        """Check if coarsest overview of source has data within window.
+
+        Averaging the overview mask keeps every overview pixel with
+        data. Overview pixels only have no data if all of their source
+        pixels have none, if the overviews were built that way.
+        """
+        src_bounds: Bounds = transform_bounds(
+            self.dst[self.default_format].crs, src.crs, *self._buffered_bounds(window)
+        )
+        src_window: Window = src.window(*src_bounds)
+        col_off: int = max(floor(src_window.col_off), 0)
+        row_off: int = max(floor(src_window.row_off), 0)
+        width: int = (
+            min(ceil(src_window.col_off + src_window.width), src.width) - col_off
+        )
+        height: int = (
+            min(ceil(src_window.row_off + src_window.height), src.height) - row_off
+        )
+        if width <= 0 or height <= 0:
+            return False
+
+        mask: np.ndarray = self._read_probe(
+            src,
+            Window(col_off, row_off, width, height),
+            (max(ceil(height / factor), 1), max(ceil(width / factor), 1)),
+        )
+        has_data: bool = bool(mask.any())
+        LOGGER.debug(
+            f"Overview probe of {window} of tile {self.tile_id} has data: {has_data}"
+        )
+        return has_data
+
+    @retry(
+        retry_on_exception=retry_if_rasterio_io_error,
+        stop_max_attempt_number=7,
+        wait_exponential_multiplier=1000,
+        wait_exponential_max=300000,
+    )  # Wait 2^x * 1000 ms between retries by to 300 sec, then 300 sec afterwards.
+    def _read_probe(
+        self, src: DatasetReader, src_window: Window, out_shape: Tuple[int, int]
+    ) -> np.ndarray:
+        """Read decimated mask of source window."""
+        return src.read_masks(
+            1, window=src_window, out_shape=out_shape, resampling=Resampling.average
+        )
+
+    def _buffered_bounds(self, window: Window) -> Bounds:
+        """Bounds of window including all pixels resampling kernels might
+        read."""
+        return bounds(
+            Window(
+                window.col_off - KERNEL_BUFFER,
+                window.row_off - KERNEL_BUFFER,
+                window.width + 2 * KERNEL_BUFFER,
+                window.height + 2 * KERNEL_BUFFER,
+            ),
+            self.dst[self.default_format].transform,
+        )
+
     @staticmethod
     def _block_has_data(array: MaskedArray) -> bool:
         """Check if current block has any data."""
@@ -320,11 +660,7 @@ class RasterSrcTile(Tile):
         """Apply user defined calculation on array."""
         if self.layer.calc:
             LOGGER.debug(f"Update {dst_window} of tile {self.tile_id}")
-            funcstr = (
-                f"def f(A: MaskedArray) -> MaskedArray:\n    return {self.layer.calc}"
-            )
-            exec(funcstr, globals())
-            array = f(array)  # type: ignore # noqa: F821
+            array = get_calc_expression(self.layer.calc).evaluate(array)
         else:
             LOGGER.debug(
                 f"No user defined formula provided. Skip calculating values for {dst_window} of tile {self.tile_id}"
@@ -335,30 +671,29 @@ class RasterSrcTile(Tile):
         """Calculate the maximum amount of blocks we can fit into memory,
         making sure that blocks can always fill a squared extent.
 
-        We can only use a fraction of the available memory per process
-        per block b/c we might have multiple copies of the array at the
-        same time. Using a divisor of 8 leads to max memory usage of
-        about 75%.
+        The memory governor assigns window memory to each process, after
+        reserving GDAL cache and warp buffers. We can only use a fraction
+        of it per block b/c we might have multiple copies of the array at
+        the same time.
         """
 
-        # Decrease block size, in case we have co-workers.
-        # This way we can process more blocks in parallel.
         divisor = GLOBALS.divisor
-        co_workers = floor(GLOBALS.cores / GLOBALS.workers)
-        if co_workers >= 2:
-            divisor = divisor * co_workers
 
         # further reduce block size in case we need to perform additional computations
+        # by the number of extra arrays the calc expression allocates
         if self.layer.calc is not None:
-            divisor = divisor ** 2
+            divisor = divisor * (1 + get_calc_expression(self.layer.calc).memory_factor)
 
         LOGGER.debug(f"Divisor set to {divisor} for tile {self.tile_id}")
 
         bytes_per_block: int = self._block_byte_size()
-        memory_per_process: float = utils.available_memory_per_process_bytes() / divisor
+        memory_per_process: float = (
+            get_memory_governor().window_bytes(self._processes()) / divisor
+        )
 
         # make sure we get an number we whose sqrt is a whole number
-        max_blocks: int = floor(sqrt(memory_per_process / bytes_per_block)) ** 2
+        # and always read at least one block, even if it exceeds the budget
+        max_blocks: int = max(floor(sqrt(memory_per_process / bytes_per_block)) ** 2, 1)
 
         LOGGER.debug(f"Maximum number of blocks to read at once: {max_blocks}")
         return max_blocks
@@ -463,41 +798,38 @@ class RasterSrcTile(Tile):
         LOGGER.debug(f"Output Affine and dimensions {transform}, {width}, {height}")
         return transform, width, height
 
-    @staticmethod
-    def _union_blocks(
-        dst: DatasetWriter, min_i: int, min_j: int, max_i: int, max_j: int
-    ) -> Window:
-        """Loops over selected blocks of data source and merges their windows
-        into one."""
-        windows: List[Window] = list()
-
-        for i in range(min_i, max_i):
-            for j in range(min_j, max_j):
-                windows.append(dst.block_window(1, i, j))
-        return union(*windows)
-
     def _write_window(
         self, array: np.ndarray, dst_window: Window, write_to_seperate_files: bool
     ) -> str:
-        if write_to_seperate_files:
-            out_file: str = self._write_window_to_separate_file(array, dst_window)
+        if self._tile_buffer is not None:
+            out_file: str = self._write_window_to_tile_buffer(array, dst_window)
+        elif write_to_seperate_files:
+            out_file = self._write_window_to_separate_file(array, dst_window)
         else:
             out_file = self._write_window_to_shared_file(array, dst_window)
         return out_file
 
+    def _write_window_to_tile_buffer(
+        self, array: np.ndarray, dst_window: Window
+    ) -> str:
+        """Write window into shared tile buffer.
+
+        Windows never overlap, so co-workers can write at the same time.
+        """
+        assert self._tile_buffer is not None
+        LOGGER.debug(f"Write {dst_window} of tile {self.tile_id} to tile buffer")
+        self._tile_buffer[(slice(None),) + dst_window.toslices()] = array
+        del array
+        return str(self._tile_buffer.filename)
+
     def _write_window_to_shared_file(
         self, array: np.ndarray, dst_window: Window
     ) -> str:
-        """Write blocks into output raster."""
-        with rasterio.Env(**GDAL_ENV):
-            with rasterio.open(
-                self.local_dst[self.default_format].uri,
-                "r+",
-                **self.dst[self.default_format].profile,
-            ) as dst:
-                LOGGER.debug(f"Write {dst_window} of tile {self.tile_id}")
-                dst.write(array, window=dst_window)
-                del array
+        """Write blocks into output rasters of all formats."""
+        with self.local_dst_writer("r+") as writer:
+            LOGGER.debug(f"Write {dst_window} of tile {self.tile_id}")
+            writer.write(array, dst_window)
+            del array
         return self.local_dst[self.default_format].uri
 
     def _write_window_to_separate_file(
@@ -507,7 +839,7 @@ class RasterSrcTile(Tile):
         file_name = f"{self.tile_id}_{dst_window.col_off}_{dst_window.row_off}.tif"
         file_path = os.path.join(self.tmp_dir, file_name)
 
-        profile = deepcopy(self.dst[self.default_format].profile)
+        profile = deepcopy(self.local_profile(self.default_format))
         transform = rasterio.windows.transform(dst_window, profile["transform"])
         profile.update(
             width=dst_window.width, height=dst_window.height, transform=transform
@@ -1,30 +1,54 @@
 import copy
+import math
 import os
 import shutil
 from abc import ABC
-from typing import Dict, Union
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional
 
+import numpy as np
 import rasterio
-from pydantic.types import StrictInt
 from rasterio.coords import BoundingBox
 from rasterio.crs import CRS
+from rasterio.enums import Resampling
 from rasterio.shutil import copy as raster_copy
+from rasterio.windows import Window
 
 from gfw_pixetl import get_module_logger, utils
-from gfw_pixetl.errors import GDALError
-from gfw_pixetl.grids import Grid
+from gfw_pixetl.data_type import from_gdal_data_type, to_gdal_data_type
+from gfw_pixetl.grids import Grid, LatLngGrid
 from gfw_pixetl.layers import Layer
-from gfw_pixetl.models.enums import ColorMapType, DstFormat
-from gfw_pixetl.models.pydantic import RGBA
-from gfw_pixetl.models.types import OrderedColorMap
+from gfw_pixetl.models.enums import DstFormat
+from gfw_pixetl.models.named_tuples import Overview, ZarrArray
+from gfw_pixetl.models.pydantic import Band, Metadata, StageMetrics, UploadMetrics
+from gfw_pixetl.settings.gdal import GDAL_ENV
 from gfw_pixetl.settings.globals import GLOBALS
 from gfw_pixetl.sources import Destination, RasterSource
-from gfw_pixetl.utils.aws import get_s3_client
-from gfw_pixetl.utils.gdal import run_gdal_subcommand
+from gfw_pixetl.tiles.writer import TileWriter
+from gfw_pixetl.utils.gdal import create_overview_vrt
 from gfw_pixetl.utils.path import create_dir
+from gfw_pixetl.utils.report import measure
+from gfw_pixetl.utils.stats import RasterStats
+from gfw_pixetl.utils.upload import get_uploader
 
 LOGGER = get_module_logger(__name__)
-S3 = get_s3_client()
+
+# Block size of Cloud Optimized GeoTIFFs, overviews are added until they
+# fit into a single block
+COG_BLOCKSIZE = 512
+
+# Resampling methods GDAL can use to compute overviews
+GDAL_OVERVIEW_RESAMPLING = {
+    Resampling.nearest: "NEAREST",
+    Resampling.bilinear: "BILINEAR",
+    Resampling.cubic: "CUBIC",
+    Resampling.cubic_spline: "CUBICSPLINE",
+    Resampling.lanczos: "LANCZOS",
+    Resampling.average: "AVERAGE",
+    Resampling.mode: "MODE",
+    Resampling.gauss: "GAUSS",
+    Resampling.rms: "RMS",
+}
 
 
 class Tile(ABC):
@@ -94,12 +118,40 @@ class Tile(ABC):
             ),
         }
 
+        if layer.create_cog:
+            # COG driver can only create copies of the final tile
+            cog_profile = copy.deepcopy(geotiff_profile)
+            cog_profile.pop("tiled", None)
+            cog_profile.pop("pixeltype", None)
+            cog_profile.update(
+                driver="COG",
+                blocksize=COG_BLOCKSIZE,
+                blockxsize=COG_BLOCKSIZE,
+                blockysize=COG_BLOCKSIZE,
+                overview_resampling=GDAL_OVERVIEW_RESAMPLING.get(
+                    layer.overview_resampling, "NEAREST"
+                ),
+            )
+            self.dst[DstFormat.cog] = Destination(
+                uri=os.path.join(layer.prefix, DstFormat.cog, f"{self.tile_id}.tif"),
+                profile=cog_profile,
+                bounds=self.bounds,
+            )
+
         self.work_dir = create_dir(os.path.join(os.getcwd(), tile_id))
         self.tmp_dir = create_dir(os.path.join(self.work_dir, "tmp"))
 
+        self.zarr_array: Optional[ZarrArray] = None
+        if layer.create_zarr:
+            self.zarr_array = self._zarr_array(gdal_profile)
+
         self.default_format = GLOBALS.default_dst_format
         self.status = "pending"
         self.metadata: Dict[str, Dict] = dict()
+        self.stats: Optional[RasterStats] = None
+        self.upload_metrics: Dict[str, UploadMetrics] = dict()
+        self.metrics: Dict[str, StageMetrics] = dict()
+        self._uploads: Dict[str, Future] = dict()
 
     def remove_work_dir(self):
         LOGGER.debug(f"Delete working directory for tile {self.tile_id}")
@@ -124,6 +176,118 @@ class Tile(ABC):
         LOGGER.debug(f"Local Source URI: {uri}")
         return uri
 
+    def _zarr_array(self, profile: Dict[str, Any]) -> ZarrArray:
+        """Section of the global Zarr array of the layer covered by this
+        tile.
+
+        Chunks match the blocks of the tile and never cross tile
+        boundaries, so tiles can be written concurrently.
+        """
+        assert isinstance(self.grid, LatLngGrid)
+        row_off = round((90 - self.bounds.top) / self.grid.yres)
+        col_off = round((self.bounds.left + 180) / self.grid.xres)
+        chunks = (profile["blockysize"], profile["blockxsize"])
+        if row_off % chunks[0] or col_off % chunks[1]:
+            raise ValueError(
+                f"Tile {self.tile_id} is not aligned with chunks of the Zarr store"
+            )
+
+        return ZarrArray(
+            uri=os.path.join(self.work_dir, DstFormat.zarr),
+            shape=(round(180 / self.grid.yres), round(360 / self.grid.xres)),
+            chunks=chunks,
+            dtype=profile["dtype"],
+            fill_value=profile["nodata"] if profile["nodata"] is not None else 0,
+            row_off=row_off,
+            col_off=col_off,
+            attrs={
+                "_ARRAY_DIMENSIONS": ["y", "x"],
+                "crs": self.grid.crs.to_wkt(),
+                "transform": [-180, self.grid.xres, 0, 90, 0, -self.grid.yres],
+            },
+        )
+
+    def stream_formats(self) -> List[str]:
+        """Destination formats which are written directly from in-memory
+        windows."""
+        return [
+            dst_format for dst_format in self.dst.keys() if dst_format != DstFormat.cog
+        ]
+
+    def local_profile(self, dst_format: str) -> Dict[str, Any]:
+        """Profile of local output file.
+
+        With symbology, output files hold RGBA values instead of the
+        layer's data type.
+        """
+        profile = self.dst[dst_format].profile
+        if not self.layer.symbology:
+            return profile
+
+        rgba_profile = copy.deepcopy(profile)
+        rgba_profile.update(count=4, dtype="uint8", nodata=None, photometric="RGB")
+        rgba_profile.pop("nbits", None)
+        rgba_profile.pop("pixeltype", None)
+        if str(rgba_profile.get("compress")).upper() == "CCITTFAX4":
+            # only works for 1 bit data
+            rgba_profile["compress"] = "DEFLATE"
+        return rgba_profile
+
+    def render(self, array: np.ndarray) -> np.ndarray:
+        """Apply symbology to array, if any."""
+        if self.layer.colorizer is None:
+            return array
+        return self.layer.colorizer(array)
+
+    def local_dst_writer(
+        self, mode: str = "r+", dst_formats: Optional[List[str]] = None
+    ) -> TileWriter:
+        """Writer for local files of given destination formats, by default
+        all formats written in stream."""
+        if dst_formats is None:
+            dst_formats = self.stream_formats()
+        overview: Optional[Overview] = None
+        if DstFormat.cog in self.dst.keys() and self.default_format in dst_formats:
+            overview = self.overview(2)
+        zarr_array: Optional[ZarrArray] = None
+        if self.default_format in dst_formats:
+            zarr_array = self.zarr_array
+        return TileWriter(
+            {f: self.get_local_dst_uri(f) for f in dst_formats},
+            {f: self.local_profile(f) for f in dst_formats},
+            mode,
+            overview,
+            zarr_array,
+        )
+
+    def overview(self, factor: int) -> Overview:
+        """Local overview file of default format, reduced by given
+        factor."""
+        profile = copy.deepcopy(self.local_profile(self.default_format))
+        profile.update(
+            width=math.ceil(profile["width"] / factor),
+            height=math.ceil(profile["height"] / factor),
+            transform=rasterio.transform.from_origin(
+                self.bounds.left,
+                self.bounds.top,
+                self.grid.xres * factor,
+                self.grid.yres * factor,
+            ),
+        )
+        return Overview(
+            uri=os.path.join(self.tmp_dir, f"{self.tile_id}_overview_{factor}.tif"),
+            profile=profile,
+            resampling=self.layer.overview_resampling,
+        )
+
+    def rm_overviews(self) -> None:
+        """Delete local overview files."""
+        factor = 2
+        while os.path.isfile(self.overview(factor).uri):
+            LOGGER.debug(f"Delete overview {self.overview(factor).uri}")
+            os.remove(self.overview(factor).uri)
+            factor *= 2
+
     def create_gdal_geotiff(self) -> None:
         dst_format = DstFormat.gdal_geotiff
         if self.default_format != dst_format:
@@ -135,7 +299,7 @@ class Tile(ABC):
                 self.local_dst[self.default_format].uri,
                 self.get_local_dst_uri(dst_format),
                 strict=False,
-                **self.dst[dst_format].profile,
+                **self.local_profile(dst_format),
             )
             self.set_local_dst(dst_format)
         else:
@@ -143,21 +307,127 @@ class Tile(ABC):
                 f"Local file already Gdal Geotiff. Skip copying as Gdal Geotiff for tile {self.tile_id}"
             )
 
-    def upload(self) -> None:
+    def create_cog(self) -> None:
+        """Create Cloud Optimized GeoTIFF from local file of default format.
+
+        The first overview was reduced from in-memory windows while
+        writing the tile, each lower overview is reduced from the one
+        above until it fits into a single block. Without first overview,
+        GDAL computes overviews from the full resolution file.
+        """
+        LOGGER.info(f"Create Cloud Optimized GeoTIFF for tile {self.tile_id}")
+
+        src: str = self.local_dst[self.default_format].uri
+        profile: Dict[str, Any] = copy.deepcopy(self.local_profile(DstFormat.cog))
+        overviews: List[str] = self._reduce_overviews()
+        if overviews:
+            src = create_overview_vrt(
+                src, overviews, os.path.join(self.tmp_dir, f"{self.tile_id}_cog.vrt")
+            )
+            profile["overviews"] = "FORCE_USE_EXISTING"
+        elif self.layer.overview_resampling not in GDAL_OVERVIEW_RESAMPLING:
+            LOGGER.warning(
+                f"GDAL cannot compute overviews using {self.layer.overview_resampling.name}, "
+                f"use {profile['overview_resampling']} for tile {self.tile_id}"
+            )
 
+        with rasterio.Env(**GDAL_ENV):
+            raster_copy(
+                src, self.get_local_dst_uri(DstFormat.cog), strict=False, **profile
+            )
+        self.set_local_dst(DstFormat.cog)
+        self.rm_overviews()
+
+    def _reduce_overviews(self) -> List[str]:
+        """Reduce first overview into all lower overviews."""
+        overview: Overview = self.overview(2)
+        if not os.path.isfile(overview.uri):
+            return list()
+
+        overviews: List[str] = [overview.uri]
+        factor = 2
+        while (
+            max(overview.profile["width"], overview.profile["height"]) > COG_BLOCKSIZE
+        ):
+            factor *= 2
+            lower_overview: Overview = self.overview(factor)
+            with rasterio.Env(**GDAL_ENV), rasterio.open(overview.uri) as src:
+                with TileWriter({}, {}, "w", lower_overview) as writer:
+                    strip_height = 2 * src.block_shapes[0][0]
+                    for row in range(0, src.height, strip_height):
+                        window = Window(
+                            0, row, src.width, min(strip_height, src.height - row)
+                        )
+                        writer.write(src.read(window=window), window)
+            overview = lower_overview
+            overviews.append(overview.uri)
+
+        return overviews
+
+    def copy_to_zarr(self) -> None:
+        """Write local file of default format into Zarr store, block by
+        block, in case it was not written through the tile writer."""
+        LOGGER.info(f"Copy tile {self.tile_id} into Zarr store")
+        with rasterio.Env(**GDAL_ENV), rasterio.open(
+            self.local_dst[self.default_format].uri
+        ) as src:
+            with TileWriter({}, {}, "r+", zarr_array=self.zarr_array) as writer:
+                for _, window in src.block_windows(1):
+                    writer.write(src.read(window=window), window)
+
+    def upload(self, wait: bool = True) -> None:
+        """Upload all local files to S3.
+
+        Files of all formats are uploaded concurrently in background
+        threads. Unless wait is set to False, block until all uploads
+        finished.
+        """
+        uploader = get_uploader()
         try:
             for dst_format in self.local_dst.keys():
+                if dst_format in self._uploads or dst_format in self.upload_metrics:
+                    continue
                 LOGGER.info(f"Upload {dst_format} tile {self.tile_id} to s3")
-                S3.upload_file(
+                self._uploads[dst_format] = uploader.submit(
                     self.local_dst[dst_format].uri,
                     utils.get_bucket(),
                     self.dst[dst_format].uri,
                 )
+            # Every tile uploads its own chunks and identical array metadata
+            if (
+                self.zarr_array is not None
+                and DstFormat.zarr not in self._uploads
+                and DstFormat.zarr not in self.upload_metrics
+            ):
+                LOGGER.info(f"Upload Zarr chunks of tile {self.tile_id} to s3")
+                self._uploads[DstFormat.zarr] = uploader.submit_dir(
+                    self.zarr_array.uri,
+                    utils.get_bucket(),
+                    os.path.join(self.layer.prefix, DstFormat.zarr),
+                )
         except Exception as e:
             LOGGER.error(f"Could not upload file {self.tile_id}")
             LOGGER.exception(str(e))
             self.status = "failed"
 
+        if wait:
+            self.wait_upload()
+
+    def upload_done(self) -> bool:
+        """Check if all started uploads finished."""
+        return all(future.done() for future in self._uploads.values())
+
+    def wait_upload(self) -> None:
+        """Wait for started uploads and collect their metrics."""
+        uploads, self._uploads = self._uploads, dict()
+        for dst_format, future in uploads.items():
+            try:
+                self.upload_metrics[dst_format] = future.result()
+            except Exception as e:
+                LOGGER.error(f"Could not upload file {self.tile_id}")
+                LOGGER.exception(str(e))
+                self.status = "failed"
+
     def rm_local_src(self, dst_format) -> None:
         if dst_format in self.local_dst.keys() and os.path.isfile(
             self.local_dst[dst_format].uri
@@ -168,97 +438,91 @@ class Tile(ABC):
     def postprocessing(self):
         """Once we have the final geotiff, all postprocessing steps should be
         the same no matter the source format and grid type."""
+        with measure(self.metrics, "postprocessing"):
+            self._postprocessing()
 
-        if self.layer.symbology:
-            self.add_symbology()
-
+    def _postprocessing(self):
         # Add superior compression, which only works with GDAL drivers
-        self.create_gdal_geotiff()
+        # unless it was already written together with default format
+        if DstFormat.gdal_geotiff not in self.local_dst.keys():
+            with measure(self.metrics, "postprocessing.create_gdal_geotiff"):
+                self.create_gdal_geotiff()
+
+        if DstFormat.cog in self.dst.keys() and DstFormat.cog not in self.local_dst:
+            with measure(self.metrics, "postprocessing.create_cog"):
+                self.create_cog()
+
+        # Add pixels which were never written to stats
+        if self.stats is not None:
+            profile = self.local_profile(self.default_format)
+            nodata = profile.get("nodata")
+            self.stats.fill(
+                profile["width"] * profile["height"],
+                nodata if nodata is not None else 0,
+            )
 
         # Compute stats and histogram
-        for dst_format in self.local_dst.keys():
-            self.metadata[dst_format] = self.local_dst[dst_format].metadata(
-                self.layer.compute_stats, self.layer.compute_histogram
-            )
+        with measure(self.metrics, "postprocessing.metadata"):
+            for dst_format in self.local_dst.keys():
+                self.metadata[dst_format] = self.get_metadata(dst_format)
+
+    def new_stats(self) -> Optional[RasterStats]:
+        """Empty statistics accumulator, in case layer requires stats or
+        histogram."""
+        if not (self.layer.compute_stats or self.layer.compute_histogram):
+            return None
+        profile = self.local_profile(self.default_format)
+        return RasterStats(
+            profile["dtype"], profile.get("nodata"), profile.get("count", 1)
+        )
 
-    def add_symbology(self):
-        """Add symbology to output raster.
+    def get_metadata(self, dst_format: str) -> Dict:
+        """Get metadata of local output file.
 
-        Gradient colormap: Use linear interpolation based on provided
-        colormap to compute RGBA quadruplet for any given pixel value.
-        Discrete colormap: Use strict matching when searching in the
-        color configuration file. If none matching color entry is found,
-        the “0,0,0,0” RGBA quadruplet will be used.
+        Pixel values of all formats are identical, so we can describe
+        them using the local profile and the statistics accumulated
+        while writing the tile.
         """
+        needs_stats = self.layer.compute_stats or self.layer.compute_histogram
+        if needs_stats and self.stats is None:
+            return self.local_dst[dst_format].metadata(
+                self.layer.compute_stats, self.layer.compute_histogram
+            )
 
-        LOGGER.info(f"Create RGBA raster for tile {self.tile_id}")
-
-        ordered_colormap: OrderedColorMap = self._sort_colormap()
-        colormap_file = os.path.join(self.tmp_dir, "colormap.txt")
-
-        # write to file
-        with open(colormap_file, "w") as f:
-            for pixel_value in ordered_colormap:
-                values = [str(pixel_value)] + [
-                    str(i) for i in ordered_colormap[pixel_value]
-                ]
-                row = " ".join(values)
-                f.write(row)
-                f.write("\n")
-
-        src = self.local_dst[self.default_format].uri
-        dst = os.path.join(self.tmp_dir, f"{self.tile_id}_colored.tif")
-        cmd = [
-            "gdaldem",
-            "color-relief",
-            "-alpha",
-            "-co",
-            f"COMPRESS={self.dst[self.default_format].compress}",
-            "-co",
-            "TILED=YES",
-            "-co",
-            f"BLOCKXSIZE={self.grid.blockxsize}",
-            "-co",
-            f"BLOCKYSIZE={self.grid.blockxsize}",
-            "-co",
-            "SPARSE_OK=TRUE",
-            "-co",
-            "INTERLEAVE=BAND",
-        ]
-
-        if self.layer.symbology.type == ColorMapType.discrete:
-            cmd += ["-exact_color_entry"]
-
-        cmd += [src, colormap_file, dst]
-
-        try:
-            run_gdal_subcommand(cmd)
-        except GDALError:
-            LOGGER.error("Could not create Color Relief")
-            raise
-        # switch uri with new output file
-        self.local_dst[self.default_format].uri = dst
-
-    def _sort_colormap(self) -> OrderedColorMap:
-        """
-        Create value - quadruplet colormap (GDAL format) including no data value.
+        profile = self.local_profile(dst_format)
+        compression = str(profile.get("compress") or "").upper()
 
-        """
-        assert self.layer.symbology, "No colormap specified."
-        colormap: Dict[Union[StrictInt, float], RGBA] = copy.deepcopy(
-            self.layer.symbology.colormap
+        metadata = Metadata(
+            extent=(
+                self.bounds.left,
+                self.bounds.bottom,
+                self.bounds.right,
+                self.bounds.top,
+            ),
+            width=profile["width"],
+            height=profile["height"],
+            pixelxsize=self.grid.xres,
+            pixelysize=self.grid.yres,
+            crs=self.grid.crs.to_wkt(),
+            # COGs are read as GeoTIFF
+            driver="GTiff" if profile["driver"] == "COG" else profile["driver"],
+            compression=compression if compression not in ("", "NONE") else None,
         )
 
-        ordered_gdal_colormap: OrderedColorMap = dict()
-
-        # add no data value to colormap, if exists
-        # (not sure why mypy throws an error here, hence type: ignore)
-        if self.dst[self.default_format].nodata is not None:
-            colormap[self.dst[self.default_format].nodata] = RGBA(red=0, green=0, blue=0, alpha=0)  # type: ignore
-
-        # make sure values are correctly sorted and convert to value-quadruplet string
-        for pixel_value in sorted(colormap.keys()):
+        for i in range(profile.get("count", 1)):
+            band_metadata = Band(
+                no_data=profile.get("nodata"),
+                data_type=from_gdal_data_type(to_gdal_data_type(profile["dtype"])),
+                nbits=profile.get("nbits"),
+                blockxsize=profile["blockxsize"],
+                blockysize=profile["blockysize"],
+            )
+            if self.stats is not None:
+                if self.layer.compute_stats:
+                    band_metadata.stats = self.stats.bands[i].stats()
+                if self.layer.compute_histogram:
+                    band_metadata.histogram = self.stats.bands[i].histogram()
 
-            ordered_gdal_colormap[pixel_value] = colormap[pixel_value].tuple()
+            metadata.bands.append(band_metadata)
 
-        return ordered_gdal_colormap
+        return metadata.dict()
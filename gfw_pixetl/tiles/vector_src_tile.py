@@ -1,18 +1,28 @@
-from typing import List
+from math import floor
+from typing import List, Optional
 
+import numpy as np
 import psycopg2
 from psycopg2._psycopg import ProgrammingError
+from rasterio.coords import BoundingBox
+from rasterio.enums import MergeAlg
+from rasterio.features import rasterize
+from rasterio.windows import Window
+from rasterio.windows import bounds as window_bounds
+from rasterio.windows import transform as window_transform
+from shapely import wkb
 from sqlalchemy import Column, Table, select, table, text
+from sqlalchemy.sql import Select
 from sqlalchemy.sql.elements import TextClause, literal_column
 
 from gfw_pixetl import get_module_logger
-from gfw_pixetl.data_type import to_gdal_data_type
-from gfw_pixetl.errors import GDALError
 from gfw_pixetl.grids import Grid
 from gfw_pixetl.layers import VectorSrcLayer
+from gfw_pixetl.settings.globals import GLOBALS
 from gfw_pixetl.sources import VectorSource
 from gfw_pixetl.tiles import Tile
-from gfw_pixetl.utils.gdal import run_gdal_subcommand
+from gfw_pixetl.tiles.writer import TileWriter
+from gfw_pixetl.utils.memory import get_memory_governor
 
 logger = get_module_logger(__name__)
 
@@ -21,40 +31,46 @@ class VectorSrcTile(Tile):
     def __init__(self, tile_id: str, grid: Grid, layer: VectorSrcLayer) -> None:
         super().__init__(tile_id, grid, layer)
         self.src: VectorSource = layer.src
+        self.intersects: Optional[bool] = None
 
-    def intersect_filter(self) -> TextClause:
+    def intersect_filter(self, bounds: Optional[BoundingBox] = None) -> TextClause:
+        if bounds is None:
+            bounds = self.bounds
         return text(
             f"""ST_Intersects(
                         geom,
                         ST_MakeEnvelope(
-                            {self.bounds.left},
-                            {self.bounds.bottom},
-                            {self.bounds.right},
-                            {self.bounds.top},
+                            {bounds.left},
+                            {bounds.bottom},
+                            {bounds.right},
+                            {bounds.top},
                             4326)
                     )"""
         )
 
-    def intersection(self) -> TextClause:
+    def intersection(self, bounds: Optional[BoundingBox] = None) -> TextClause:
+        if bounds is None:
+            bounds = self.bounds
         return text(
             f"""
             st_intersection(
                 geom,
                 ST_MakeEnvelope(
-                    {self.bounds.left},
-                    {self.bounds.bottom},
-                    {self.bounds.right},
-                    {self.bounds.top},
+                    {bounds.left},
+                    {bounds.bottom},
+                    {bounds.right},
+                    {bounds.top},
                     4326)
             )"""
         )
 
-    def intersection_geom(self) -> TextClause:
+    def intersection_geom(self, bounds: Optional[BoundingBox] = None) -> TextClause:
+        intersection: str = str(self.intersection(bounds))
         return text(
             f"""CASE
-                        WHEN st_geometrytype({str(self.intersection())}) = 'ST_GeometryCollection'::text
-                        THEN st_collectionextract({str(self.intersection())}, 3)
-                        ELSE st_intersection(geom, {str(self.intersection())})
+                        WHEN st_geometrytype({intersection}) = 'ST_GeometryCollection'::text
+                        THEN st_collectionextract({intersection}, 3)
+                        ELSE st_intersection(geom, {intersection})
                 END"""
         )
 
@@ -73,37 +89,42 @@ class VectorSrcTile(Tile):
         return src_table
 
     def src_vector_intersects(self) -> bool:
+        """Check if tile intersects with source table.
 
-        try:
-            logger.debug(f"Check if tile {self.tile_id} intersects with postgis table")
-            conn = psycopg2.connect(
-                dbname=self.src.conn.db_name,
-                user=self.src.conn.db_user,
-                password=self.src.conn.db_password,
-                host=self.src.conn.db_host,
-                port=self.src.conn.db_port,
-            )
+        Usually, the pipe already looked this up for all tiles at once.
+        Otherwise query database using a pooled connection.
+        """
+        if self.intersects is None:
+            self.intersects = self._query_intersects()
+        exists = self.intersects
 
-            cursor = conn.cursor()
+        if exists:
+            logger.info(
+                f"Tile id {self.tile_id} exists in database table {self.src.schema}.{self.src.table}"
+            )
+        else:
+            logger.info(
+                f"Tile id {self.tile_id} does not exists in database table {self.src.schema}.{self.src.table}"
+            )
+        return exists
 
+    def _query_intersects(self) -> bool:
+        try:
+            logger.debug(f"Check if tile {self.tile_id} intersects with postgis table")
             sql = (
                 select([literal_column("1")])
                 .select_from(self.src_table())
                 .where(self.intersect_filter())
+                .limit(1)
             )
-            # exists_query = select([literal_column("exists")]).select_from(select_1)
-
             logger.debug(str(sql))
 
-            cursor.execute(str(sql))
-
-            try:
-                exists = bool(cursor.fetchone()[0])
-            except (ProgrammingError, TypeError):
-                exists = False
-
-            cursor.close()
-            conn.close()
+            with self.src.conn.connect() as conn, conn.cursor() as cursor:
+                cursor.execute(str(sql))
+                try:
+                    exists = bool(cursor.fetchone()[0])
+                except (ProgrammingError, TypeError):
+                    exists = False
         except psycopg2.Error:
             logger.exception(
                 "There was an issue when trying to connect to the database"
@@ -111,86 +132,137 @@ class VectorSrcTile(Tile):
             raise
 
         logger.debug(f"EXISTS: {exists}")
-
-        if exists:
-            logger.info(
-                f"Tile id {self.tile_id} exists in database table {self.src.schema}.{self.src.table}"
-            )
-        else:
-            logger.info(
-                f"Tile id {self.tile_id} does not exists in database table {self.src.schema}.{self.src.table}"
-            )
         return exists
 
     def rasterize(self) -> None:
+        """Burn geometries of source table into tile.
+
+        The tile is rasterized window by window, so that memory use is
+        bounded by the window memory of the process, no matter the size
+        of the tile. For each window, geometries are streamed from a
+        server side cursor in batches and burned into the array of the
+        window, which is then written to all output formats.
+        """
+        logger.info("Rasterize tile " + self.tile_id)
 
-        # stage = "rasterize"
+        self.stats = self.new_stats()
+        try:
+            with self.local_dst_writer("w") as writer, self.src.conn.connect() as conn:
+                for window in self.windows():
+                    array: Optional[np.ndarray] = self._rasterize_window(conn, window)
+                    if array is not None:
+                        self._write_array(writer, array, window)
+                    del array
+        except psycopg2.Error:
+            logger.exception(f"Could not rasterize tile {self.tile_id}")
+            raise
 
-        dst = self.get_local_dst_uri(self.default_format)
-        logger.info(f"Create raster {dst}")
+        for dst_format in writer.formats:
+            self.set_local_dst(dst_format)
 
-        cmd: List[str] = ["gdal_rasterize"]
+        # invoking gdal-geotiff and compute stats here
+        # instead of in a separate stage to assure we don't run out of memory
+        # the transform stage uses all available memory for concurrent processes.
+        # Having another stage which needs a lot of memory might cause the process to crash
+        self.postprocessing()
 
+    def rasterize_sql(self, bounds: Optional[BoundingBox] = None) -> Select:
         val_column = literal_column(str(self.layer.calc))
-        geom_column = literal_column(str(self.intersection_geom()))
+        geom_column = literal_column(f"ST_AsBinary({self.intersection_geom(bounds)})")
 
-        sql = (
-            select([val_column.label(self.layer.field), geom_column.label("geom")])
+        return (
+            select([geom_column.label("geom"), val_column.label(self.layer.field)])
             .select_from(self.src_table())
-            .where(self.intersect_filter())
+            .where(self.intersect_filter(bounds))
             .order_by(self.order_column(val_column))
         )
 
-        logger.debug(str(sql))
+    def windows(self) -> List[Window]:
+        """Divides tile into strips of whole block rows, which fit into the
+        window memory of the process.
+
+        Strips span the entire width of the tile, the order in which
+        GeoTIFFs store their blocks.
+        """
+        dst = self.dst[self.default_format]
+        item_size: int = np.zeros(1, dtype=dst.dtype).itemsize
+        if self.layer.symbology:
+            # rendered RGBA copy of the window
+            item_size += 4
+
+        max_bytes: float = get_memory_governor().window_bytes(1) / GLOBALS.divisor
+        max_rows: int = (
+            max(floor(max_bytes / (dst.width * item_size) / dst.blockysize), 1)
+            * dst.blockysize
+        )
 
-        if self.layer.rasterize_method == "count":
-            cmd += ["-burn", "1", "-add"]
-        else:
-            cmd += ["-a", self.layer.field]
-
-        if self.dst[self.default_format].has_no_data():
-            cmd += ["-a_nodata", str(self.dst[self.default_format].nodata)]
-
-        cmd += [
-            "-sql",
-            str(sql),
-            "-te",
-            str(self.bounds.left),
-            str(self.bounds.bottom),
-            str(self.bounds.right),
-            str(self.bounds.top),
-            "-tr",
-            str(self.grid.xres),
-            str(self.grid.yres),
-            "-a_srs",
-            "EPSG:4326",
-            "-ot",
-            to_gdal_data_type(self.dst[self.default_format].dtype),
-            "-co",
-            f"COMPRESS={self.dst[self.default_format].compress}",
-            "-co",
-            "TILED=YES",
-            "-co",
-            f"BLOCKXSIZE={self.grid.blockxsize}",
-            "-co",
-            f"BLOCKYSIZE={self.grid.blockxsize}",
-            "-q",
-            self.src.conn.pg_conn(),
-            dst,
+        windows: List[Window] = [
+            Window(0, row_off, dst.width, min(max_rows, dst.height - row_off))
+            for row_off in range(0, dst.height, max_rows)
         ]
+        logger.debug(f"Rasterize tile {self.tile_id} in {len(windows)} windows")
+        return windows
 
-        logger.info("Rasterize tile " + self.tile_id)
+    def _rasterize_window(self, conn, window: Window) -> Optional[np.ndarray]:
+        """Burn geometries intersecting with window into an array of the
+        window.
 
-        try:
-            run_gdal_subcommand(cmd)
-        except GDALError:
-            logger.error(f"Could not rasterize tile {self.tile_id}")
-            raise
-        else:
-            self.set_local_dst(self.default_format)
+        Returns None, if no geometry intersects with the window.
+        """
+        dst = self.dst[self.default_format]
+        count: bool = self.layer.rasterize_method == "count"
+        dst_bounds = BoundingBox(*window_bounds(window, dst.transform))
+
+        sql = self.rasterize_sql(dst_bounds)
+        logger.debug(str(sql))
+
+        array: Optional[np.ndarray] = None
+        geometries: int = 0
+        with conn.cursor(name=f"rasterize_{self.tile_id}") as cursor:
+            cursor.itersize = GLOBALS.rasterize_batch_size
+            cursor.execute(str(sql))
+
+            while True:
+                rows = cursor.fetchmany(GLOBALS.rasterize_batch_size)
+                if not rows:
+                    break
+
+                shapes = [
+                    (wkb.loads(bytes(geom)), 1 if count else value)
+                    for geom, value in rows
+                    if geom is not None
+                ]
+                if not shapes:
+                    continue
+                if array is None:
+                    array = np.full(
+                        (int(window.height), int(window.width)),
+                        0 if count or dst.nodata is None else dst.nodata,
+                        dtype=dst.dtype,
+                    )
+                geometries += len(shapes)
+                # later geometries overwrite earlier ones, unless we count them
+                rasterize(
+                    shapes,
+                    out=array,
+                    transform=window_transform(window, dst.transform),
+                    merge_alg=MergeAlg.add if count else MergeAlg.replace,
+                )
+
+        logger.debug(
+            f"Burned {geometries} geometries into {window} of tile {self.tile_id}"
+        )
 
-            # invoking gdal-geotiff and compute stats here
-            # instead of in a separate stage to assure we don't run out of memory
-            # the transform stage uses all available memory for concurrent processes.
-            # Having another stage which needs a lot of memory might cause the process to crash
-            self.postprocessing()
+        if array is not None and count and dst.nodata:
+            array[array == 0] = dst.nodata
+        return array
+
+    def _write_array(
+        self, writer: TileWriter, array: np.ndarray, window: Window
+    ) -> None:
+        """Write window to all output formats, accumulating statistics and
+        applying symbology on the way."""
+        block = self.render(array)
+        if self.stats is not None:
+            self.stats.update(block)
+        writer.write(block.reshape((-1,) + block.shape[-2:]), window)
@@ -0,0 +1,195 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+import rasterio
+import zarr
+from numcodecs import Blosc
+from numpy.ma import MaskedArray
+from rasterio.io import DatasetWriter
+from rasterio.windows import Window
+
+from gfw_pixetl import get_module_logger
+from gfw_pixetl.models.named_tuples import Overview, ZarrArray
+from gfw_pixetl.resampling import downsample
+from gfw_pixetl.settings.gdal import GDAL_ENV
+
+LOGGER = get_module_logger(__name__)
+
+ZARR_COMPRESSOR = Blosc(cname="zstd", clevel=5, shuffle=Blosc.BITSHUFFLE)
+
+
+class TileWriter(object):
+    """Write the same windows into the local files of several destination
+    formats.
+
+    All files stay open while writing, and every format is encoded in
+    its own thread. Rasterio releases the GIL while GDAL compresses
+    blocks, so encoders run concurrently.
+
+    With an overview, every window is also reduced by 2x2 pixels and
+    written into the overview file, while it is still in memory. With a
+    Zarr array, windows are also written into the chunks of the tile.
+    Chunks which only hold fill values are never stored.
+    """
+
+    def __init__(
+        self,
+        uris: Dict[str, str],
+        profiles: Dict[str, Dict[str, Any]],
+        mode="r+",
+        overview: Optional[Overview] = None,
+        zarr_array: Optional[ZarrArray] = None,
+    ) -> None:
+        self.uris: Dict[str, str] = uris
+        self.profiles: Dict[str, Dict[str, Any]] = profiles
+        self.mode: str = mode
+        self.overview: Optional[Overview] = overview
+        self.zarr_array: Optional[ZarrArray] = zarr_array
+
+        self.datasets: Dict[str, DatasetWriter] = dict()
+        self.overview_dataset: Optional[DatasetWriter] = None
+        self.zarr_dataset: Optional[zarr.Array] = None
+        self._env: Optional[rasterio.Env] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def formats(self) -> List[str]:
+        return list(self.uris.keys())
+
+    def __enter__(self) -> "TileWriter":
+        self._env = rasterio.Env(**GDAL_ENV)
+        self._env.__enter__()
+        self._executor = ThreadPoolExecutor(max_workers=len(self.uris) + 1)
+
+        try:
+            for dst_format, uri in self.uris.items():
+                LOGGER.debug(f"Open {uri} in mode {self.mode}")
+                self.datasets[dst_format] = rasterio.open(
+                    uri, self.mode, **self.profiles[dst_format]
+                )
+            if self.overview is not None:
+                LOGGER.debug(f"Open overview {self.overview.uri} in mode {self.mode}")
+                self.overview_dataset = rasterio.open(
+                    self.overview.uri, self.mode, **self.overview.profile
+                )
+            if self.zarr_array is not None:
+                self.zarr_dataset = self._open_zarr(self.zarr_array)
+        except Exception:
+            self.__exit__(None, None, None)
+            raise
+
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        # closing flushes remaining blocks, so encode those concurrently as well
+        try:
+            self._run([dst.close for dst in self._all_datasets()])
+        finally:
+            self.datasets = dict()
+            self.overview_dataset = None
+            self.zarr_dataset = None
+            if self._executor is not None:
+                self._executor.shutdown()
+            if self._env is not None:
+                self._env.__exit__(exc_type, exc_val, exc_tb)
+
+    def write(self, array: np.ndarray, window: Window) -> None:
+        """Write array into window of all destination formats and the
+        overview."""
+        tasks: List[Callable[[], None]] = [
+            partial(dst.write, array, window=window) for dst in self.datasets.values()
+        ]
+        if self.overview_dataset is not None:
+            tasks.append(partial(self._write_overview, array, window))
+        if self.zarr_dataset is not None:
+            tasks.append(partial(self._write_zarr, array, window))
+        self._run(tasks)
+
+    def _open_zarr(self, zarr_array: ZarrArray) -> zarr.Array:
+        """Open local Zarr store, which holds chunks of the tile only."""
+        LOGGER.debug(f"Open Zarr store {zarr_array.uri} in mode {self.mode}")
+        if self.mode != "w":
+            return zarr.open_array(zarr_array.uri, mode="r+", write_empty_chunks=False)
+
+        dataset: zarr.Array = zarr.open_array(
+            zarr_array.uri,
+            mode="w",
+            shape=zarr_array.shape,
+            chunks=zarr_array.chunks,
+            dtype=zarr_array.dtype,
+            fill_value=zarr_array.fill_value,
+            compressor=ZARR_COMPRESSOR,
+            write_empty_chunks=False,
+        )
+        dataset.attrs.update(zarr_array.attrs)
+        return dataset
+
+    def _write_zarr(self, array: np.ndarray, window: Window) -> None:
+        """Write window into global Zarr array."""
+        assert self.zarr_array is not None and self.zarr_dataset is not None
+        rows, cols = window.toslices()
+        row_off, col_off = self.zarr_array.row_off, self.zarr_array.col_off
+        self.zarr_dataset[
+            row_off + rows.start : row_off + rows.stop,
+            col_off + cols.start : col_off + cols.stop,
+        ] = array.reshape((-1,) + array.shape[-2:])[0]
+
+    def _write_overview(self, array: np.ndarray, window: Window) -> None:
+        """Reduce window by 2x2 pixels and write it into the overview.
+
+        Windows only start at odd offsets or end at odd sizes where the
+        data ends, so missing pixels of the outer 2x2 blocks are masked.
+        """
+        assert self.overview is not None and self.overview_dataset is not None
+        col_off, row_off = int(window.col_off), int(window.row_off)
+        bands: np.ndarray = array.reshape((-1,) + array.shape[-2:])
+        top, left = row_off % 2, col_off % 2
+        height = bands.shape[1] + top + (bands.shape[1] + top) % 2
+        width = bands.shape[2] + left + (bands.shape[2] + left) % 2
+
+        padded: MaskedArray = np.ma.masked_all(
+            (bands.shape[0], height, width), dtype=bands.dtype
+        )
+        padded[:, top : top + bands.shape[1], left : left + bands.shape[2]] = (
+            self._mask(bands)
+        )
+
+        nodata = self.overview.profile.get("nodata")
+        reduced: np.ndarray = np.stack(
+            [
+                downsample(band, self.overview.resampling).filled(
+                    nodata if nodata is not None else 0
+                )
+                for band in padded
+            ]
+        )
+        self.overview_dataset.write(
+            reduced, window=Window(col_off // 2, row_off // 2, width // 2, height // 2)
+        )
+
+    def _mask(self, array: np.ndarray) -> MaskedArray:
+        """Mask no data values of overview."""
+        assert self.overview is not None
+        nodata = self.overview.profile.get("nodata")
+        if nodata is None:
+            return np.ma.masked_array(array, mask=False)
+        if np.isnan(nodata):
+            return np.ma.masked_invalid(array)
+        return np.ma.masked_equal(array, nodata)
+
+    def _all_datasets(self) -> List[DatasetWriter]:
+        datasets: List[DatasetWriter] = list(self.datasets.values())
+        if self.overview_dataset is not None:
+            datasets.append(self.overview_dataset)
+        return datasets
+
+    def _run(self, tasks: List[Callable[[], None]]) -> None:
+        assert self._executor is not None, "TileWriter is not open"
+        futures = [self._executor.submit(task) for task in tasks]
+        # wait for all encoders before raising first error
+        errors = [f.exception() for f in futures]
+        for error in errors:
+            if error is not None:
+                raise error
@@ -1,4 +1,5 @@
-from typing import Optional
+import os
+from typing import Any, Dict, Iterator, Optional
 
 import boto3
 
@@ -8,15 +9,22 @@ from gfw_pixetl.settings.globals import GLOBALS
 def client_constructor(service: str, endpoint_url: Optional[str] = None):
     """Using closure design for a client constructor This way we only need to
     create the client once in central location and it will be easier to
-    mock."""
+    mock.
+
+    Clients are not fork safe. A forked process inherits connection
+    pools and locks, which might be in use by threads of the parent, so
+    every process creates its own client, using its own session.
+    """
     service_client = None
+    client_pid: Optional[int] = None
 
     def client():
-        nonlocal service_client
-        if service_client is None:
-            service_client = boto3.client(
+        nonlocal service_client, client_pid
+        if service_client is None or client_pid != os.getpid():
+            service_client = boto3.session.Session().client(
                 service, region_name=GLOBALS.aws_region, endpoint_url=endpoint_url
             )
+            client_pid = os.getpid()
         return service_client
 
     return client
@@ -33,3 +41,13 @@ get_secret_client = client_constructor(
 def download_s3(bucket: str, key: str, dst: str) -> None:
     s3_client = get_s3_client()
     s3_client.download_file(bucket, key, dst)
+
+
+def list_s3_objects(bucket: str, prefix: str) -> Iterator[Dict[str, Any]]:
+    """List all objects under prefix, following pagination of
+    list_objects_v2."""
+    s3_client = get_s3_client()
+    paginator = s3_client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        for obj in page.get("Contents", []):
+            yield obj
@@ -1,8 +1,11 @@
 import json
 import os
 import subprocess as sp
+import xml.etree.ElementTree as ET
 from typing import Any, Dict, List, Optional, Tuple
 
+import rasterio
+from rasterio.dtypes import dtype_rev, typename_fwd
 from retrying import retry
 
 from gfw_pixetl import get_module_logger
@@ -48,6 +51,44 @@ def create_vrt(
     return vrt
 
 
+def create_overview_vrt(uri: str, overviews: List[str], vrt: str) -> str:
+    """Create VRT file of a local raster file, which uses given files as
+    its overviews, ordered from highest to lowest resolution."""
+
+    with rasterio.Env(**GDAL_ENV), rasterio.open(uri) as src:
+        root = ET.Element(
+            "VRTDataset", rasterXSize=str(src.width), rasterYSize=str(src.height)
+        )
+        ET.SubElement(root, "SRS").text = src.crs.to_wkt()
+        ET.SubElement(root, "GeoTransform").text = ", ".join(
+            repr(v) for v in src.transform.to_gdal()
+        )
+        for band, (dtype, nodata, color) in enumerate(
+            zip(src.dtypes, src.nodatavals, src.colorinterp), start=1
+        ):
+            vrt_band = ET.SubElement(
+                root,
+                "VRTRasterBand",
+                dataType=typename_fwd[dtype_rev[dtype]],
+                band=str(band),
+            )
+            if nodata is not None:
+                ET.SubElement(vrt_band, "NoDataValue").text = repr(nodata)
+            ET.SubElement(vrt_band, "ColorInterp").text = color.name
+            source = ET.SubElement(vrt_band, "SimpleSource")
+            ET.SubElement(source, "SourceFilename").text = os.path.abspath(uri)
+            ET.SubElement(source, "SourceBand").text = str(band)
+            for overview in overviews:
+                vrt_overview = ET.SubElement(vrt_band, "Overview")
+                ET.SubElement(vrt_overview, "SourceFilename").text = os.path.abspath(
+                    overview
+                )
+                ET.SubElement(vrt_overview, "SourceBand").text = str(band)
+
+    ET.ElementTree(root).write(vrt)
+    return vrt
+
+
 @retry(
     retry_on_exception=retry_if_none_type_error,
     stop_max_attempt_number=7,
@@ -121,7 +162,7 @@ def get_metadata(
         ),
         width=meta["size"][0],
         height=meta["size"][1],
-        pixelxsize=abs(meta["geoTransform"][0]),
+        pixelxsize=abs(meta["geoTransform"][1]),
         pixelysize=abs(meta["geoTransform"][5]),
         crs=meta["coordinateSystem"]["wkt"],
         driver=meta["driverShortName"],
@@ -0,0 +1,88 @@
+import os
+from typing import Dict
+
+import psutil
+
+from gfw_pixetl import get_module_logger
+from gfw_pixetl.settings.globals import GLOBALS
+
+LOGGER = get_module_logger(__name__)
+
+# Target share of the budget, the resident memory of a tile should use
+TARGET_USAGE = 0.75
+
+# Limits for adjusting window memory relative to the initial estimate
+MIN_SCALE = 1 / 16
+MAX_SCALE = 4.0
+
+# Maximum factor by which window memory changes after each tile
+MAX_STEP = 1.5
+
+
+class MemoryGovernor(object):
+    """Split the memory budget of a tile worker between GDAL block
+    cache, warp buffers and the arrays of the windows being processed.
+
+    The budget is the share of GLOBALS.max_mem of each tile worker,
+    capped by memory actually available at the time a tile starts.
+    After each tile, the peak resident memory of all processes is
+    compared to the budget and window memory is scaled up or down for
+    the next tile.
+    """
+
+    def __init__(self) -> None:
+        self.scale: float = 1.0
+
+    def budget(self) -> float:
+        """Memory in bytes available to the current tile worker and its co-
+        workers."""
+        share: float = GLOBALS.max_mem * 1000000 / GLOBALS.workers
+        available: float = psutil.virtual_memory().available + self.rss()
+        return min(share, available)
+
+    def gdal_cache_bytes(self, processes: int) -> int:
+        """GDAL block cache of each process."""
+        return int(self.budget() * GLOBALS.gdal_cache_fraction / max(processes, 1))
+
+    def warp_mem_mb(self, processes: int) -> int:
+        """Warp memory limit in MB of each process."""
+        warp_mem: float = self.budget() * GLOBALS.warp_mem_fraction / max(processes, 1)
+        return max(int(warp_mem / 1000000), 1)
+
+    def window_bytes(self, processes: int) -> float:
+        """Memory for window arrays of each process, ie the budget without
+        GDAL cache and warp buffers."""
+        fraction: float = 1 - GLOBALS.gdal_cache_fraction - GLOBALS.warp_mem_fraction
+        return self.budget() * fraction / max(processes, 1) * self.scale
+
+    def observe(self, rss: float) -> None:
+        """Adjust window memory to the resident memory observed while
+        processing the last tile."""
+        budget: float = self.budget()
+        if rss <= 0 or budget <= 0:
+            return
+
+        usage: float = rss / budget
+        step: float = min(max(TARGET_USAGE / usage, 1 / MAX_STEP), MAX_STEP)
+        self.scale = min(max(self.scale * step, MIN_SCALE), MAX_SCALE)
+        LOGGER.debug(
+            f"Tile used {rss} of {budget} bytes ({usage:.0%}). "
+            f"Set window memory scale to {self.scale:.2f}"
+        )
+
+    @staticmethod
+    def rss() -> int:
+        """Resident memory of current process."""
+        return psutil.Process(os.getpid()).memory_info().rss
+
+
+_governors: Dict[int, MemoryGovernor] = dict()
+
+
+def get_memory_governor() -> MemoryGovernor:
+    """Memory governor of current process, which keeps learning across all
+    tiles the process transforms."""
+    pid: int = os.getpid()
+    if pid not in _governors:
+        _governors[pid] = MemoryGovernor()
+    return _governors[pid]
@@ -0,0 +1,148 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from math import ceil
+from typing import List, Optional, Tuple
+
+from gfw_pixetl import get_module_logger
+from gfw_pixetl.layers import Layer, RasterSrcLayer
+from gfw_pixetl.models.named_tuples import ReadProbe, ReadProfile
+from gfw_pixetl.settings.gdal import GDAL_ENV
+from gfw_pixetl.settings.globals import GLOBALS
+from gfw_pixetl.utils.remote import RangeReader, range_reader
+
+LOGGER = get_module_logger(__name__)
+
+# Byte ranges read to measure latency and throughput
+LATENCY_BYTES = 4096
+LATENCY_SAMPLES = 5
+THROUGHPUT_BYTES = 4 * 1024 * 1024
+PROBE_STREAMS = 8
+
+# Chunks should be large enough that latency adds no more than 1/CHUNK_FACTOR
+# to the time spent downloading them. GDAL ignores chunks larger than 10 MB
+CHUNK_FACTOR = 4
+MIN_CHUNK_SIZE = 16 * 1024
+MAX_CHUNK_SIZE = 8 * 1024 * 1024
+
+# Above this latency in seconds, requests are multiplexed and merged
+HIGH_LATENCY = 0.02
+
+# Caches hold a few chunks of each open file and many chunks of all files
+VSI_CACHE_CHUNKS = 8
+MAX_VSI_CACHE_SIZE = 64 * 1024 * 1024
+CURL_CACHE_CHUNKS = 32
+MAX_CURL_CACHE_SIZE = 256 * 1024 * 1024
+
+MAX_READ_CONCURRENCY_FACTOR = 4
+
+
+def tune_reads(layer: Layer) -> Optional[ReadProfile]:
+    """Probe first source file of layer and apply matching read settings
+    to GDAL_ENV and GLOBALS.
+
+    Must run before any worker processes are forked, so that all of them
+    inherit the profile. Settings which were set explicitly are kept.
+    """
+    if not GLOBALS.tune_reads:
+        return None
+    if not isinstance(layer, RasterSrcLayer) or not layer.has_catalog:
+        return None
+    if not layer.catalog.input_files or layer.process_locally:
+        return None
+
+    uri: str = layer.catalog.input_files[0][1]
+    try:
+        probe: ReadProbe = probe_source(uri)
+    except Exception as e:
+        LOGGER.warning(f"Could not probe source {uri}, keep read settings: {e}")
+        return None
+
+    profile: ReadProfile = read_profile(probe)
+    apply_read_profile(profile)
+    LOGGER.info(f"Measured {probe} for source {uri}, use {profile}")
+    return profile
+
+
+def probe_source(uri: str) -> ReadProbe:
+    """Measure latency and throughput of byte range requests to source
+    file."""
+    read: RangeReader = range_reader(uri)
+
+    latency: float = statistics.median(
+        _timed_read(read, 0, LATENCY_BYTES)[0] for _ in range(LATENCY_SAMPLES)
+    )
+
+    seconds, size = _timed_read(read, 0, THROUGHPUT_BYTES)
+    throughput: float = _throughput(size, seconds, latency)
+
+    start: float = time.monotonic()
+    with ThreadPoolExecutor(max_workers=PROBE_STREAMS) as executor:
+        results: List[Tuple[float, int]] = list(
+            executor.map(
+                lambda _: _timed_read(read, 0, THROUGHPUT_BYTES), range(PROBE_STREAMS)
+            )
+        )
+    aggregate_throughput: float = _throughput(
+        sum(r[1] for r in results), time.monotonic() - start, latency
+    )
+
+    return ReadProbe(
+        latency=latency,
+        throughput=throughput,
+        aggregate_throughput=max(aggregate_throughput, throughput),
+    )
+
+
+def read_profile(probe: ReadProbe) -> ReadProfile:
+    """Choose read settings for measured latency and throughput.
+
+    Chunks cover the bytes a stream could download while waiting for a
+    response several times over. Enough processes read at the same time
+    to reach the aggregate throughput, given that each one waits for
+    the response to every chunk.
+    """
+    in_flight: float = probe.throughput * probe.latency * CHUNK_FACTOR
+    chunk_size: int = MIN_CHUNK_SIZE
+    while chunk_size < in_flight and chunk_size < MAX_CHUNK_SIZE:
+        chunk_size *= 2
+
+    high_latency: bool = probe.latency >= HIGH_LATENCY
+
+    stream_throughput: float = chunk_size / (
+        probe.latency + chunk_size / probe.throughput
+    )
+    read_concurrency: int = min(
+        max(ceil(probe.aggregate_throughput / stream_throughput), 1),
+        GLOBALS.cores * MAX_READ_CONCURRENCY_FACTOR,
+    )
+
+    return ReadProfile(
+        chunk_size=chunk_size,
+        multiplex=high_latency,
+        merge_consecutive_ranges=high_latency,
+        vsi_cache_size=min(chunk_size * VSI_CACHE_CHUNKS, MAX_VSI_CACHE_SIZE),
+        curl_cache_size=min(chunk_size * CURL_CACHE_CHUNKS, MAX_CURL_CACHE_SIZE),
+        read_concurrency=read_concurrency,
+    )
+
+
+def apply_read_profile(profile: ReadProfile) -> None:
+    for key, value in profile.gdal_env().items():
+        GDAL_ENV.setdefault(key, value)
+    if GLOBALS.read_concurrency is None:
+        GLOBALS.read_concurrency = profile.read_concurrency
+
+
+def _timed_read(read: RangeReader, offset: int, length: int) -> Tuple[float, int]:
+    start: float = time.monotonic()
+    size: int = len(read(offset, length))
+    return time.monotonic() - start, size
+
+
+def _throughput(size: int, seconds: float, latency: float) -> float:
+    """Bytes per second without latency. If latency dominates, we cannot
+    tell them apart and count latency as transfer time."""
+    if seconds > 2 * latency:
+        seconds -= latency
+    return size / max(seconds, 1e-6)
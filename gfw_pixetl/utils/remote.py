@@ -0,0 +1,119 @@
+import os
+import urllib.request
+from functools import partial
+from typing import Callable, Dict, Tuple
+from urllib.parse import urlparse
+
+from google.cloud import storage
+
+from gfw_pixetl import get_module_logger
+from gfw_pixetl.settings.gdal import GDAL_ENV
+from gfw_pixetl.utils.aws import get_s3_client
+from gfw_pixetl.utils.path import from_vsi
+
+LOGGER = get_module_logger(__name__)
+
+REMOTE_PREFIXES = ("/vsis3/", "/vsigs/", "/vsicurl/")
+
+RangeReader = Callable[[int, int], bytes]
+
+_gcs_clients: Dict[int, storage.Client] = dict()
+
+
+def is_remote(uri: str) -> bool:
+    return uri.startswith(REMOTE_PREFIXES)
+
+
+def range_reader(uri: str) -> RangeReader:
+    """Function which reads length bytes at offset of source file, using
+    the same protocol as GDAL."""
+    if uri.startswith("/vsicurl/"):
+        return partial(_read_http, _url(uri))
+
+    if uri.startswith(("/vsis3/", "/vsigs/")):
+        scheme, bucket, key = _bucket_key(uri)
+        if scheme == "s3":
+            return partial(_read_s3, bucket, key)
+        return partial(_read_gcs, bucket, key)
+
+    return partial(_read_local, uri)
+
+
+def file_info(uri: str) -> Tuple[int, str]:
+    """Size of source file and a tag which changes whenever the file
+    changes."""
+    if uri.startswith("/vsicurl/"):
+        request = urllib.request.Request(_url(uri), method="HEAD")
+        with urllib.request.urlopen(request) as response:
+            return (
+                int(response.headers["Content-Length"]),
+                response.headers.get("ETag", response.headers.get("Last-Modified", "")),
+            )
+
+    if uri.startswith(("/vsis3/", "/vsigs/")):
+        scheme, bucket, key = _bucket_key(uri)
+        if scheme == "s3":
+            response = get_s3_client().head_object(
+                Bucket=bucket,
+                Key=key,
+                RequestPayer=GDAL_ENV.get("AWS_REQUEST_PAYER", "requester"),
+            )
+            return response["ContentLength"], response["ETag"]
+        blob = get_gcs_client().bucket(bucket).get_blob(key)
+        if blob is None:
+            raise FileNotFoundError(uri)
+        return blob.size, blob.etag
+
+    stat = os.stat(uri)
+    return stat.st_size, str(stat.st_mtime_ns)
+
+
+def get_gcs_client() -> storage.Client:
+    """Storage client of current process.
+
+    Creating a client loads credentials and opens a new HTTP session,
+    so we only do it once. Clients are not fork safe, so every process
+    creates its own.
+    """
+    pid: int = os.getpid()
+    if pid not in _gcs_clients:
+        _gcs_clients[pid] = storage.Client()
+    return _gcs_clients[pid]
+
+
+def _url(uri: str) -> str:
+    return uri[len("/vsicurl/") :]
+
+
+def _bucket_key(uri: str) -> Tuple[str, str, str]:
+    parts = urlparse(from_vsi(uri))
+    return parts.scheme, parts.netloc, parts.path[1:]
+
+
+def _read_http(url: str, offset: int, length: int) -> bytes:
+    request = urllib.request.Request(
+        url, headers={"Range": f"bytes={offset}-{offset + length - 1}"}
+    )
+    with urllib.request.urlopen(request) as response:
+        return response.read()
+
+
+def _read_s3(bucket: str, key: str, offset: int, length: int) -> bytes:
+    response = get_s3_client().get_object(
+        Bucket=bucket,
+        Key=key,
+        Range=f"bytes={offset}-{offset + length - 1}",
+        RequestPayer=GDAL_ENV.get("AWS_REQUEST_PAYER", "requester"),
+    )
+    return response["Body"].read()
+
+
+def _read_gcs(bucket: str, key: str, offset: int, length: int) -> bytes:
+    blob = get_gcs_client().bucket(bucket).blob(key)
+    return blob.download_as_bytes(start=offset, end=offset + length - 1)
+
+
+def _read_local(path: str, offset: int, length: int) -> bytes:
+    with open(path, "rb") as f:
+        f.seek(offset)
+        return f.read(length)
@@ -0,0 +1,175 @@
+import json
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, Tuple
+
+import psutil
+
+from gfw_pixetl import get_module_logger, utils
+from gfw_pixetl.layers import Layer
+from gfw_pixetl.models.pydantic import RunReport, StageMetrics
+from gfw_pixetl.settings.globals import GLOBALS
+from gfw_pixetl.utils.aws import get_s3_client
+
+LOGGER = get_module_logger(__name__)
+
+REPORT_NAME = "report.json"
+
+# Bytes read and written and peak resident memory of all window workers,
+# which ran on behalf of the current process
+_worker_usage: Dict[str, int] = {"bytes_read": 0, "bytes_written": 0, "peak_rss": 0}
+
+# Chunks read from and missing in the source cache, by the current process
+# and by window workers on its behalf
+_cache_usage: Dict[str, int] = {"hits": 0, "misses": 0}
+
+
+def io_counters(process: psutil.Process) -> Tuple[int, int]:
+    """Bytes read and written by process, including network and cached
+    I/O where the platform reports it."""
+    try:
+        counters = process.io_counters()
+    except (AttributeError, psutil.Error):
+        return 0, 0
+    return (
+        getattr(counters, "read_chars", counters.read_bytes),
+        getattr(counters, "write_chars", counters.write_bytes),
+    )
+
+
+def add_worker_usage(bytes_read: int, bytes_written: int, peak_rss: int) -> None:
+    """Attribute I/O and memory of window workers to the stage currently
+    measured in this process."""
+    _worker_usage["bytes_read"] += bytes_read
+    _worker_usage["bytes_written"] += bytes_written
+    _worker_usage["peak_rss"] = max(_worker_usage["peak_rss"], peak_rss)
+
+
+def add_cache_usage(hits: int, misses: int) -> None:
+    """Count chunks read from and missing in the source cache."""
+    _cache_usage["hits"] += hits
+    _cache_usage["misses"] += misses
+
+
+def cache_usage() -> Tuple[int, int]:
+    """Chunks read from and missing in the source cache so far."""
+    return _cache_usage["hits"], _cache_usage["misses"]
+
+
+@contextmanager
+def measure(
+    metrics: Dict[str, StageMetrics], stage: str, tiles: int = 1
+) -> Iterator[None]:
+    """Measure wall time, CPU time, resident memory and I/O of the current
+    process while running a stage for given number of tiles and add them
+    to metrics.
+
+    Nested stages are also counted towards the enclosing stage.
+    """
+    process = psutil.Process(os.getpid())
+    start_read, start_written = io_counters(process)
+    start_worker_read = _worker_usage["bytes_read"]
+    start_worker_written = _worker_usage["bytes_written"]
+    start_rss = process.memory_info().rss
+    start_hits, start_misses = cache_usage()
+    start_cpu = _cpu_time(process)
+    start_time = time.monotonic()
+    # only count worker memory seen during this stage
+    worker_rss, _worker_usage["peak_rss"] = _worker_usage["peak_rss"], 0
+
+    try:
+        yield
+    finally:
+        end_read, end_written = io_counters(process)
+        worker_read = _worker_usage["bytes_read"] - start_worker_read
+        worker_written = _worker_usage["bytes_written"] - start_worker_written
+        rss = max(start_rss, process.memory_info().rss)
+        hits, misses = cache_usage()
+
+        stage_metrics = StageMetrics(
+            wall_time=time.monotonic() - start_time,
+            cpu_time=_cpu_time(process) - start_cpu,
+            peak_rss=rss + _worker_usage["peak_rss"],
+            bytes_read=end_read - start_read + worker_read,
+            bytes_written=end_written - start_written + worker_written,
+            tiles=tiles,
+            cache_hits=hits - start_hits,
+            cache_misses=misses - start_misses,
+        )
+        _worker_usage["peak_rss"] = max(worker_rss, _worker_usage["peak_rss"])
+        add_metrics(metrics, stage, stage_metrics)
+
+
+def add_metrics(
+    metrics: Dict[str, StageMetrics], stage: str, stage_metrics: StageMetrics
+) -> None:
+    if stage not in metrics:
+        metrics[stage] = StageMetrics()
+    metrics[stage].merge(stage_metrics)
+
+
+def merge_metrics(
+    all_metrics: Iterable[Dict[str, StageMetrics]]
+) -> Dict[str, StageMetrics]:
+    """Aggregate metrics of all tiles and processes by stage."""
+    merged: Dict[str, StageMetrics] = dict()
+    for metrics in all_metrics:
+        for stage, stage_metrics in metrics.items():
+            add_metrics(merged, stage, stage_metrics)
+    return merged
+
+
+def create_report(
+    layer: Layer,
+    started: datetime,
+    wall_time: float,
+    tile_counts: Dict[str, int],
+    all_metrics: Iterable[Dict[str, StageMetrics]]
+) -> RunReport:
+    """Combine metrics of the pipe and of all tiles into one run report."""
+    stages: Dict[str, StageMetrics] = merge_metrics(all_metrics)
+    report = RunReport(
+        dataset=layer.name,
+        version=layer.version,
+        grid=layer.grid.name,
+        started=started.isoformat(),
+        wall_time=wall_time,
+        processed_tiles=tile_counts.get("processed", 0),
+        skipped_tiles=tile_counts.get("skipped", 0),
+        failed_tiles=tile_counts.get("failed", 0),
+        stages=stages,
+    )
+
+    for stage, m in stages.items():
+        LOGGER.info(
+            f"Stage {stage}: {m.tiles} tiles, {m.wall_time:.1f}s wall time, "
+            f"{m.cpu_time:.1f}s CPU time, peak RSS {m.peak_rss / 1000000:.0f} MB, "
+            f"read {m.bytes_read / 1000000:.1f} MB, "
+            f"written {m.bytes_written / 1000000:.1f} MB"
+        )
+        if m.cache_hits or m.cache_misses:
+            LOGGER.info(
+                f"Stage {stage}: {m.cache_hits} source cache hits, "
+                f"{m.cache_misses} misses, hit rate {m.cache_hit_rate:.0%}"
+            )
+    return report
+
+
+def upload_report(
+    report: RunReport, prefix: str, bucket: str = utils.get_bucket()
+) -> Dict[str, Any]:
+    """Upload run report next to tiles.geojson of default format."""
+    key = os.path.join(prefix, GLOBALS.default_dst_format, REPORT_NAME)
+    LOGGER.info(f"Upload run report to {bucket} {key}")
+    return get_s3_client().put_object(
+        Body=str.encode(json.dumps(report.dict(), indent=2)),
+        Bucket=bucket,
+        Key=key,
+    )
+
+
+def _cpu_time(process: psutil.Process) -> float:
+    cpu = process.cpu_times()
+    return cpu.user + cpu.system + cpu.children_user + cpu.children_system
@@ -0,0 +1,206 @@
+import hashlib
+import io
+import os
+import shutil
+import xml.etree.ElementTree as ET
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import rasterio
+from rasterio.io import DatasetReader
+
+from gfw_pixetl import get_module_logger
+from gfw_pixetl.settings.globals import GLOBALS
+from gfw_pixetl.utils.path import create_dir
+from gfw_pixetl.utils.remote import file_info, is_remote, range_reader
+from gfw_pixetl.utils.report import add_cache_usage
+
+LOGGER = get_module_logger(__name__)
+
+# Source files are cached in chunks of this size. Changing it invalidates
+# all cached chunks, b/c it is part of the cache key
+CHUNK_SIZE = 1024 * 1024
+
+# Once free space drops below the minimum, evict until this much more is free
+EVICTION_HEADROOM = 1.25
+
+
+class SourceCache(object):
+    """Byte range cache of remote source files on local disk, shared by
+    all processes of a host.
+
+    Files are split into chunks, each chunk is stored as a separate
+    file, named after its position. Chunks are fetched on first read
+    and written atomically, so that processes never see partial chunks.
+    The modification time of a chunk is updated whenever it is read.
+    Least recently used chunks are deleted, once free space on the
+    volume drops below the minimum. Cache keys include size and tag of
+    the remote file, so changed files are never served from the cache.
+    """
+
+    def __init__(self, cache_dir: str, min_free: int) -> None:
+        self.cache_dir: str = create_dir(cache_dir)
+        self.min_free: int = min_free
+        # Remote sources referenced by cached VRTs, by their normalized path
+        self._sources: Dict[str, str] = dict()
+        self._file_keys: Dict[str, Tuple[str, int]] = dict()
+
+    def open(self, path: str, mode: str = "rb") -> io.RawIOBase:
+        """Open file for GDAL, serving remote sources from the cache."""
+        if "w" in mode or "+" in mode:
+            raise PermissionError(f"Source cache is read only: {path}")
+        remote: Optional[str] = self._sources.get(os.path.normpath(path))
+        if remote is None:
+            return open(path, "rb", buffering=0)
+        return CachedFile(self, remote)
+
+    def cached_vrt(self, vrt: str) -> str:
+        """Copy of VRT, which references remote sources relative to the
+        VRT, so that GDAL opens them through the cache opener."""
+        vrt_dir: str = os.path.dirname(os.path.abspath(vrt))
+        tree = ET.parse(vrt)
+        for element in tree.iter("SourceFilename"):
+            if element.text and is_remote(element.text):
+                self._sources[os.path.normpath(element.text)] = element.text
+                element.text = os.path.relpath(element.text, vrt_dir)
+                element.set("relativeToVRT", "1")
+
+        root, ext = os.path.splitext(os.path.abspath(vrt))
+        cached: str = f"{root}_cached_{os.getpid()}{ext}"
+        tree.write(cached)
+        return cached
+
+    def file_key(self, uri: str) -> Tuple[str, int]:
+        """Cache directory name and size of remote file, looked up once per
+        process."""
+        if uri not in self._file_keys:
+            size, tag = file_info(uri)
+            key: str = hashlib.sha1(
+                f"{uri}:{size}:{tag}:{CHUNK_SIZE}".encode()
+            ).hexdigest()
+            self._file_keys[uri] = key, size
+        return self._file_keys[uri]
+
+    def read_chunk(self, uri: str, index: int) -> bytes:
+        key, size = self.file_key(uri)
+        chunk_file: str = os.path.join(self.cache_dir, key, str(index))
+        try:
+            with open(chunk_file, "rb") as f:
+                chunk: bytes = f.read()
+            os.utime(chunk_file)
+            add_cache_usage(1, 0)
+            return chunk
+        except FileNotFoundError:
+            pass
+
+        offset: int = index * CHUNK_SIZE
+        chunk = range_reader(uri)(offset, min(CHUNK_SIZE, size - offset))
+        add_cache_usage(0, 1)
+
+        self.evict()
+        create_dir(os.path.dirname(chunk_file))
+        tmp_file: str = f"{chunk_file}.{os.getpid()}.tmp"
+        with open(tmp_file, "wb") as f:
+            f.write(chunk)
+        os.replace(tmp_file, chunk_file)
+        return chunk
+
+    def evict(self) -> None:
+        """Delete least recently used chunks, until enough space is
+        free."""
+        free: int = shutil.disk_usage(self.cache_dir).free
+        if free >= self.min_free:
+            return
+
+        chunks: List[Tuple[float, int, str]] = list()
+        for key_dir in os.scandir(self.cache_dir):
+            if not key_dir.is_dir():
+                continue
+            for chunk in os.scandir(key_dir.path):
+                try:
+                    stat = chunk.stat()
+                except FileNotFoundError:
+                    continue  # evicted by another process
+                chunks.append((stat.st_mtime, stat.st_size, chunk.path))
+
+        target: float = self.min_free * EVICTION_HEADROOM
+        evicted: int = 0
+        for _, chunk_size, chunk_file in sorted(chunks):
+            if free >= target:
+                break
+            try:
+                os.remove(chunk_file)
+            except FileNotFoundError:
+                continue
+            free += chunk_size
+            evicted += 1
+
+        LOGGER.info(f"Evicted {evicted} chunks from source cache {self.cache_dir}")
+
+
+class CachedFile(io.RawIOBase):
+    """Read only file object of a remote source, which reads whole chunks
+    through the source cache.
+
+    The last chunk is kept in memory, GDAL reads headers with many
+    small reads.
+    """
+
+    def __init__(self, cache: SourceCache, uri: str) -> None:
+        self.cache: SourceCache = cache
+        self.uri: str = uri
+        self.size: int = cache.file_key(uri)[1]
+        self.position: int = 0
+        self._chunk: Tuple[int, bytes] = (-1, b"")
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        self.position = max(offset, 0)
+        return self.position
+
+    def readinto(self, buffer) -> int:
+        view = memoryview(buffer).cast("B")
+        length: int = min(len(view), max(self.size - self.position, 0))
+        read: int = 0
+        while read < length:
+            index, start = divmod(self.position, CHUNK_SIZE)
+            if self._chunk[0] != index:
+                self._chunk = index, self.cache.read_chunk(self.uri, index)
+            part: bytes = self._chunk[1][start : start + length - read]
+            if not part:
+                break
+            view[read : read + len(part)] = part
+            read += len(part)
+            self.position += len(part)
+        return read
+
+
+@lru_cache(maxsize=1)
+def get_source_cache() -> Optional[SourceCache]:
+    """Source cache of this host, if enabled."""
+    if not GLOBALS.source_cache_dir:
+        return None
+    return SourceCache(
+        GLOBALS.source_cache_dir, GLOBALS.source_cache_min_free * 1000000
+    )
+
+
+def open_source(uri: str) -> DatasetReader:
+    """Open source, reading remote files through the source cache if
+    enabled."""
+    cache: Optional[SourceCache] = get_source_cache()
+    if cache is None or not uri.endswith(".vrt"):
+        return rasterio.open(uri, "r", sharing=False)
+    return rasterio.open(cache.cached_vrt(uri), "r", sharing=False, opener=cache.open)
@@ -0,0 +1,257 @@
+from math import floor, sqrt
+from typing import List, Optional, Tuple, Union
+
+import numpy as np
+
+from gfw_pixetl import get_module_logger
+from gfw_pixetl.models.pydantic import BandStats, Histogram
+
+LOGGER = get_module_logger(__name__)
+
+# Maximum number of fine bins kept per band before bins are merged
+FINE_BINS = 2 ** 16
+
+# Number of buckets in final histogram, same as GDAL default histogram
+BUCKETS = 256
+
+# Maximum size of slices converted to float64 at once
+CHUNK_BYTES = 16 * 1024 * 1024
+
+
+class BandStatsAccumulator(object):
+    """Accumulate statistics and histogram of one band from a stream of
+    arrays.
+
+    Accumulators of different windows or processes can be merged.
+    Min, max, mean and standard deviation (Chan et al.) are exact.
+    Values are counted in fine bins whose width is a power of two. For
+    integer data with a value range below FINE_BINS, bins have a width of
+    one and the final histogram matches the one computed by GDAL. In all
+    other cases, values of a fine bin are assigned to the bucket of the
+    bin center.
+    """
+
+    def __init__(self, dtype: str, no_data: Optional[Union[int, float]] = None):
+        self.dtype: np.dtype = np.dtype(dtype)
+        self.no_data = no_data
+
+        self.pixels: int = 0
+        self.count: int = 0
+        self.mean: float = 0.0
+        self.m2: float = 0.0
+        self.min: float = np.inf
+        self.max: float = -np.inf
+
+        self.bin_width: float = 1.0
+        self.bin_offset: float = 0.0
+        self.bins: np.ndarray = np.zeros(0, dtype="int64")
+
+    @property
+    def is_integer(self) -> bool:
+        return np.issubdtype(self.dtype, np.integer)
+
+    def update(self, array: np.ndarray) -> None:
+        """Add all valid pixels of array."""
+        self.pixels += array.size
+        if not array.size:
+            return
+
+        rows: int = array.shape[0] if array.ndim > 1 else array.size
+        row_bytes: int = max(array.size // rows, 1) * 8
+        chunk_rows: int = max(CHUNK_BYTES // row_bytes, 1)
+
+        for row in range(0, rows, chunk_rows):
+            chunk = array[row : row + chunk_rows]
+            valid = np.ones(chunk.shape, dtype=bool)
+            if self.no_data is not None:
+                valid &= chunk != self.no_data
+            if not self.is_integer:
+                valid &= ~np.isnan(chunk)
+            self._add_values(chunk[valid].astype("float64"))
+
+    def add_constant(self, value: Union[int, float], count: int) -> None:
+        """Add the same value count times, ie for pixels which were never
+        written."""
+        self.pixels += count
+        if count and value != self.no_data:
+            values = np.full(1, value, dtype="float64")
+            self._add_values(values, np.full(1, count, dtype="int64"))
+
+    def merge(self, other: "BandStatsAccumulator") -> "BandStatsAccumulator":
+        """Merge statistics of other accumulator into this one."""
+        self.pixels += other.pixels
+        if not other.count:
+            return self
+
+        self._merge_moments(other.count, other.mean, other.m2)
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+        self._merge_bins(other.bin_offset, other.bin_width, other.bins)
+        return self
+
+    def stats(self) -> Optional[BandStats]:
+        if not self.count:
+            return None
+        return BandStats(
+            min=self.min,
+            max=self.max,
+            mean=self.mean,
+            std_dev=sqrt(self.m2 / self.count),
+        )
+
+    def histogram(self) -> Optional[Histogram]:
+        """Histogram with 256 buckets, using the same range as GDAL's
+        default histogram."""
+        if not self.count:
+            return None
+
+        if self.dtype == np.dtype("uint8"):
+            _min, _max = -0.5, 255.5
+        elif self.dtype == np.dtype("int8"):
+            _min, _max = -128.5, 127.5
+        else:
+            half_bucket = (self.max - self.min) / (2 * (BUCKETS - 1))
+            _min, _max = self.min - half_bucket, self.max + half_bucket
+
+        values = self.bin_offset + np.arange(self.bins.size) * self.bin_width
+        if not (self.is_integer and self.bin_width == 1):
+            values = np.clip(values + self.bin_width / 2, self.min, self.max)
+
+        if _max > _min:
+            index = np.floor((values - _min) * BUCKETS / (_max - _min))
+        else:
+            index = np.zeros(values.shape)
+        index = np.clip(index, 0, BUCKETS - 1).astype("int64")
+
+        buckets = np.bincount(index, weights=self.bins, minlength=BUCKETS)
+        return Histogram(
+            count=BUCKETS,
+            min=_min,
+            max=_max,
+            buckets=[int(b) for b in np.rint(buckets)],
+        )
+
+    def _add_values(self, values: np.ndarray, weights: Optional[np.ndarray] = None):
+        if not values.size:
+            return
+
+        if weights is None:
+            count = values.size
+            mean = float(values.mean())
+            m2 = float(((values - mean) ** 2).sum())
+        else:
+            count = int(weights.sum())
+            mean = float((values * weights).sum() / count)
+            m2 = float((((values - mean) ** 2) * weights).sum())
+
+        self._merge_moments(count, mean, m2)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+        if not self.bins.size:
+            self._init_bins(float(values.min()), float(values.max()))
+        offset, bins = self._cover(float(values.min()), float(values.max()))
+        index = np.floor((values - offset) / self.bin_width).astype("int64")
+        index = np.clip(index, 0, bins.size - 1)
+        bins += np.bincount(index, weights=weights, minlength=bins.size).astype(
+            "int64"
+        )
+        self.bin_offset, self.bins = offset, bins
+
+    def _merge_moments(self, count: int, mean: float, m2: float) -> None:
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta ** 2 * self.count * count / total
+        self.count = total
+
+    def _init_bins(self, _min: float, _max: float) -> None:
+        if self.is_integer or _max == _min:
+            self.bin_width = 1.0
+        else:
+            self.bin_width = 2.0 ** floor(np.log2((_max - _min) / FINE_BINS))
+        self.bin_offset = floor(_min / self.bin_width) * self.bin_width
+
+    def _cover(self, _min: float, _max: float) -> Tuple[float, np.ndarray]:
+        """Extend bins so that they cover range, merging neighboring bins
+        if there would be too many."""
+        offset, bins = self.bin_offset, self.bins
+        if bins.size:
+            _min = min(_min, offset)
+            _max = max(_max, offset + (bins.size - 1) * self.bin_width)
+
+        while True:
+            start = floor(_min / self.bin_width) * self.bin_width
+            size = int((_max - start) // self.bin_width) + 1
+            if size <= FINE_BINS:
+                break
+            offset, bins = self._coarsen(offset, bins)
+
+        lead = int(round((offset - start) / self.bin_width)) if bins.size else 0
+        extended = np.zeros(size, dtype="int64")
+        extended[lead : lead + bins.size] = bins
+        return start, extended
+
+    def _coarsen(self, offset: float, bins: np.ndarray) -> Tuple[float, np.ndarray]:
+        """Double width of bins, keeping offset aligned to new width."""
+        width = self.bin_width * 2
+        start = floor(offset / width) * width
+        lead = int(round((offset - start) / self.bin_width))
+        padded = np.zeros(lead + bins.size + (lead + bins.size) % 2, dtype="int64")
+        padded[lead : lead + bins.size] = bins
+        self.bin_width = width
+        return start, padded.reshape(-1, 2).sum(axis=1)
+
+    def _merge_bins(self, offset: float, width: float, bins: np.ndarray) -> None:
+        if not self.bins.size:
+            self.bin_offset, self.bin_width, self.bins = offset, width, bins.copy()
+            return
+
+        other = BandStatsAccumulator(self.dtype.name)
+        other.bin_offset, other.bin_width, other.bins = offset, width, bins
+
+        # bring both to the same bin width
+        while other.bin_width < self.bin_width:
+            other.bin_offset, other.bins = other._coarsen(other.bin_offset, other.bins)
+        while self.bin_width < other.bin_width:
+            self.bin_offset, self.bins = self._coarsen(self.bin_offset, self.bins)
+
+        last = other.bin_offset + (other.bins.size - 1) * other.bin_width
+        start, merged = self._cover(other.bin_offset, last)
+        # covering might have coarsened own bins
+        while other.bin_width < self.bin_width:
+            other.bin_offset, other.bins = other._coarsen(other.bin_offset, other.bins)
+
+        lead = int(round((other.bin_offset - start) / self.bin_width))
+        merged[lead : lead + other.bins.size] += other.bins
+        self.bin_offset, self.bins = start, merged
+
+
+class RasterStats(object):
+    """Statistics accumulators for all bands of a raster."""
+
+    def __init__(
+        self, dtype: str, no_data: Optional[Union[int, float]] = None, count: int = 1
+    ) -> None:
+        self.bands: List[BandStatsAccumulator] = [
+            BandStatsAccumulator(dtype, no_data) for _ in range(count)
+        ]
+
+    def update(self, array: np.ndarray) -> None:
+        """Add array of shape (bands, rows, cols) or (rows, cols)."""
+        if array.ndim == 2:
+            array = array.reshape((1,) + array.shape)
+        for band, band_array in zip(self.bands, array):
+            band.update(band_array)
+
+    def merge(self, other: Optional["RasterStats"]) -> "RasterStats":
+        if other is not None:
+            for band, other_band in zip(self.bands, other.bands):
+                band.merge(other_band)
+        return self
+
+    def fill(self, pixels: int, value: Union[int, float] = 0) -> None:
+        """Account for pixels which were never written and hold value."""
+        for band in self.bands:
+            band.add_constant(value, max(pixels - band.pixels, 0))
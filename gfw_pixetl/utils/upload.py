@@ -0,0 +1,148 @@
+import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import List, Optional, Set
+
+from boto3.s3.transfer import TransferConfig
+
+from gfw_pixetl import get_module_logger
+from gfw_pixetl.models.pydantic import UploadMetrics
+from gfw_pixetl.settings.globals import GLOBALS
+from gfw_pixetl.utils.aws import get_s3_client
+
+LOGGER = get_module_logger(__name__)
+
+MB = 1024 * 1024
+
+
+class Uploader(object):
+    """Upload files to S3 in background threads.
+
+    The pool is bounded, so only a fixed number of files is uploaded at
+    the same time, each using multipart uploads with concurrent parts.
+    Uploads are IO bound and run alongside CPU heavy processing in the
+    same process.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = GLOBALS.upload_workers,
+        max_concurrency: int = GLOBALS.upload_concurrency,
+        chunk_size: int = GLOBALS.upload_chunk_size * MB,
+    ) -> None:
+        self.config = TransferConfig(
+            multipart_threshold=chunk_size,
+            multipart_chunksize=chunk_size,
+            max_concurrency=max_concurrency,
+            use_threads=True,
+        )
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="upload"
+        )
+        self._pending: Set[Future] = set()
+
+    def submit(self, local_uri: str, bucket: str, key: str) -> "Future[UploadMetrics]":
+        """Start uploading file, returns future of upload metrics."""
+        LOGGER.debug(f"Queue upload of {local_uri} to s3://{bucket}/{key}")
+        return self._track(self._executor.submit(self._upload, local_uri, bucket, key))
+
+    def submit_dir(
+        self, local_dir: str, bucket: str, prefix: str
+    ) -> "Future[UploadMetrics]":
+        """Start uploading all files of a directory, returns future of
+        upload metrics of the entire directory."""
+        LOGGER.debug(f"Queue upload of {local_dir} to s3://{bucket}/{prefix}")
+        return self._track(
+            self._executor.submit(self._upload_dir, local_dir, bucket, prefix)
+        )
+
+    def drain(self) -> None:
+        """Wait until all queued uploads finished, successful or not."""
+        pending: List[Future] = list(self._pending)
+        if pending:
+            LOGGER.debug(f"Wait for {len(pending)} pending uploads")
+            wait(pending)
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
+
+    def _track(self, future: Future) -> Future:
+        self._pending.add(future)
+        future.add_done_callback(self._pending.discard)
+        return future
+
+    def _upload(self, local_uri: str, bucket: str, key: str) -> UploadMetrics:
+        size: int = os.path.getsize(local_uri)
+        start: float = time.monotonic()
+
+        get_s3_client().upload_file(local_uri, bucket, key, Config=self.config)
+
+        seconds: float = time.monotonic() - start
+        metrics = UploadMetrics(
+            uri=f"s3://{bucket}/{key}",
+            size=size,
+            seconds=seconds,
+            throughput=size / MB / seconds if seconds else 0.0,
+        )
+        LOGGER.info(
+            f"Uploaded {metrics.uri} ({size / MB:.1f} MB) in {seconds:.1f}s "
+            f"at {metrics.throughput:.1f} MB/s"
+        )
+        return metrics
+
+    def _upload_dir(self, local_dir: str, bucket: str, prefix: str) -> UploadMetrics:
+        """Upload many small files, such as Zarr chunks, concurrently."""
+        local_uris: List[str] = [
+            os.path.join(root, name)
+            for root, _, names in os.walk(local_dir)
+            for name in names
+        ]
+        start: float = time.monotonic()
+
+        def upload_file(local_uri: str) -> int:
+            key = os.path.join(prefix, os.path.relpath(local_uri, local_dir))
+            get_s3_client().upload_file(local_uri, bucket, key, Config=self.config)
+            return os.path.getsize(local_uri)
+
+        with ThreadPoolExecutor(max_workers=self.config.max_concurrency) as executor:
+            size: int = sum(executor.map(upload_file, local_uris))
+
+        seconds: float = time.monotonic() - start
+        metrics = UploadMetrics(
+            uri=f"s3://{bucket}/{prefix}",
+            size=size,
+            seconds=seconds,
+            throughput=size / MB / seconds if seconds else 0.0,
+        )
+        LOGGER.info(
+            f"Uploaded {len(local_uris)} files to {metrics.uri} ({size / MB:.1f} MB) "
+            f"in {seconds:.1f}s at {metrics.throughput:.1f} MB/s"
+        )
+        return metrics
+
+
+_uploader: Optional[Uploader] = None
+_uploader_pid: Optional[int] = None
+
+
+def get_uploader() -> Uploader:
+    """Uploader of current process.
+
+    Threads do not survive a fork, so every process creates its own.
+    """
+    global _uploader, _uploader_pid
+
+    if _uploader is None or _uploader_pid != os.getpid():
+        _uploader = Uploader()
+        _uploader_pid = os.getpid()
+    return _uploader
+
+
+def drain_uploads() -> None:
+    """Wait for pending uploads of the current process, if any.
+
+    Processes must not be forked while upload threads are running, b/c
+    children might inherit locks held by these threads.
+    """
+    if _uploader is not None and _uploader_pid == os.getpid():
+        _uploader.drain()
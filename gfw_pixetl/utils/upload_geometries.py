@@ -1,8 +1,8 @@
 import json
 import math
 import os
-from copy import deepcopy
-from typing import Any, Dict, List, Optional, Tuple, Union
+from tempfile import TemporaryFile
+from typing import IO, Any, Dict, List, Optional, Tuple, Union
 
 from botocore.exceptions import ClientError
 from geojson import Feature, FeatureCollection, dumps
@@ -10,6 +10,7 @@ from shapely.geometry import MultiPolygon, Polygon, shape
 from shapely.ops import unary_union
 
 from gfw_pixetl import get_module_logger, utils
+from gfw_pixetl.grids import Grid
 from gfw_pixetl.models.types import FeatureTuple
 from gfw_pixetl.settings.globals import GLOBALS
 from gfw_pixetl.tiles import Tile
@@ -37,8 +38,13 @@ def upload_geojsons(
     prefix: str,
     bucket: str = utils.get_bucket(),
     ignore_existing_tiles=False,
+    grid: Optional[Grid] = None,
 ) -> List[Dict[str, Any]]:
-    """Create geojson listing all tiles and upload to S3."""
+    """Create geojson listing all tiles and upload to S3.
+
+    If tiles are cells of given grid, the extent is computed from the
+    grid cells instead of merging tile polygons.
+    """
 
     response: List[Dict[str, Any]] = list()
 
@@ -54,7 +60,9 @@ def upload_geojsons(
             fc = _merge_feature_collections(fc, bucket, key)
 
         response.append(_upload_geojson(fc, bucket, key))
-        response.append(_upload_extent(fc, prefix=prefix, dst_format=dst_format))
+        response.append(
+            _upload_extent(fc, prefix=prefix, dst_format=dst_format, grid=grid)
+        )
     return response
 
 
@@ -69,9 +77,10 @@ def _merge_feature_collections(
     were already computed.
     """
 
-    names = [feature["properties"]["name"] for feature in fc["features"]]
+    features: Dict[str, Dict[str, Any]] = {
+        feature["properties"]["name"]: feature for feature in fc["features"]
+    }
     client = get_s3_client()
-    new_fc = deepcopy(fc)
     try:
         obj = client.get_object(Bucket=bucket, Key=key)
     except ClientError as ex:
@@ -80,9 +89,8 @@ def _merge_feature_collections(
     else:
         old_fc = json.loads(obj["Body"].read())
         for feature in old_fc["features"]:
-            if feature["properties"]["name"] not in names:
-                new_fc["features"].append(feature)
-    return new_fc
+            features.setdefault(feature["properties"]["name"], feature)
+    return FeatureCollection(list(features.values()))
 
 
 def _uris_per_dst_format(tiles) -> Dict[str, List[str]]:
@@ -124,9 +132,19 @@ def _geoms_uris_per_dst_format(
     return geoms
 
 
-def _union_tile_geoms(fc: FeatureCollection) -> FeatureCollection:
+def _union_tile_geoms(
+    fc: FeatureCollection, grid: Optional[Grid] = None
+) -> FeatureCollection:
     """Union tiles bounds into a single geometry."""
 
+    if grid is not None:
+        LOGGER.debug("Create Polygon from grid cells")
+        tile_ids: List[str] = [
+            os.path.splitext(os.path.basename(feature["properties"]["name"]))[0]
+            for feature in fc["features"]
+        ]
+        return _to_feature_collection([(grid.extent(tile_ids), None)])
+
     LOGGER.debug("Create Polygon from tile bounds")
 
     polygons: List[Polygon] = [shape(feature["geometry"]) for feature in fc["features"]]
@@ -154,14 +172,24 @@ def _to_feature_collection(geoms: FeatureTuple) -> FeatureCollection:
     return FeatureCollection(features)
 
 
+def _write_geojson(fc: FeatureCollection, f: IO[bytes]) -> None:
+    """Serialize feature collection one feature at a time, so that we never
+    hold the entire document in memory."""
+    f.write(b'{"type": "FeatureCollection", "features": [')
+    for i, feature in enumerate(fc["features"]):
+        if i:
+            f.write(b", ")
+        f.write(str.encode(dumps(feature)))
+    f.write(b"]}")
+
+
 def _upload_geojson(fc: FeatureCollection, bucket: str, key: str) -> Dict[str, Any]:
 
     LOGGER.info(f"Upload geometry to {bucket} {key}")
-    return S3.put_object(
-        Body=str.encode(dumps(fc)),
-        Bucket=bucket,
-        Key=key,
-    )
+    with TemporaryFile() as f:
+        _write_geojson(fc, f)
+        f.seek(0)
+        return S3.put_object(Body=f, Bucket=bucket, Key=key)
 
 
 def _upload_extent(
@@ -169,10 +197,11 @@ def _upload_extent(
     prefix: str,
     dst_format: str,
     bucket: str = utils.get_bucket(),
+    grid: Optional[Grid] = None,
 ) -> Dict[str, Any]:
     """Create geojson file for tileset extent and upload to S3."""
 
-    extent_fc = _union_tile_geoms(fc)
+    extent_fc = _union_tile_geoms(fc, grid)
     key = os.path.join(prefix, dst_format, "extent.geojson")
 
     return _upload_geojson(extent_fc, bucket, key)
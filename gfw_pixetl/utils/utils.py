@@ -1,6 +1,6 @@
 import datetime
 import os
-from math import floor
+from math import ceil, floor
 from typing import Optional
 
 from pyproj import CRS, Transformer
@@ -45,7 +45,15 @@ def available_memory_per_process_mb() -> float:
 
 
 def get_co_workers() -> int:
-    return floor(GLOBALS.cores / GLOBALS.workers)
+    """Number of processes transforming windows of a tile.
+
+    Reading remote sources with high latency profits from more readers
+    than cores.
+    """
+    co_workers: int = floor(GLOBALS.cores / GLOBALS.workers)
+    if GLOBALS.read_concurrency:
+        co_workers = max(co_workers, ceil(GLOBALS.read_concurrency / GLOBALS.workers))
+    return co_workers
 
 
 def snapped_window(window):
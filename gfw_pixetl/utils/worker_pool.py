@@ -0,0 +1,249 @@
+import multiprocessing
+import os
+import traceback
+from multiprocessing.connection import wait
+from multiprocessing.process import BaseProcess
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import psutil
+
+from gfw_pixetl import get_module_logger
+from gfw_pixetl.utils.report import io_counters
+from gfw_pixetl.utils.upload import drain_uploads
+
+LOGGER = get_module_logger(__name__)
+
+# Workers inherit the (unpicklable) state of the parent process, ie open tiles
+CONTEXT = multiprocessing.get_context("fork")
+
+# Attempts to process a task, before giving up on workers dying while processing it
+MAX_ATTEMPTS = 3
+
+# Task index of idle workers
+IDLE = -1
+
+# index of task, pid of worker, success flag, result or traceback, recycle flag,
+# resident memory of worker, bytes read and written by worker so far
+Result = Tuple[int, int, bool, Any, bool, int, int, int]
+
+
+class WorkerPool(object):
+    """Pool of long lived worker processes.
+
+    Each worker calls `initializer` once and passes the returned state
+    to `func` for every task it processes. This allows workers to keep
+    file handles open across tasks. Once the resident memory of a worker
+    exceeds `max_rss` bytes after finishing a task, the worker closes its
+    state, exits and is replaced by a fresh process. Workers which die
+    while processing a task, ie killed for running out of memory, are
+    replaced as well and their task is resubmitted. The highest
+    resident memory reported by any worker is kept in `peak_rss`, bytes
+    read and written by all workers in `bytes_read` and `bytes_written`.
+
+    Workers are forked. Pending uploads of the current process are
+    awaited first, so that workers never inherit locks held by upload
+    threads.
+    """
+
+    def __init__(
+        self,
+        processes: int,
+        func: Callable[[Any, Any], Any],
+        initializer: Callable[[], Any],
+        finalizer: Optional[Callable[[Any], None]] = None,
+        max_rss: Optional[float] = None,
+        poll_interval: float = 5,
+    ) -> None:
+        self.processes: int = max(processes, 1)
+        self.func = func
+        self.initializer = initializer
+        self.finalizer = finalizer
+        self.max_rss = max_rss
+        self.poll_interval = poll_interval
+
+        self.recycled: int = 0
+        self.respawned: int = 0
+        self.peak_rss: int = 0
+        self.bytes_read: int = 0
+        self.bytes_written: int = 0
+        self._io: Dict[int, Tuple[int, int]] = dict()
+        self._workers: Dict[int, BaseProcess] = dict()
+        # index of task each worker is currently processing, shared with worker
+        self._current: Dict[int, Any] = dict()
+        # tasks without result, to resubmit those of workers which died
+        self._pending: Dict[int, Any] = dict()
+        self._attempts: Dict[int, int] = dict()
+        self._tasks: multiprocessing.Queue = CONTEXT.Queue()
+        # Results are written synchronously, so workers which die never hold
+        # the lock of the queue or take unsent results with them
+        self._results: multiprocessing.SimpleQueue = CONTEXT.SimpleQueue()
+
+    def __enter__(self) -> "WorkerPool":
+        for _ in range(self.processes):
+            self._start_worker()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.terminate()
+
+    def map(self, tasks: Iterable[Any]) -> List[Any]:
+        """Process all tasks and return results in order of tasks."""
+        task_count = 0
+        for i, task in enumerate(tasks):
+            self._pending[i] = task
+            self._attempts[i] = 1
+            self._tasks.put((i, task))
+            task_count += 1
+
+        results: List[Any] = [None] * task_count
+        for n in range(task_count, 0, -1):
+            i, pid, success, value, recycle, rss, read, written = self._next_result()
+            self.peak_rss = max(self.peak_rss, rss)
+            last_read, last_written = self._io.get(pid, (0, 0))
+            self.bytes_read += read - last_read
+            self.bytes_written += written - last_written
+            self._io[pid] = (read, written)
+
+            if recycle:
+                # only start a new worker if there are tasks left to process
+                self._replace_worker(pid, respawn=n > len(self._workers))
+            if not success:
+                raise RuntimeError(f"Task {i} failed in worker {pid}:\n{value}")
+
+            self._pending.pop(i, None)
+            results[i] = value
+
+        return results
+
+    def close(self) -> None:
+        """Stop all workers once they finished their current task."""
+        for _ in self._workers:
+            self._tasks.put(None)
+        for worker in self._workers.values():
+            worker.join()
+        self._workers = dict()
+        self._current = dict()
+
+    def terminate(self) -> None:
+        """Stop all workers immediately."""
+        for worker in self._workers.values():
+            worker.terminate()
+            worker.join()
+        self._workers = dict()
+        self._current = dict()
+
+    def _next_result(self) -> Result:
+        # SimpleQueue has no timeout, poll its pipe like concurrent.futures does
+        while not wait([self._results._reader], timeout=self.poll_interval):
+            self._check_workers()
+        return self._results.get()
+
+    def _check_workers(self) -> None:
+        for pid, worker in list(self._workers.items()):
+            # Recycled workers exit normally and are replaced once their
+            # result is processed
+            if worker.is_alive() or worker.exitcode == 0:
+                continue
+            # Worker might have posted its result right before exiting
+            if not self._results.empty():
+                return
+            self._respawn_worker(pid)
+
+    def _respawn_worker(self, pid: int) -> None:
+        """Replace worker which died unexpectedly and resubmit the task it
+        was processing."""
+        worker = self._workers.pop(pid)
+        worker.join()
+        i: int = self._current.pop(pid).value
+        LOGGER.warning(
+            f"Worker {pid} died unexpectedly with exit code {worker.exitcode} "
+            f"while processing task {i if i != IDLE else None}"
+        )
+
+        if i != IDLE and i in self._pending:
+            if self._attempts[i] >= MAX_ATTEMPTS:
+                raise RuntimeError(
+                    f"Task {i} failed, {MAX_ATTEMPTS} workers died processing it"
+                )
+            self._attempts[i] += 1
+            self._tasks.put((i, self._pending[i]))
+
+        self.respawned += 1
+        self._start_worker()
+
+    def _start_worker(self) -> None:
+        # Never fork while upload threads might hold locks
+        drain_uploads()
+
+        current = CONTEXT.Value("i", IDLE, lock=False)
+        worker = CONTEXT.Process(
+            target=_work,
+            args=(
+                self._tasks,
+                self._results,
+                self.func,
+                self.initializer,
+                self.finalizer,
+                self.max_rss,
+                current,
+            ),
+            daemon=True,
+        )
+        worker.start()
+        self._workers[worker.pid] = worker
+        self._current[worker.pid] = current
+
+    def _replace_worker(self, pid: int, respawn: bool = True) -> None:
+        LOGGER.debug(f"Recycle worker {pid}")
+        self._workers.pop(pid).join()
+        self._current.pop(pid)
+        self.recycled += 1
+        if respawn:
+            self._start_worker()
+
+
+def _work(
+    tasks: multiprocessing.Queue,
+    results: multiprocessing.SimpleQueue,
+    func: Callable[[Any, Any], Any],
+    initializer: Callable[[], Any],
+    finalizer: Optional[Callable[[Any], None]],
+    max_rss: Optional[float],
+    current: Any,
+) -> None:
+    pid = os.getpid()
+    process = psutil.Process(pid)
+    state = initializer()
+
+    try:
+        while True:
+            item = tasks.get()
+            if item is None:
+                break
+
+            i, task = item
+            current.value = i
+            try:
+                value: Any = func(state, task)
+                success = True
+            except Exception:
+                value = traceback.format_exc()
+                success = False
+
+            rss = process.memory_info().rss
+            recycle = max_rss is not None and rss > max_rss
+            if recycle:
+                LOGGER.debug(
+                    f"Worker {pid} uses {rss} bytes, exceeding limit of {max_rss}"
+                )
+            results.put((i, pid, success, value, recycle, rss, *io_counters(process)))
+            current.value = IDLE
+
+            if recycle:
+                break
+    finally:
+        if finalizer is not None:
+            finalizer(state)
@@ -0,0 +1,71 @@
+import os
+
+import numpy as np
+import pytest
+
+from gfw_pixetl import calc
+from gfw_pixetl.calc import CalcExpression, get_calc_expression
+
+os.environ["ENV"] = "test"
+
+DATA = np.ma.masked_equal(np.arange(2 * 50 * 7).reshape(2, 50, 7) % 5, 0)
+
+
+def test_invalid_expressions():
+    for expression in [
+        "A +",
+        "B + 1",
+        "__import__('os')",
+        "A.__class__",
+        "lambda: A",
+        "[a for a in A]",
+    ]:
+        with pytest.raises(ValueError):
+            CalcExpression(expression)
+
+
+def test_elementwise():
+    assert CalcExpression("A * 5 + 1").elementwise
+    assert CalcExpression("np.where(A > 10, 1, 0)").elementwise
+    assert CalcExpression("np.ma.masked_where(A == 0, A)").elementwise
+    assert CalcExpression("np.log(A.astype('float32'))").elementwise
+    assert not CalcExpression("A - np.mean(A)").elementwise
+    assert not CalcExpression("A[0]").elementwise
+
+
+def test_temporaries():
+    assert CalcExpression("A").temporaries == 0
+    assert CalcExpression("A + 1").temporaries == 1
+    assert CalcExpression("A * 5 + 1").temporaries == 2
+    assert CalcExpression("(A + 1) * (A + 2)").temporaries == 3
+
+    assert CalcExpression("(A + 1) * (A + 2)").memory_factor == 1
+    assert CalcExpression("A - np.mean(A + 1)").memory_factor == 2
+
+
+def test_evaluate_chunks(monkeypatch):
+    monkeypatch.setattr(calc, "CHUNK_BYTES", 64)
+
+    for expression in [
+        "A * 2 + 1",
+        "np.where(A > 2, A, 0)",
+        "np.ma.masked_where(A == 1, A)",
+        "A.astype('float32') / 3",
+        "A - np.mean(A)",
+    ]:
+        expr = CalcExpression(expression)
+        result = expr.evaluate(DATA)
+        expected = expr._eval(DATA)
+
+        assert type(result) == type(expected)
+        assert np.result_type(result) == np.result_type(expected)
+        np.testing.assert_array_equal(
+            np.ma.getmaskarray(result), np.ma.getmaskarray(expected)
+        )
+        np.testing.assert_array_equal(
+            np.ma.filled(result, 0), np.ma.filled(expected, 0)
+        )
+
+
+def test_get_calc_expression():
+    assert get_calc_expression("A + 1") is get_calc_expression("A + 1")
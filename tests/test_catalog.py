@@ -0,0 +1,51 @@
+import os
+
+from shapely.geometry import box
+
+from gfw_pixetl.catalog import SourceCatalog, get_source_catalog
+from tests.conftest import BUCKET, GEOJSON_NAME
+
+os.environ["ENV"] = "test"
+
+CATALOG = SourceCatalog(
+    [
+        (box(0, 0, 10, 10), "/vsis3/bucket/10N_000E.tif"),
+        (box(10, 0, 20, 10), "/vsis3/bucket/10N_010E.tif"),
+        (box(-10, 0, 0, 10), "/vsis3/bucket/10N_010W.tif"),
+        (box(30, 30, 40, 40), "/vsis3/bucket/40N_030E.tif"),
+    ]
+)
+
+
+def test_intersecting_files():
+    files = CATALOG.intersecting_files(box(5, 5, 15, 6))
+    assert [f[1] for f in files] == [
+        "/vsis3/bucket/10N_000E.tif",
+        "/vsis3/bucket/10N_010E.tif",
+    ]
+
+    # geometries which only share an exterior point don't count
+    files = CATALOG.intersecting_files(box(20, 0, 21, 1))
+    assert files == list()
+
+    files = CATALOG.intersecting_files(box(50, 50, 51, 51))
+    assert files == list()
+
+
+def test_intersects():
+    assert CATALOG.intersects(box(35, 35, 36, 36))
+    assert CATALOG.intersects(box(-5, 5, 5, 6))
+    assert not CATALOG.intersects(box(20, 10, 21, 11))
+    assert not CATALOG.intersects(box(20, 20, 25, 25))
+
+
+def test_footprint():
+    assert CATALOG.footprint.bounds == (-10, 0, 40, 40)
+    assert CATALOG.footprint.area == 400
+
+
+def test_get_source_catalog():
+    catalog = get_source_catalog(f"s3://{BUCKET}/{GEOJSON_NAME}")
+    assert len(catalog) == 2
+    assert catalog is get_source_catalog(f"s3://{BUCKET}/{GEOJSON_NAME}")
+    assert catalog.intersects(box(10, 9, 11, 10))
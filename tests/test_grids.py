@@ -1,6 +1,8 @@
 import os
 
 import pytest
+from shapely.geometry import MultiPolygon, Polygon, box
+from shapely.ops import unary_union
 
 from gfw_pixetl.grids import Grid, LatLngGrid, WebMercatorGrid, grid_factory
 
@@ -128,3 +130,78 @@ def test_wm_grids():
 
     with pytest.raises(ValueError):
         grid_factory("zoom_30")
+
+
+def test_wm_parent_child_tiles():
+    grid = grid_factory("zoom_10")
+    assert isinstance(grid, WebMercatorGrid)
+    assert grid.get_parent_tile_id("003R_002C") == "001R_001C"
+    assert grid.get_child_tile_ids("003R_002C") == [
+        "006R_004C",
+        "006R_005C",
+        "007R_004C",
+        "007R_005C",
+    ]
+
+    # Up to zoom level 8, the world fits into a single tile
+    grid = grid_factory("zoom_8")
+    assert isinstance(grid, WebMercatorGrid)
+    assert grid.get_parent_tile_id("000R_000C") == "000R_000C"
+    assert grid.get_child_tile_ids("000R_000C") == [
+        "000R_000C",
+        "000R_001C",
+        "001R_000C",
+        "001R_001C",
+    ]
+
+    grid = grid_factory("zoom_7")
+    assert isinstance(grid, WebMercatorGrid)
+    assert grid.get_child_tile_ids("000R_000C") == ["000R_000C"]
+
+    for zoom in (9, 10):
+        grid = grid_factory(f"zoom_{zoom}")
+        assert isinstance(grid, WebMercatorGrid)
+        parent = grid_factory(f"zoom_{zoom - 1}")
+        assert isinstance(parent, WebMercatorGrid)
+        for tile_id in grid.get_tile_ids():
+            parent_id = grid.get_parent_tile_id(tile_id)
+            assert tile_id in parent.get_child_tile_ids(parent_id)
+            assert (
+                box(*parent.get_tile_bounds(parent_id))
+                .buffer(1)
+                .contains(box(*grid.get_tile_bounds(tile_id)))
+            )
+
+
+def test_extent():
+    grid = grid_factory("10/40000")
+
+    # Frame of 5 x 5 tiles with a bump into the hole, an island inside the
+    # hole touching the bump at a corner and a separate tile touching the
+    # frame at a corner
+    cells = [(row, col) for row in range(5) for col in range(5) if row in (0, 4)]
+    cells += [(row, col) for row in range(1, 4) for col in (0, 4)]
+    cells += [(1, 1), (2, 2), (-1, 5)]
+    tile_ids = [f"{40 - row * 10:02}N_{col * 10:03}E" for row, col in cells]
+
+    extent = grid.extent(tile_ids)
+    assert isinstance(extent, MultiPolygon)
+    assert extent.is_valid
+    assert len(extent.geoms) == 3
+    assert sum(len(polygon.interiors) for polygon in extent.geoms) == 1
+    assert extent.area == len(cells) * 100
+    assert extent.symmetric_difference(
+        unary_union([box(*grid.get_tile_bounds(tile_id)) for tile_id in tile_ids])
+    ).is_empty
+
+    extent = grid.extent(["00N_000E", "00N_010E"])
+    assert isinstance(extent, Polygon)
+    assert extent.bounds == (0, -10, 20, 0)
+    assert len(extent.exterior.coords) == 5
+
+    assert grid.extent([]).is_empty
+
+    grid = grid_factory("zoom_10")
+    extent = grid.extent(grid.get_tile_ids())
+    assert isinstance(extent, Polygon)
+    assert extent.bounds == pytest.approx((-180, -85.05112878, 180, 85.05112878))
@@ -0,0 +1,47 @@
+import os
+from unittest import mock
+
+from gfw_pixetl.settings.globals import GLOBALS
+from gfw_pixetl.utils.memory import MAX_SCALE, MemoryGovernor, get_memory_governor
+
+os.environ["ENV"] = "test"
+
+BUDGET = 1000 * 1000000
+
+
+@mock.patch.object(MemoryGovernor, "budget", return_value=BUDGET)
+def test_split_budget(_):
+    governor = MemoryGovernor()
+
+    # all parts together never exceed the budget
+    for processes in [1, 2, 4]:
+        total = (
+            governor.gdal_cache_bytes(processes)
+            + governor.warp_mem_mb(processes) * 1000000
+            + governor.window_bytes(processes)
+        ) * processes
+        assert total <= BUDGET
+
+    assert governor.gdal_cache_bytes(2) == BUDGET * GLOBALS.gdal_cache_fraction / 2
+
+
+@mock.patch.object(MemoryGovernor, "budget", return_value=BUDGET)
+def test_observe(_):
+    governor = MemoryGovernor()
+    window_bytes = governor.window_bytes(1)
+
+    # shrink windows after using too much memory
+    governor.observe(BUDGET * 1.2)
+    assert governor.scale < 1
+    assert governor.window_bytes(1) < window_bytes
+
+    # grow windows again, but only up to limit
+    for _ in range(20):
+        governor.observe(BUDGET * 0.1)
+    assert governor.scale == MAX_SCALE
+
+
+def test_budget():
+    governor = get_memory_governor()
+    assert governor is get_memory_governor()
+    assert 0 < governor.budget() <= GLOBALS.max_mem * 1000000 / GLOBALS.workers
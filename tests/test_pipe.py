@@ -99,17 +99,26 @@ def test_filter_target_tiles():
         assert i == 4
 
 
-def test_upload_file():
+def test_upload_finalized():
     tiles = _get_subset_tiles()
-    with mock.patch.object(Tile, "upload", return_value=None):
+    started = list()
+    finished = list()
 
-        pipe = tiles | PIPE.upload_file()
-        i = 0
-        for tile in pipe.results():
-            if tile.status == "pending":
-                i += 1
-                assert isinstance(tile, Tile)
-        assert i == 4
+    def upload(self, wait=True):
+        started.append(self.tile_id)
+
+    def wait_upload(self):
+        # uploads of following tiles start before a tile is passed on
+        assert len(started) == min(len(finished) + 3, len(tiles))
+        finished.append(self.tile_id)
+
+    with mock.patch.object(Tile, "upload", upload), mock.patch.object(
+        Tile, "upload_done", return_value=False
+    ), mock.patch.object(Tile, "wait_upload", wait_upload):
+        results = list(Pipe.upload_finalized(iter(tiles)))
+
+    assert started == finished == [tile.tile_id for tile in results]
+    assert len(results) == 4
 
 
 def test_delete_work_dir():
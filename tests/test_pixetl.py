@@ -1,8 +1,10 @@
 import os
 from unittest import mock
 
+import pytest
+
 from gfw_pixetl.models.pydantic import LayerModel
-from gfw_pixetl.pipes import RasterPipe
+from gfw_pixetl.pipes import PyramidPipe, RasterPipe
 from gfw_pixetl.pixetl import pixetl
 from tests import minimal_layer_dict
 
@@ -27,7 +29,7 @@ def test_pixetl():
     with mock.patch.object(
         RasterPipe, "create_tiles", return_value=(list(), list(), list())
     ):
-        tiles, skipped_tiles, failed_tiles = pixetl(
+        tiles, skipped_tiles, failed_tiles, report = pixetl(
             RASTER_LAYER_DEF,
             subset=SUBSET,
             overwrite=True,
@@ -36,6 +38,33 @@ def test_pixetl():
     assert tiles == list()
     assert skipped_tiles == list()
     assert failed_tiles == list()
+    assert report.dataset == LAYER_DICT["dataset"]
+    assert report.processed_tiles == 0
+    assert report.wall_time > 0
     assert cwd == os.getcwd()
 
     os.chdir(cwd)
+
+
+def test_pixetl_min_zoom():
+    cwd = os.getcwd()
+    layer_def = LayerModel.parse_obj({**LAYER_DICT, "grid": "zoom_3", "min_zoom": 1})
+
+    with mock.patch.object(
+        RasterPipe, "create_tiles", return_value=(list(), list(), list())
+    ), mock.patch.object(
+        PyramidPipe, "create_tiles", return_value=(list(), list(), list())
+    ) as create_tiles:
+        tiles, skipped_tiles, failed_tiles, report = pixetl(layer_def, overwrite=True)
+
+    assert create_tiles.call_count == 2
+    assert report.grid == "zoom_3"
+    assert cwd == os.getcwd()
+
+    with pytest.raises(ValueError):
+        pixetl(LayerModel.parse_obj({**LAYER_DICT, "min_zoom": 1}))
+
+    with pytest.raises(ValueError):
+        pixetl(LayerModel.parse_obj({**LAYER_DICT, "grid": "zoom_3", "min_zoom": 4}))
+
+    os.chdir(cwd)
@@ -0,0 +1,76 @@
+import os
+from typing import Optional
+from unittest import mock
+
+import pytest
+from rasterio import RasterioIOError
+
+from gfw_pixetl import pixetl_prep, sources
+from gfw_pixetl.pixetl_prep import get_aws_files, read_tiles
+from tests.conftest import BUCKET, TILE_1_NAME, TILE_2_NAME
+
+os.environ["ENV"] = "test"
+
+
+def test_get_aws_files():
+    files = get_aws_files(BUCKET, "")
+
+    assert f"/vsis3/{BUCKET}/{TILE_1_NAME}" in files
+    assert f"/vsis3/{BUCKET}/{TILE_2_NAME}" in files
+    assert all(f.endswith(".tif") for f in files)
+
+
+def test_get_aws_files_paginated():
+    pages = [{"Key": f"tiles/{i}.tif"} for i in range(2500)]
+    with mock.patch.object(pixetl_prep, "list_s3_objects", return_value=iter(pages)):
+        files = get_aws_files(BUCKET, "tiles/")
+
+    assert len(files) == 2500
+
+
+def test_read_tiles():
+    files = [f"/vsis3/{BUCKET}/{TILE_1_NAME}", f"/vsis3/{BUCKET}/{TILE_2_NAME}"]
+    tiles = read_tiles(files)
+
+    assert [tile.dst["geotiff"].uri for tile in tiles] == files
+
+
+def _count_opens(error: Optional[Exception] = None, failures: int = 0):
+    """Patch rasterio.open of sources, raising error on the first
+    failures calls."""
+    attempts = {"count": 0}
+    rasterio_open = sources.rasterio.open
+
+    def flaky_open(*args, **kwargs):
+        attempts["count"] += 1
+        if attempts["count"] <= failures:
+            raise error
+        return rasterio_open(*args, **kwargs)
+
+    return attempts, mock.patch.object(sources.rasterio, "open", flaky_open)
+
+
+def test_read_tiles_retry():
+    attempts, patch = _count_opens(RasterioIOError("HTTP response code: 503"), 1)
+    with patch:
+        tiles = read_tiles([f"/vsis3/{BUCKET}/{TILE_1_NAME}"])
+
+    assert len(tiles) == 1
+    assert attempts["count"] == 2
+
+
+def test_read_tiles_no_retry():
+    # Only I/O errors are retried
+    attempts, patch = _count_opens(ValueError("Invalid profile"), 1)
+    with patch, pytest.raises(RuntimeError):
+        read_tiles([f"/vsis3/{BUCKET}/{TILE_1_NAME}"])
+
+    assert attempts["count"] == 1
+
+
+def test_read_tiles_missing_file():
+    attempts, patch = _count_opens()
+    with patch, pytest.raises(RuntimeError):
+        read_tiles([f"/vsis3/{BUCKET}/does_not_exist.tif"])
+
+    assert attempts["count"] == 1
@@ -0,0 +1,77 @@
+import os
+
+import numpy as np
+import rasterio
+from rasterio.crs import CRS
+from rasterio.transform import from_bounds
+
+from gfw_pixetl import layers
+from gfw_pixetl.models.pydantic import LayerModel
+from gfw_pixetl.tiles import PyramidTile
+from gfw_pixetl.utils.aws import get_s3_client
+from tests import minimal_layer_dict
+from tests.conftest import BUCKET
+
+os.environ["ENV"] = "test"
+
+LAYER_DICT = {
+    **minimal_layer_dict,
+    "dataset": "umd_tree_cover_density_2000",
+    "version": "v1.6",
+    "pixel_meaning": "percent",
+    "data_type": "uint8",
+    "no_data": 0,
+    "resampling": "max",
+}
+SRC_LAYER = layers.layer_factory(LayerModel(**{**LAYER_DICT, "grid": "zoom_1"}))
+LAYER = layers.layer_factory(LayerModel(**{**LAYER_DICT, "grid": "zoom_0"}))
+
+
+def test_reduce():
+    src_tile_id = "000R_000C"
+    src_bounds = SRC_LAYER.grid.get_tile_bounds(src_tile_id)
+    data = np.random.randint(5, size=(512, 512)).astype("uint8")
+    data[:256] = 0
+
+    src_uri = os.path.join(os.getcwd(), "zoom_1.tif")
+    with rasterio.open(
+        src_uri,
+        "w",
+        driver="GTiff",
+        height=512,
+        width=512,
+        count=1,
+        dtype="uint8",
+        nodata=0,
+        crs=CRS.from_epsg(3857),
+        transform=from_bounds(*src_bounds, 512, 512),
+    ) as dst:
+        dst.write(data, 1)
+
+    tile = PyramidTile(
+        "000R_000C", LAYER.grid, LAYER, SRC_LAYER, ["000R_000C", "000R_001C"]
+    )
+    assert tile.within()
+
+    get_s3_client().upload_file(src_uri, BUCKET, tile.src_key(src_tile_id))
+    tile.src_tile_ids = [src_tile_id]
+
+    assert tile.reduce()
+    assert tile.status == "pending"
+
+    with rasterio.open(tile.local_dst[tile.default_format].uri) as src:
+        assert src.crs == CRS.from_epsg(3857)
+        assert src.width == src.height == 256
+        result = src.read(1)
+
+    expected = data.reshape(256, 2, 256, 2).max(axis=(1, 3))
+    assert np.array_equal(result, expected)
+    assert not result[:128].any()
+
+    os.remove(src_uri)
+
+
+def test_reduce_missing_src_tile():
+    tile = PyramidTile("000R_000C", LAYER.grid, LAYER, SRC_LAYER, ["000R_001C"])
+    assert tile.reduce()
+    assert tile.status == "failed"
@@ -1,15 +1,22 @@
 import os
 from copy import deepcopy
 from math import isclose
+from unittest import mock
 
 import numpy as np
 import rasterio
+from rasterio.enums import Resampling
+from rasterio._env import del_gdal_config, get_gdal_config
 from rasterio.windows import Window
+from shapely.geometry import box
 
 from gfw_pixetl import get_module_logger, layers
+from gfw_pixetl.catalog import SourceCatalog
 from gfw_pixetl.models.pydantic import LayerModel
 from gfw_pixetl.settings.gdal import GDAL_ENV
+from gfw_pixetl.sources import RasterSource
 from gfw_pixetl.tiles import RasterSrcTile
+from gfw_pixetl.utils.memory import MemoryGovernor
 from tests import minimal_layer_dict
 from tests.conftest import BUCKET, GEOJSON_2_NAME, GEOJSON_NAME
 
@@ -97,6 +104,119 @@ def test_transform_final():
     os.remove(tile.local_dst[tile.default_format].uri)
 
 
+def test_transform_co_workers():
+    assert isinstance(LAYER, layers.RasterSrcLayer)
+    tile = RasterSrcTile("10N_010E", LAYER.grid, LAYER)
+
+    with rasterio.Env(**GDAL_ENV), rasterio.open(tile.src.uri) as tile_src:
+        window = rasterio.windows.from_bounds(
+            10, 9, 11, 10, transform=tile_src.transform
+        )
+        input = tile_src.read(1, window=window)
+
+    with mock.patch(
+        "gfw_pixetl.tiles.raster_src_tile.utils.get_co_workers", return_value=2
+    ), mock.patch.object(RasterSrcTile, "_max_blocks", return_value=4):
+        assert tile._process_windows()
+
+    # all formats are written at once
+    for dst_format in tile.dst.keys():
+        with rasterio.Env(**GDAL_ENV), rasterio.open(
+            tile.local_dst[dst_format].uri
+        ) as src:
+            output = src.read(1)
+            profile = src.profile
+
+        np.testing.assert_array_equal(input, output)
+        assert profile["compress"].lower() == tile.dst[dst_format].compress.lower()
+
+    assert tile._tile_buffer is None
+    assert not os.listdir(tile.tmp_dir)
+
+    tile.remove_work_dir()
+
+
+def test_transform_stats():
+    layer_def = LayerModel.parse_obj(
+        {**layer_dict, "compute_stats": True, "compute_histogram": True}
+    )
+    layer = layers.layer_factory(layer_def)
+    assert isinstance(layer, layers.RasterSrcLayer)
+    tile = RasterSrcTile("10N_010E", layer.grid, layer)
+
+    with mock.patch(
+        "gfw_pixetl.tiles.raster_src_tile.utils.get_co_workers", return_value=2
+    ), mock.patch.object(RasterSrcTile, "_max_blocks", return_value=4), mock.patch(
+        "gfw_pixetl.tiles.tile.RasterSource.metadata"
+    ) as mocked_metadata:
+        tile.transform()
+        mocked_metadata.assert_not_called()
+
+    with rasterio.Env(**GDAL_ENV), rasterio.open(
+        tile.local_dst[tile.default_format].uri
+    ) as src:
+        output = src.read(1)
+    values = output[output != layer.dst_profile["nodata"]].astype("float64")
+
+    for dst_format in tile.local_dst.keys():
+        band = tile.metadata[dst_format]["bands"][0]
+        assert band["stats"]["min"] == values.min()
+        assert band["stats"]["max"] == values.max()
+        assert isclose(band["stats"]["mean"], values.mean())
+        assert isclose(band["stats"]["std_dev"], values.std())
+        assert band["histogram"]["min"] == -0.5
+        assert band["histogram"]["max"] == 255.5
+        assert sum(band["histogram"]["buckets"]) == values.size
+
+    assert tile.metadata["gdal-geotiff"]["bands"][0]["nbits"] == 7
+    assert tile.metadata["geotiff"]["bands"][0]["nbits"] is None
+    assert tile.metadata["geotiff"]["width"] == LAYER.grid.cols
+
+    tile.remove_work_dir()
+
+
+def test_transform_symbology():
+    layer_def = LayerModel.parse_obj(
+        {
+            **layer_dict,
+            "symbology": {
+                "type": "gradient",
+                "colormap": {
+                    "0": {"red": 255, "green": 255, "blue": 255},
+                    "100": {"red": 0, "green": 128, "blue": 0},
+                },
+            },
+        }
+    )
+    layer = layers.layer_factory(layer_def)
+    assert isinstance(layer, layers.RasterSrcLayer)
+    tile = RasterSrcTile("10N_010E", layer.grid, layer)
+
+    with rasterio.Env(**GDAL_ENV), rasterio.open(tile.src.uri) as tile_src:
+        window = rasterio.windows.from_bounds(
+            10, 9, 11, 10, transform=tile_src.transform
+        )
+        input = tile_src.read(1, window=window)
+
+    with mock.patch(
+        "gfw_pixetl.tiles.raster_src_tile.utils.get_co_workers", return_value=2
+    ), mock.patch.object(RasterSrcTile, "_max_blocks", return_value=4):
+        assert tile._process_windows()
+
+    # all formats are colored while writing windows
+    for dst_format in tile.dst.keys():
+        with rasterio.Env(**GDAL_ENV), rasterio.open(
+            tile.local_dst[dst_format].uri
+        ) as src:
+            output = src.read()
+            assert src.profile["count"] == 4
+            assert src.profile["dtype"] == "uint8"
+
+        np.testing.assert_array_equal(layer.colorizer(input), output)
+
+    tile.remove_work_dir()
+
+
 def test_transform_final_wm():
     layer_dict_wm = deepcopy(layer_dict)
     layer_dict_wm["grid"] = "zoom_0"
@@ -164,6 +284,139 @@ def test__calc():
         raise ValueError("Not a RasterSrcLayer")
 
 
+def test__plan_windows(tmp_path):
+    # sparse source with a few pixels of data in the top left corner
+    src_uri = str(tmp_path / "sparse.tif")
+    data = np.zeros((4000, 4000), dtype="uint8")
+    data[10:13, 10:13] = 1
+    profile = {
+        "driver": "GTiff",
+        "height": 4000,
+        "width": 4000,
+        "count": 1,
+        "dtype": "uint8",
+        "crs": "EPSG:4326",
+        "transform": rasterio.transform.from_origin(10, 10, 0.00025, 0.00025),
+        "nodata": 0,
+        "tiled": True,
+    }
+    with rasterio.open(src_uri, "w", **profile) as dst:
+        dst.write(data, 1)
+        dst.build_overviews([2, 4, 8, 16], Resampling.average)
+
+    layer = deepcopy(LAYER)
+    tile = RasterSrcTile("10N_010E", layer.grid, layer)
+    tile._lazy_src = RasterSource(src_uri)
+
+    data_window = Window(0, 0, 400, 400)
+    empty_window = Window(1200, 1200, 400, 400)
+    outside_window = Window(3200, 0, 400, 400)
+    windows = [data_window, empty_window, outside_window]
+
+    # catalog only covers the western half of the tile
+    catalog = SourceCatalog([(box(10, 9, 10.5, 10), src_uri)])
+    with mock.patch.object(
+        layers.RasterSrcLayer,
+        "catalog",
+        new_callable=mock.PropertyMock,
+        return_value=catalog,
+    ):
+        layer.probe_overviews = False
+        assert tile._plan_windows(windows) == [data_window, empty_window]
+
+        layer.probe_overviews = True
+        assert tile._plan_windows(windows) == [data_window]
+
+
+def test__windows_strips(tmp_path):
+    src_uri = str(tmp_path / "strips.tif")
+    profile = {
+        "driver": "GTiff",
+        "height": 4000,
+        "width": 4000,
+        "count": 1,
+        "dtype": "uint8",
+        "crs": "EPSG:4326",
+        "transform": rasterio.transform.from_origin(10, 10, 0.00025, 0.00025),
+        "nodata": 0,
+        "blockysize": 16,
+    }
+    with rasterio.open(src_uri, "w", **profile) as dst:
+        dst.write(np.ones((4000, 4000), dtype="uint8"), 1)
+
+    tile = RasterSrcTile("10N_010E", LAYER.grid, LAYER)
+    tile._lazy_src = RasterSource(src_uri)
+
+    layout = tile._src_layout()
+    assert layout.strips
+    assert isclose(layout.block_width, 4000)
+    assert isclose(layout.block_height, 16)
+
+    # strips are read across the entire width of the tile, row by row
+    with mock.patch.object(RasterSrcTile, "_max_blocks", return_value=25):
+        windows = tile.windows()
+    assert windows == [Window(0, row * 800, 4000, 800) for row in range(5)]
+
+    # a single block exceeds the window memory, read one block at a time
+    with mock.patch.object(MemoryGovernor, "window_bytes", return_value=1):
+        assert tile._max_blocks() == 1
+        windows = tile.windows()
+    block_size = tile.dst[tile.default_format].blockxsize
+    assert len(windows) == (4000 // block_size) ** 2
+    assert all(w.width == w.height == block_size for w in windows)
+
+
+def test__src_to_vrt_options(tmp_path):
+    src_uri = str(tmp_path / "src.tif")
+    profile = {
+        "driver": "GTiff",
+        "height": 400,
+        "width": 400,
+        "count": 1,
+        "dtype": "uint8",
+        "crs": "EPSG:4326",
+        "transform": rasterio.transform.from_origin(10, 10, 0.00025, 0.00025),
+        "nodata": 0,
+    }
+    with rasterio.open(src_uri, "w", **profile) as dst:
+        dst.write(np.ones((400, 400), dtype="uint8"), 1)
+
+    tile = RasterSrcTile("10N_010E", LAYER.grid, LAYER)
+    tile._lazy_src = RasterSource(src_uri)
+    windows = tile.windows()
+
+    tuned = {"GDAL_HTTP_MULTIPLEX": "YES", "GDAL_HTTP_MERGE_CONSECUTIVE_RANGES": "YES"}
+    seen = dict()
+    read_window = RasterSrcTile._read_window
+
+    def _read_window(self, vrt, window):
+        seen.update({key: get_gdal_config(key) for key in tuned})
+        return read_window(self, vrt, window)
+
+    try:
+        with mock.patch.dict(GDAL_ENV, tuned), mock.patch.object(
+            RasterSrcTile, "_read_window", _read_window
+        ):
+            src_vrt = tile._src_to_vrt()
+            # options stay set after initializing the worker
+            tile._transform(src_vrt[1], windows[0])
+            tile._close_vrt(src_vrt)
+    finally:
+        for key in tuned:
+            del_gdal_config(key)
+
+    assert seen == tuned
+    tile.remove_work_dir()
+
+
+def test__axis_breaks():
+    assert RasterSrcTile._axis_breaks(10, 4, 400, 0, 800) == [0, 4, 8, 10]
+    assert RasterSrcTile._axis_breaks(10, 4, 400, 0, 1200) == [0, 3, 6, 10]
+    assert RasterSrcTile._axis_breaks(10, 4, 400, 400, 1200) == [0, 4, 7, 10]
+    assert RasterSrcTile._axis_breaks(10, 4, 400, 0, 1000) == [0, 4, 8, 10]
+    assert RasterSrcTile._axis_breaks(3, 0, 400, 0, 1000) == [0, 1, 2, 3]
+
+
 def test__set_dtype():
     window = Window(0, 0, 10, 10)
     data = np.random.randint(4, size=(10, 10))
@@ -0,0 +1,116 @@
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import pytest
+
+from gfw_pixetl.models.named_tuples import ReadProbe, ReadProfile
+from gfw_pixetl.settings.gdal import GDAL_ENV
+from gfw_pixetl.settings.globals import GLOBALS
+from gfw_pixetl.utils.read_tuning import (
+    MAX_CHUNK_SIZE,
+    apply_read_profile,
+    probe_source,
+    read_profile,
+)
+
+os.environ["ENV"] = "test"
+
+LATENCY = 0.05
+DATA = os.urandom(256 * 1024)
+
+
+class LatencyHandler(BaseHTTPRequestHandler):
+    """Serves byte ranges of DATA, each response delayed by LATENCY."""
+
+    def do_GET(self):
+        time.sleep(LATENCY)
+        start, end = (
+            int(i)
+            for i in re.match(r"bytes=(\d+)-(\d+)", self.headers["Range"]).groups()
+        )
+        body = DATA[start : end + 1]
+        self.send_response(206)
+        self.send_header(
+            "Content-Range", f"bytes {start}-{start + len(body) - 1}/{len(DATA)}"
+        )
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture()
+def latency_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), LatencyHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"/vsicurl/http://127.0.0.1:{server.server_address[1]}/source.tif"
+    server.shutdown()
+    server.server_close()
+
+
+def test_probe_source(latency_server):
+    probe = probe_source(latency_server)
+    assert probe.latency >= LATENCY
+    assert probe.throughput > 0
+    assert probe.aggregate_throughput >= probe.throughput
+
+    profile = read_profile(probe)
+    assert profile.multiplex
+    assert profile.merge_consecutive_ranges
+    assert profile.read_concurrency >= 1
+
+
+def test_probe_source_local(tmp_path):
+    src = tmp_path / "source.tif"
+    src.write_bytes(DATA)
+
+    probe = probe_source(str(src))
+    assert probe.latency < LATENCY
+
+    profile = read_profile(ReadProbe(0.001, 100000000, 400000000))
+    assert profile.chunk_size == 512 * 1024
+    assert not profile.multiplex
+    assert not profile.merge_consecutive_ranges
+    assert profile.read_concurrency == min(4, GLOBALS.cores * 4)
+
+
+def test_read_profile_high_latency():
+    profile = read_profile(ReadProbe(0.1, 50000000, 200000000))
+    assert profile.chunk_size == MAX_CHUNK_SIZE
+    assert profile.multiplex
+    assert profile.merge_consecutive_ranges
+    assert profile.vsi_cache_size >= profile.chunk_size
+    assert profile.curl_cache_size >= profile.vsi_cache_size
+    assert profile.read_concurrency == min(7, GLOBALS.cores * 4)
+
+
+def test_apply_read_profile():
+    profile = ReadProfile(
+        chunk_size=1048576,
+        multiplex=True,
+        merge_consecutive_ranges=True,
+        vsi_cache_size=8388608,
+        curl_cache_size=33554432,
+        read_concurrency=6,
+    )
+    read_concurrency = GLOBALS.read_concurrency
+    try:
+        # explicit settings are kept
+        with mock.patch.dict(GDAL_ENV, {"CPL_VSIL_CURL_CHUNK_SIZE": "65536"}):
+            apply_read_profile(profile)
+            assert GDAL_ENV["CPL_VSIL_CURL_CHUNK_SIZE"] == "65536"
+            assert GDAL_ENV["VSI_CACHE_SIZE"] == "8388608"
+            assert GDAL_ENV["GDAL_HTTP_MULTIPLEX"] == "YES"
+            assert GDAL_ENV["GDAL_HTTP_VERSION"] == "2TLS"
+            assert GDAL_ENV["GDAL_HTTP_MERGE_CONSECUTIVE_RANGES"] == "YES"
+        assert "VSI_CACHE_SIZE" not in GDAL_ENV
+        assert GLOBALS.read_concurrency == (read_concurrency or 6)
+    finally:
+        GLOBALS.read_concurrency = read_concurrency
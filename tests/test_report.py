@@ -0,0 +1,88 @@
+import json
+import os
+from datetime import datetime
+
+from gfw_pixetl.layers import layer_factory
+from gfw_pixetl.models.pydantic import LayerModel, StageMetrics
+from gfw_pixetl.utils.aws import get_s3_client
+from gfw_pixetl.utils.report import (
+    REPORT_NAME,
+    add_worker_usage,
+    create_report,
+    measure,
+    merge_metrics,
+    upload_report,
+)
+from tests import minimal_layer_dict
+from tests.conftest import BUCKET
+
+os.environ["ENV"] = "test"
+
+LAYER = layer_factory(LayerModel.parse_obj(minimal_layer_dict))
+
+
+def test_measure():
+    metrics = dict()
+    with measure(metrics, "outer"):
+        with open(__file__, "rb") as f:
+            f.read()
+        with measure(metrics, "inner"):
+            add_worker_usage(100, 200, 300)
+            sum(i * i for i in range(100000))
+
+    assert set(metrics.keys()) == {"outer", "inner"}
+    for stage in metrics.values():
+        assert stage.tiles == 1
+        assert stage.wall_time > 0
+        assert stage.peak_rss > 300
+
+    # worker usage counts towards inner and outer stage
+    assert metrics["inner"].bytes_read >= 100
+    assert metrics["inner"].bytes_written >= 200
+    assert metrics["outer"].bytes_read >= metrics["inner"].bytes_read
+    assert metrics["outer"].wall_time >= metrics["inner"].wall_time
+
+
+def test_merge_metrics():
+    merged = merge_metrics(
+        [
+            {
+                "transform": StageMetrics(
+                    wall_time=1, peak_rss=10, bytes_read=5, tiles=1
+                )
+            },
+            {
+                "transform": StageMetrics(
+                    wall_time=2, peak_rss=20, bytes_read=5, tiles=1
+                ),
+                "upload_file": StageMetrics(bytes_written=7, tiles=1),
+            },
+        ]
+    )
+
+    assert merged["transform"].wall_time == 3
+    assert merged["transform"].peak_rss == 20
+    assert merged["transform"].bytes_read == 10
+    assert merged["transform"].tiles == 2
+    assert merged["upload_file"].bytes_written == 7
+
+
+def test_upload_report():
+    report = create_report(
+        LAYER,
+        datetime.utcnow(),
+        1.5,
+        {"processed": 2, "skipped": 1},
+        [{"transform": StageMetrics(wall_time=1, tiles=2)}],
+    )
+    assert report.processed_tiles == 2
+    assert report.skipped_tiles == 1
+    assert report.failed_tiles == 0
+
+    upload_report(report, LAYER.prefix, bucket=BUCKET)
+
+    key = os.path.join(LAYER.prefix, "geotiff", REPORT_NAME)
+    obj = get_s3_client().get_object(Bucket=BUCKET, Key=key)
+    body = json.loads(obj["Body"].read())
+    assert body["stages"]["transform"]["tiles"] == 2
+    assert body["wall_time"] == 1.5
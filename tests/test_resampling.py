@@ -1,6 +1,7 @@
+import numpy as np
 from rasterio.warp import Resampling
 
-from gfw_pixetl.resampling import resampling_factory
+from gfw_pixetl.resampling import downsample, resampling_factory
 
 
 def test_resampling_factory():
@@ -11,3 +12,33 @@ def test_resampling_factory():
         resampling_factory("test")
     except Exception as e:
         assert isinstance(e, ValueError)
+
+
+def test_downsample():
+    array = np.ma.masked_equal(
+        np.array(
+            [[1, 2, 0, 0], [3, 3, 0, 0], [4, 4, 5, 250], [4, 0, 250, 250]],
+            dtype="uint8",
+        ),
+        0,
+    )
+
+    result = downsample(array, Resampling.nearest)
+    assert result.tolist() == [[1, None], [4, 5]]
+
+    result = downsample(array, Resampling.max)
+    assert result.dtype == np.dtype("uint8")
+    assert result.tolist() == [[3, None], [4, 250]]
+
+    assert downsample(array, Resampling.min).tolist() == [[1, None], [4, 5]]
+    assert downsample(array, Resampling.mode).tolist() == [[3, None], [4, 250]]
+    assert downsample(array, Resampling.average).tolist() == [[2, None], [4, 189]]
+    assert downsample(array, Resampling.bilinear).tolist() == [[2, None], [4, 189]]
+    assert downsample(array, Resampling.med).tolist() == [[2, None], [4, 250]]
+
+    # Sums exceeding the data type are clipped
+    assert downsample(array, Resampling.sum).tolist() == [[9, None], [12, 255]]
+
+    result = downsample(array.astype("float32"), Resampling.average)
+    assert result.dtype == np.dtype("float32")
+    assert result[0, 0] == 2.25
@@ -0,0 +1,105 @@
+import multiprocessing
+import os
+from collections import namedtuple
+from unittest import mock
+
+import numpy as np
+import rasterio
+
+from gfw_pixetl.settings.gdal import GDAL_ENV
+from gfw_pixetl.utils import remote
+from gfw_pixetl.utils.report import cache_usage
+from gfw_pixetl.utils.source_cache import SourceCache
+from tests.conftest import BUCKET, TILE_1_NAME
+
+os.environ["ENV"] = "test"
+
+DiskUsage = namedtuple("DiskUsage", ["total", "used", "free"])
+
+
+def _vrt(path, src, width, height, transform):
+    with open(path, "w") as f:
+        f.write(f"""<VRTDataset rasterXSize="{width}" rasterYSize="{height}">
+  <GeoTransform>{", ".join(str(v) for v in transform.to_gdal())}</GeoTransform>
+  <VRTRasterBand dataType="Byte" band="1">
+    <SimpleSource>
+      <SourceFilename relativeToVRT="0">{src}</SourceFilename>
+      <SourceBand>1</SourceBand>
+    </SimpleSource>
+  </VRTRasterBand>
+</VRTDataset>""")
+
+
+def test_source_cache(tmp_path):
+    src = f"/vsis3/{BUCKET}/{TILE_1_NAME}"
+    with rasterio.Env(**GDAL_ENV), rasterio.open(src) as dataset:
+        expected = dataset.read(1)
+        _vrt(
+            tmp_path / "tile.vrt",
+            src,
+            dataset.width,
+            dataset.height,
+            dataset.transform,
+        )
+
+    cache_dir = str(tmp_path / "cache")
+    hits, misses = cache_usage()
+    cache = SourceCache(cache_dir, 1)
+    with rasterio.Env(**GDAL_ENV), rasterio.open(
+        cache.cached_vrt(str(tmp_path / "tile.vrt")), opener=cache.open
+    ) as vrt:
+        assert np.array_equal(vrt.read(1), expected)
+
+    first_hits, first_misses = cache_usage()
+    assert first_misses > misses
+    assert os.listdir(cache_dir)
+
+    # A second process finds all chunks in the cache
+    cache = SourceCache(cache_dir, 1)
+    with rasterio.Env(**GDAL_ENV), rasterio.open(
+        cache.cached_vrt(str(tmp_path / "tile.vrt")), opener=cache.open
+    ) as vrt:
+        assert np.array_equal(vrt.read(1), expected)
+
+    second_hits, second_misses = cache_usage()
+    assert second_misses == first_misses
+    assert second_hits > first_hits
+
+
+def test_source_cache_evict(tmp_path):
+    cache = SourceCache(str(tmp_path), 20)
+    os.mkdir(tmp_path / "key")
+    for i in range(4):
+        chunk_file = tmp_path / "key" / str(i)
+        chunk_file.write_bytes(bytes(10))
+        os.utime(chunk_file, (i, i))
+
+    with mock.patch(
+        "gfw_pixetl.utils.source_cache.shutil.disk_usage",
+        return_value=DiskUsage(100, 100, 0),
+    ):
+        cache.evict()
+
+    # least recently used chunks are deleted until free space exceeds 125%
+    assert sorted(os.listdir(tmp_path / "key")) == ["3"]
+
+
+PARENT_GCS_CLIENT = None
+
+
+def _is_parent_gcs_client() -> bool:
+    return remote.get_gcs_client() is PARENT_GCS_CLIENT
+
+
+@mock.patch.dict(remote._gcs_clients, clear=True)
+@mock.patch.object(remote.storage, "Client", side_effect=object)
+def test_get_gcs_client(_):
+    global PARENT_GCS_CLIENT
+    PARENT_GCS_CLIENT = remote.get_gcs_client()
+
+    # one client for all reads of a process
+    assert _is_parent_gcs_client()
+
+    # forked processes create their own client
+    with multiprocessing.get_context("fork").Pool(1) as pool:
+        assert not pool.apply(_is_parent_gcs_client)
@@ -0,0 +1,102 @@
+import os
+
+import numpy as np
+import pytest
+
+from gfw_pixetl.utils.stats import BandStatsAccumulator, RasterStats
+
+os.environ["ENV"] = "test"
+
+
+def _gdal_histogram(values, _min, _max):
+    index = np.floor((values - _min) * 256 / (_max - _min)).astype(int)
+    return np.bincount(np.clip(index, 0, 255), minlength=256).tolist()
+
+
+def _accumulate(data, dtype, no_data):
+    # split data in windows and merge results, like co-workers do
+    left = RasterStats(dtype, no_data)
+    right = RasterStats(dtype, no_data)
+    for row in range(0, data.shape[0], 7):
+        left.update(data[row : row + 7, :25])
+        right.update(data[row : row + 7, 25:])
+    return left.merge(right).bands[0]
+
+
+def test_uint8():
+    data = np.random.randint(0, 256, (40, 50)).astype("uint8")
+    band = _accumulate(data, "uint8", 0)
+    values = data[data != 0].astype("float64")
+
+    stats = band.stats()
+    assert stats.min == values.min()
+    assert stats.max == values.max()
+    assert stats.mean == pytest.approx(values.mean())
+    assert stats.std_dev == pytest.approx(values.std())
+
+    histogram = band.histogram()
+    assert histogram.count == 256
+    assert histogram.min == -0.5
+    assert histogram.max == 255.5
+    assert histogram.buckets == _gdal_histogram(values, -0.5, 255.5)
+
+
+def test_int16():
+    data = np.random.randint(-3000, 30000, (40, 50)).astype("int16")
+    band = _accumulate(data, "int16", None)
+    values = data.astype("float64").ravel()
+
+    assert band.bin_width == 1
+    assert band.stats().mean == pytest.approx(values.mean())
+
+    half_bucket = (values.max() - values.min()) / 510
+    _min, _max = values.min() - half_bucket, values.max() + half_bucket
+    histogram = band.histogram()
+    assert histogram.min == pytest.approx(_min)
+    assert histogram.max == pytest.approx(_max)
+    assert histogram.buckets == _gdal_histogram(values, _min, _max)
+
+
+def test_float32():
+    data = np.random.normal(5, 100, (40, 50)).astype("float32")
+    data[0, :10] = np.nan
+    band = _accumulate(data, "float32", None)
+    values = data[~np.isnan(data)].astype("float64")
+
+    stats = band.stats()
+    assert band.count == values.size
+    assert stats.min == values.min()
+    assert stats.max == values.max()
+    assert stats.std_dev == pytest.approx(values.std())
+
+    half_bucket = (values.max() - values.min()) / 510
+    expected = _gdal_histogram(
+        values, values.min() - half_bucket, values.max() + half_bucket
+    )
+    histogram = band.histogram()
+    assert sum(histogram.buckets) == values.size
+    # values of a fine bin can end up in neighboring bucket
+    assert np.abs(np.array(histogram.buckets) - expected).sum() < values.size / 100
+
+
+def test_fill():
+    stats = RasterStats("uint8", None)
+    stats.update(np.ones((1, 10, 10), dtype="uint8"))
+    stats.fill(400)
+
+    band_stats = stats.bands[0].stats()
+    assert stats.bands[0].count == 400
+    assert band_stats.min == 0
+    assert band_stats.mean == 0.25
+
+    stats = RasterStats("uint8", 0)
+    stats.update(np.ones((1, 10, 10), dtype="uint8"))
+    stats.fill(400)
+    assert stats.bands[0].count == 100
+
+
+def test_empty():
+    band = BandStatsAccumulator("uint8", 0)
+    band.update(np.zeros((10, 10), dtype="uint8"))
+    assert band.stats() is None
+    assert band.histogram() is None
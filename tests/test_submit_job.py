@@ -0,0 +1,98 @@
+import os
+from typing import Any, Dict, List
+
+from gfw_pixetl.layers import layer_factory
+from gfw_pixetl.models.pydantic import LayerModel
+from gfw_pixetl.submit_job import (
+    MAX_MEMORY_PER_VCPU,
+    VCPUS,
+    estimate_resources,
+    submit_job,
+)
+from tests import minimal_layer_dict
+from tests.conftest import (
+    BUCKET,
+    GEOJSON_2_NAME,
+    GEOJSON_NAME,
+    TILE_1_PATH,
+    TILE_2_PATH,
+)
+
+os.environ["ENV"] = "test"
+
+
+class BatchClient(object):
+    """Records submitted jobs instead of sending them to AWS Batch."""
+
+    def __init__(self) -> None:
+        self.jobs: List[Dict[str, Any]] = list()
+
+    def submit_job(self, **kwargs) -> Dict[str, Any]:
+        self.jobs.append(kwargs)
+        return {"jobId": f"job-{len(self.jobs)}"}
+
+
+def _layer_def(**kwargs) -> LayerModel:
+    return LayerModel.parse_obj({**minimal_layer_dict, "no_data": 0, **kwargs})
+
+
+def test_estimate_resources():
+    small = estimate_resources(
+        layer_factory(_layer_def(source_uri=f"s3://{BUCKET}/{GEOJSON_NAME}"))
+    )
+    assert small.tiles == 2
+    assert small.source_bytes == os.path.getsize(TILE_1_PATH) + os.path.getsize(
+        TILE_2_PATH
+    )
+    assert small.vcpus == VCPUS[0]
+    assert small.memory < 63000
+    assert small.timeout < 7200
+
+    big = estimate_resources(
+        layer_factory(
+            _layer_def(
+                source_uri=f"s3://{BUCKET}/{GEOJSON_2_NAME}",
+                data_type="float32",
+                no_data=None,
+                calc="A * 2",
+            )
+        )
+    )
+    assert big.tiles > 100 * small.tiles
+    assert big.vcpus == VCPUS[-1]
+    assert big.memory <= VCPUS[-1] * MAX_MEMORY_PER_VCPU
+    assert big.memory / big.vcpus > small.memory / small.vcpus
+    assert big.timeout > 7200
+
+    # Layers without catalog cover the entire grid
+    derived = estimate_resources(layer_factory(_layer_def(grid="90/27008")))
+    assert derived.tiles == 8
+    assert derived.source_bytes == 0
+
+
+def test_submit_job():
+    batch_client = BatchClient()
+    job = {
+        "job_name": "test_job",
+        "command": ["test"],
+        "layer_def": _layer_def(source_uri=f"s3://{BUCKET}/{GEOJSON_NAME}"),
+    }
+    resources = estimate_resources(layer_factory(job["layer_def"]))
+
+    job_id = submit_job(job, batch_client=batch_client)
+    assert job_id == "job-1"
+    assert len(batch_client.jobs) == 1
+
+    submitted = batch_client.jobs[0]
+    assert submitted["jobName"] == "test_job"
+    assert submitted["dependsOn"] == list()
+    assert submitted["containerOverrides"] == {
+        "command": ["test"],
+        "vcpus": resources.vcpus,
+        "memory": resources.memory,
+    }
+    assert submitted["timeout"] == {"attemptDurationSeconds": resources.timeout}
+
+    depends_on = [{"jobId": job_id, "type": "SEQUENTIAL"}]
+    assert submit_job(job, depends_on, batch_client=batch_client) == "job-2"
+    assert batch_client.jobs[1]["dependsOn"] == depends_on
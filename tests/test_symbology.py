@@ -0,0 +1,68 @@
+import os
+
+import numpy as np
+
+from gfw_pixetl.models.pydantic import Symbology
+from gfw_pixetl.symbology import Colorizer, ordered_colormap
+
+os.environ["ENV"] = "test"
+
+GRADIENT = Symbology.parse_obj(
+    {
+        "type": "gradient",
+        "colormap": {
+            "5": {"red": 0, "green": 0, "blue": 255},
+            "1": {"red": 255, "green": 0, "blue": 0},
+        },
+    }
+)
+
+DISCRETE = Symbology.parse_obj(
+    {
+        "type": "discrete",
+        "colormap": {
+            "1": {"red": 255, "green": 0, "blue": 0},
+            "3": {"red": 0, "green": 255, "blue": 0, "alpha": 128},
+        },
+    }
+)
+
+
+def test_ordered_colormap():
+    colormap = ordered_colormap(GRADIENT, 0)
+    assert list(colormap.keys()) == [0, 1, 5]
+    assert colormap[0] == (0, 0, 0, 0)
+    assert colormap[1] == (255, 0, 0, 255)
+
+
+def test_gradient():
+    for dtype in ["uint16", "float32"]:
+        colorizer = Colorizer(GRADIENT, dtype, 0)
+        assert (colorizer.lut is not None) == (dtype == "uint16")
+
+        array = np.array([[[0, 1, 3, 5, 9]]], dtype=dtype)
+        rgba = colorizer(array)
+
+        assert rgba.shape == (4, 1, 5)
+        assert rgba.dtype == np.uint8
+        np.testing.assert_array_equal(rgba[0, 0], [0, 255, 128, 0, 0])
+        np.testing.assert_array_equal(rgba[2, 0], [0, 0, 128, 255, 255])
+        np.testing.assert_array_equal(rgba[3, 0], [0, 255, 255, 255, 255])
+
+
+def test_gradient_nan():
+    colorizer = Colorizer(GRADIENT, "float32")
+    rgba = colorizer(np.array([[np.nan, 1]], dtype="float32"))
+    np.testing.assert_array_equal(rgba[:, 0, 0], [0, 0, 0, 0])
+    np.testing.assert_array_equal(rgba[:, 0, 1], [255, 0, 0, 255])
+
+
+def test_discrete():
+    for dtype in ["int16", "float32"]:
+        colorizer = Colorizer(DISCRETE, dtype, 0)
+        array = np.array([[-1, 0, 1, 2, 3, 4]], dtype=dtype)
+        rgba = colorizer(array)
+
+        np.testing.assert_array_equal(rgba[0, 0], [0, 0, 255, 0, 0, 0])
+        np.testing.assert_array_equal(rgba[1, 0], [0, 0, 0, 0, 255, 0])
+        np.testing.assert_array_equal(rgba[3, 0], [0, 0, 255, 0, 128, 0])
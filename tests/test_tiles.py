@@ -5,14 +5,17 @@ from unittest import mock
 
 import numpy as np
 import pytest
+import rasterio
+import zarr
 from rasterio import Affine
 from rasterio.crs import CRS
 from rasterio.windows import Window
 from shapely.geometry import box
 
 from gfw_pixetl import get_module_logger, layers
+from gfw_pixetl.models.enums import DstFormat
 from gfw_pixetl.models.pydantic import LayerModel
-from gfw_pixetl.sources import RasterSource
+from gfw_pixetl.sources import DestinationIndex, RasterSource
 from gfw_pixetl.tiles import Tile
 from gfw_pixetl.utils.aws import get_s3_client
 from tests import minimal_layer_dict
@@ -75,6 +78,25 @@ def test_dst_exists():
     assert TILE.dst[TILE.default_format].exists()
 
 
+def test_dst_exists_with_index():
+    prefix = os.path.join(LAYER.prefix, TILE.default_format, "")
+    index = DestinationIndex(BUCKET, prefix)
+    assert TILE.dst[TILE.default_format].uri in index
+
+    missing_tile = Tile("50N_010E", LAYER.grid, LAYER)
+    with mock.patch("gfw_pixetl.sources.Destination.fetch_meta") as mocked_meta:
+        assert TILE.dst[TILE.default_format].exists(index)
+        assert not missing_tile.dst[missing_tile.default_format].exists(index)
+        mocked_meta.assert_not_called()
+
+        TILE.dst[TILE.default_format].exists(index, verify=True)
+        mocked_meta.assert_called_once()
+
+    # empty objects don't count as existing tiles
+    index.objects[TILE.dst[TILE.default_format].uri] = (0, "")
+    assert not TILE.dst[TILE.default_format].exists(index)
+
+
 def test_set_local_src():
 
     with pytest.raises(FileNotFoundError):
@@ -141,6 +163,24 @@ def test__dst_has_no_data():
     assert TILE.dst[TILE.default_format].has_no_data()
 
 
+def _write_rendered(tile: Tile) -> None:
+    """Write test file window by window, rendering symbology the same way
+    the transform stage does."""
+    with rasterio.open(TILE_4_PATH) as src:
+        with tile.local_dst_writer("w") as writer:
+            for _, window in src.block_windows(1):
+                writer.write(tile.render(src.read(window=window)), window)
+    tile.set_local_dst(tile.default_format)
+
+    with rasterio.open(TILE_4_PATH) as src, rasterio.open(
+        tile.local_dst[tile.default_format].uri
+    ) as dst:
+        data = src.read(window=Window(0, 0, 8, 8))
+        assert (
+            dst.read(window=Window(0, 0, 8, 8)) == tile.layer.colorizer(data)
+        ).all()
+
+
 def test_gradient_symbology():
     layer_dict = {
         "dataset": "whrc_aboveground_biomass_stock_2000",
@@ -162,23 +202,8 @@ def test_gradient_symbology():
     layer = layers.layer_factory(LayerModel.parse_obj(layer_dict))
 
     tile = Tile("01N_001E", layer.grid, layer)
+    _write_rendered(tile)
 
-    test_file = os.path.join(tile.tmp_dir, "test_gradient_color.tif")
-    shutil.copyfile(TILE_4_PATH, test_file)
-
-    # monkey patch method to point to test file
-    # then initialize local destination
-    tile.get_local_dst_uri = lambda x: test_file
-    tile.set_local_dst(tile.default_format)
-
-    assert tile.local_dst[tile.default_format].profile["count"] == 1
-
-    tile.add_symbology()
-    # sleep(60)
-    assert (
-        os.path.basename(tile.local_dst[tile.default_format].uri)
-        == f"{tile.tile_id}_colored.tif"
-    )
     assert tile.local_dst[tile.default_format].profile["count"] == 4
     assert (
         tile.local_dst[tile.default_format].blockxsize
@@ -214,23 +239,8 @@ def test_discrete_symbology():
     layer = layers.layer_factory(LayerModel.parse_obj(layer_dict))
 
     tile = Tile("01N_001E", layer.grid, layer)
+    _write_rendered(tile)
 
-    test_file = os.path.join(tile.tmp_dir, "test_gradient_color.tif")
-    shutil.copyfile(TILE_4_PATH, test_file)
-
-    # monkey patch method to point to test file
-    # then initialize local destination
-    tile.get_local_dst_uri = lambda x: test_file
-    tile.set_local_dst(tile.default_format)
-
-    assert tile.local_dst[tile.default_format].profile["count"] == 1
-
-    tile.add_symbology()
-    # sleep(60)
-    assert (
-        os.path.basename(tile.local_dst[tile.default_format].uri)
-        == f"{tile.tile_id}_colored.tif"
-    )
     assert tile.local_dst[tile.default_format].profile["count"] == 4
     assert (
         tile.local_dst[tile.default_format].blockxsize
@@ -240,3 +250,94 @@ def test_discrete_symbology():
         tile.local_dst[tile.default_format].blockysize
         == layer.dst_profile["blockysize"]
     )
+
+
+def test_create_cog():
+    layer = layers.layer_factory(
+        LayerModel.parse_obj(
+            {
+                **LAYER_DICT,
+                "grid": "1/4000",
+                "data_type": "uint8",
+                "create_cog": True,
+                "overview_resampling": "max",
+            }
+        )
+    )
+    tile = Tile("10N_010E", layer.grid, layer)
+    assert DstFormat.cog in tile.dst.keys()
+    assert DstFormat.cog not in tile.stream_formats()
+    assert tile.dst[DstFormat.cog].uri.endswith("/cog/10N_010E.tif")
+
+    # Data starts and ends at odd pixels
+    data = np.zeros((1, 4000, 4000), dtype="uint8")
+    data[:, 1001:2999, 1001:2999] = np.random.randint(1, 255, (1, 1998, 1998))
+
+    with tile.local_dst_writer("w") as writer:
+        for window in (Window(1001, 1001, 1998, 999), Window(1001, 2000, 1998, 999)):
+            writer.write(data[(slice(None),) + window.toslices()], window)
+    for dst_format in writer.formats:
+        tile.set_local_dst(dst_format)
+
+    tile.postprocessing()
+    assert not os.path.exists(tile.overview(2).uri)
+
+    uri = tile.local_dst[DstFormat.cog].uri
+    expected = data[0]
+    with rasterio.open(uri) as src:
+        assert src.tags(ns="IMAGE_STRUCTURE")["LAYOUT"] == "COG"
+        assert src.overviews(1) == [2, 4, 8]
+        assert np.array_equal(src.read(1), expected)
+    for level in range(3):
+        expected = expected.reshape(
+            expected.shape[0] // 2, 2, expected.shape[1] // 2, 2
+        ).max(axis=(1, 3))
+        with rasterio.open(uri, overview_level=level) as src:
+            assert np.array_equal(src.read(1), expected)
+
+    assert tile.metadata[DstFormat.cog]["driver"] == "GTiff"
+    shutil.rmtree(tile.work_dir)
+
+
+def test_write_zarr():
+    layer_dict = {**LAYER_DICT, "dataset": "umd_glad_alerts", "grid": "1/4000"}
+    layer = layers.layer_factory(
+        LayerModel.parse_obj({**layer_dict, "create_zarr": True})
+    )
+    tile = Tile("10N_010E", layer.grid, layer)
+    assert tile.zarr_array is not None
+    assert tile.zarr_array.shape == (720000, 1440000)
+    assert tile.zarr_array.chunks == (400, 400)
+    assert (tile.zarr_array.row_off, tile.zarr_array.col_off) == (320000, 760000)
+
+    # Two chunks with data, one of them only partially written
+    data = np.zeros((1, 4000, 4000), dtype="uint16")
+    data[:, 400:800, 0:400] = 7
+    data[:, 1200:1300, 2050:2200] = 9
+    with tile.local_dst_writer("w") as writer:
+        for window in (Window(0, 0, 4000, 1200), Window(2050, 1200, 150, 100)):
+            writer.write(data[(slice(None),) + window.toslices()], window)
+
+    dataset = zarr.open_array(tile.zarr_array.uri, mode="r")
+    assert sorted(dataset.store.listdir()) == [
+        ".zarray",
+        ".zattrs",
+        "801.1900",
+        "803.1905",
+    ]
+    assert np.array_equal(dataset[320000:324000, 760000:764000], data[0])
+    assert dataset.attrs["_ARRAY_DIMENSIONS"] == ["y", "x"]
+
+    tile.upload()
+    assert tile.status == "pending"
+    assert tile.upload_metrics[DstFormat.zarr].size > 0
+    resp = get_s3_client().list_objects_v2(
+        Bucket=BUCKET, Prefix=os.path.join(layer.prefix, "zarr/")
+    )
+    assert resp["KeyCount"] == 4
+    shutil.rmtree(tile.work_dir)
+
+    with pytest.raises(ValueError):
+        layers.layer_factory(
+            LayerModel.parse_obj({**layer_dict, "grid": "zoom_1", "create_zarr": True})
+        )
@@ -0,0 +1,62 @@
+import multiprocessing
+import os
+import time
+
+from gfw_pixetl.utils.aws import get_s3_client
+from gfw_pixetl.utils.upload import Uploader, get_uploader
+from tests.conftest import BUCKET, TILE_4_NAME, TILE_4_PATH
+
+os.environ["ENV"] = "test"
+
+
+def test_uploader():
+    uploader = Uploader(max_workers=2, max_concurrency=2, chunk_size=5 * 1024 * 1024)
+    futures = [
+        uploader.submit(TILE_4_PATH, BUCKET, f"uploads/{i}/{TILE_4_NAME}")
+        for i in range(3)
+    ]
+    metrics = [future.result() for future in futures]
+    uploader.shutdown()
+
+    for i, m in enumerate(metrics):
+        assert m.uri == f"s3://{BUCKET}/uploads/{i}/{TILE_4_NAME}"
+        assert m.size == os.path.getsize(TILE_4_PATH)
+        assert m.seconds >= 0
+        assert m.throughput >= 0
+
+    resp = get_s3_client().list_objects_v2(Bucket=BUCKET, Prefix="uploads/")
+    assert resp["KeyCount"] == 3
+    assert all(obj["Size"] == metrics[0].size for obj in resp["Contents"])
+
+
+def test_uploader_drain(monkeypatch):
+    def _slow_upload(self, local_uri, bucket, key):
+        time.sleep(0.5)
+
+    monkeypatch.setattr(Uploader, "_upload", _slow_upload)
+    uploader = Uploader(max_workers=1)
+    futures = [uploader.submit(TILE_4_PATH, BUCKET, TILE_4_NAME) for _ in range(2)]
+    uploader.drain()
+    uploader.shutdown()
+
+    assert all(future.done() for future in futures)
+
+
+def test_get_uploader():
+    assert get_uploader() is get_uploader()
+
+
+PARENT_CLIENT = None
+
+
+def _is_parent_client() -> bool:
+    return get_s3_client() is PARENT_CLIENT
+
+
+def test_get_s3_client_after_fork():
+    global PARENT_CLIENT
+    PARENT_CLIENT = get_s3_client()
+    assert _is_parent_client()
+
+    with multiprocessing.get_context("fork").Pool(1) as pool:
+        assert not pool.apply(_is_parent_client)
@@ -1,3 +1,6 @@
+import json
+from io import BytesIO
+
 from shapely.geometry import shape
 
 from gfw_pixetl.utils.upload_geometries import (
@@ -5,6 +8,7 @@ from gfw_pixetl.utils.upload_geometries import (
     _merge_feature_collections,
     _to_feature_collection,
     _union_tile_geoms,
+    _write_geojson,
 )
 from tests.conftest import BUCKET, GEOJSON_NAME
 from tests.test_pipe import _get_subset_tiles
@@ -37,6 +41,28 @@ def test__merge_feature_collection():
     assert fc != merged_fc
     assert len(merged_fc["features"]) == 3
 
+    # New features replace existing features with the same name
+    merged_fc = _merge_feature_collections(merged_fc, BUCKET, GEOJSON_NAME)
+    assert len(merged_fc["features"]) == 3
+
+
+def test__write_geojson():
+    tiles = list(_get_subset_tiles())
+    features = _geoms_uris_per_dst_format(tiles)
+    fc = _to_feature_collection(features["geotiff"])
+
+    f = BytesIO()
+    _write_geojson(fc, f)
+    written = json.loads(f.getvalue())
+
+    assert written["type"] == "FeatureCollection"
+    assert len(written["features"]) == 4
+    assert written == json.loads(json.dumps(fc))
+
+    f = BytesIO()
+    _write_geojson(_to_feature_collection([]), f)
+    assert json.loads(f.getvalue()) == {"type": "FeatureCollection", "features": []}
+
 
 def test__union_tile_geoms():
     tiles = list(_get_subset_tiles())
@@ -51,3 +77,9 @@ def test__union_tile_geoms():
         assert len(fc["features"]) == 1
         geom = shape(fc["features"][0]["geometry"])
         assert geom.bounds == (10, 9, 12, 11)
+
+        grid_fc = _union_tile_geoms(
+            _to_feature_collection(features[dst_format]), grid=tiles[0].grid
+        )
+        assert len(grid_fc["features"]) == 1
+        assert shape(grid_fc["features"][0]["geometry"]).equals(geom)
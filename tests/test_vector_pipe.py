@@ -0,0 +1,126 @@
+import os
+from typing import List
+from unittest import mock
+
+import rasterio
+from rasterio.windows import bounds
+from shapely.geometry import box
+
+from gfw_pixetl import layers
+from gfw_pixetl.connection import PgConn
+from gfw_pixetl.models.pydantic import LayerModel
+from gfw_pixetl.pipes import VectorPipe
+from gfw_pixetl.tiles import VectorSrcTile
+from gfw_pixetl.utils.memory import MemoryGovernor
+from tests import minimal_layer_dict
+
+os.environ["ENV"] = "test"
+
+LAYER_DICT = {
+    **minimal_layer_dict,
+    "source_type": "vector",
+    "no_data": 0,
+    "data_type": "uint8",
+    "grid": "10/40000",
+}
+LAYER = layers.layer_factory(LayerModel.parse_obj(LAYER_DICT))
+PIPE = VectorPipe(LAYER)
+
+
+def test_intersecting_tile_ids():
+    tiles = [
+        VectorSrcTile(tile_id, LAYER.grid, LAYER)
+        for tile_id in ["10N_010E", "20N_010E", "30N_010E"]
+    ]
+
+    with mock.patch.object(PgConn, "connect"), mock.patch(
+        "gfw_pixetl.pipes.vector_pipe.execute_values",
+        return_value=[("10N_010E",), ("30N_010E",)],
+    ) as mocked_execute_values:
+        assert PIPE.intersecting_tile_ids(tiles) == {"10N_010E", "30N_010E"}
+
+    # all tiles are checked in a single query
+    mocked_execute_values.assert_called_once()
+    rows = mocked_execute_values.call_args[0][2]
+    assert rows[0] == ("10N_010E", 10.0, 0.0, 20.0, 10.0)
+    assert len(rows) == mocked_execute_values.call_args[1]["page_size"]
+
+    for tile in tiles:
+        tile.remove_work_dir()
+
+
+def test_src_vector_intersects():
+    tile = VectorSrcTile("10N_010E", LAYER.grid, LAYER)
+    tile.intersects = True
+
+    with mock.patch.object(PgConn, "connect") as mocked_connect:
+        assert tile.src_vector_intersects()
+        mocked_connect.assert_not_called()
+
+    tile.intersects = None
+    with mock.patch.object(PgConn, "connect") as mocked_connect:
+        cursor = mocked_connect.return_value.__enter__.return_value.cursor
+        cursor.return_value.__enter__.return_value.fetchone.return_value = (1,)
+        assert tile.src_vector_intersects()
+        mocked_connect.assert_called_once()
+
+    assert tile.intersects
+    tile.remove_work_dir()
+
+
+def _rasterize(tile: VectorSrcTile, geoms) -> List[str]:
+    """Rasterize tile, fetching the given geometries in batches of one for
+    every window, returns the SQL executed for each window."""
+    with mock.patch.object(PgConn, "connect") as mocked_connect, mock.patch(
+        "gfw_pixetl.tiles.vector_src_tile.GLOBALS.rasterize_batch_size", 1
+    ):
+        cursor = mocked_connect.return_value.__enter__.return_value.cursor
+        cursor = cursor.return_value.__enter__.return_value
+
+        def execute(sql):
+            cursor.fetchmany.side_effect = [[geom] for geom in geoms] + [[]]
+
+        cursor.execute.side_effect = execute
+        tile.rasterize()
+
+    return [call.args[0] for call in cursor.execute.call_args_list]
+
+
+def test_rasterize():
+    layer_def = LayerModel.parse_obj({**LAYER_DICT, "grid": "1/4000"})
+    geoms = [
+        (box(10, 9, 10.5, 9.5).wkb, 2),
+        (box(10.25, 9.25, 11, 10).wkb, 3),
+    ]
+
+    for method, overlap in [("value", 3), ("count", 2)]:
+        for window_bytes in (10 ** 9, 1):
+            layer = layers.layer_factory(
+                LayerModel.parse_obj({**layer_def.dict(), "rasterize_method": method})
+            )
+            tile = VectorSrcTile("10N_010E", layer.grid, layer)
+
+            with mock.patch.object(
+                MemoryGovernor, "window_bytes", return_value=window_bytes
+            ):
+                windows = tile.windows()
+                sql = _rasterize(tile, geoms)
+
+            # one query per window, limited to the extent of the window
+            dst = tile.dst[tile.default_format]
+            assert len(windows) == (1 if window_bytes > 1 else 4000 // dst.blockysize)
+            assert len(sql) == len(windows)
+            for window, window_sql in zip(windows, sql):
+                left, bottom, right, top = bounds(window, dst.transform)
+                assert f"{bottom}," in window_sql and f"{top}," in window_sql
+
+            for dst_format in tile.dst.keys():
+                with rasterio.open(tile.local_dst[dst_format].uri) as src:
+                    output = src.read(1)
+
+                assert output[3999, 0] == (2 if method == "value" else 1)
+                assert output[0, 3999] == (3 if method == "value" else 1)
+                assert output[2500, 1500] == overlap
+                assert output[0, 0] == 0
+
+            tile.remove_work_dir()
@@ -0,0 +1,102 @@
+import os
+import time
+from functools import partial
+
+import pytest
+
+from gfw_pixetl.utils.upload import Uploader, get_uploader
+from gfw_pixetl.utils.worker_pool import MAX_ATTEMPTS, WorkerPool
+
+os.environ["ENV"] = "test"
+
+
+def _init():
+    return {"pid": os.getpid(), "tasks": 0}
+
+
+def _square(state, x):
+    state["tasks"] += 1
+    return x * x, state["pid"], state["tasks"]
+
+
+def _fail(state, x):
+    raise ValueError(f"Cannot process {x}")
+
+
+def _die_once(flag, state, x):
+    # Kill worker the first time task 3 is processed, ie out of memory
+    if x == 3 and not os.path.exists(flag):
+        open(flag, "w").close()
+        os._exit(1)
+    return _square(state, x)
+
+
+def _die(state, x):
+    os._exit(1)
+
+
+def test_map():
+    with WorkerPool(processes=2, func=_square, initializer=_init) as pool:
+        results = pool.map(range(10))
+
+    assert [r[0] for r in results] == [x * x for x in range(10)]
+    assert len({r[1] for r in results}) <= 2
+    # state is kept across tasks
+    assert sum(r[2] == 1 for r in results) <= 2
+    assert pool.recycled == 0
+
+
+def test_map_recycle():
+    # Every worker exceeds the memory limit and is replaced after each task
+    with WorkerPool(processes=2, func=_square, initializer=_init, max_rss=0) as pool:
+        results = pool.map(range(6))
+
+    assert [r[0] for r in results] == [x * x for x in range(6)]
+    assert len({r[1] for r in results}) == 6
+    assert all(r[2] == 1 for r in results)
+    assert pool.recycled == 6
+
+
+def test_map_failed():
+    with pytest.raises(RuntimeError):
+        with WorkerPool(processes=2, func=_fail, initializer=_init) as pool:
+            pool.map(range(4))
+
+
+def test_map_peak_rss():
+    with WorkerPool(processes=2, func=_square, initializer=_init) as pool:
+        pool.map(range(4))
+
+    assert pool.peak_rss > 0
+
+
+def test_map_respawn(tmp_path):
+    func = partial(_die_once, str(tmp_path / "died"))
+    with WorkerPool(
+        processes=2, func=func, initializer=_init, poll_interval=0.1
+    ) as pool:
+        results = pool.map(range(6))
+
+    assert [r[0] for r in results] == [x * x for x in range(6)]
+    assert pool.respawned == 1
+    assert pool.recycled == 0
+
+
+def test_map_respawn_failed():
+    with pytest.raises(RuntimeError, match=f"{MAX_ATTEMPTS} workers died"):
+        with WorkerPool(
+            processes=1, func=_die, initializer=_init, poll_interval=0.1
+        ) as pool:
+            pool.map(range(2))
+
+
+def test_start_drains_uploads(monkeypatch):
+    def _slow_upload(self, local_uri, bucket, key):
+        time.sleep(0.5)
+
+    monkeypatch.setattr(Uploader, "_upload", _slow_upload)
+    future = get_uploader().submit("tile.tif", "bucket", "tile.tif")
+
+    with WorkerPool(processes=1, func=_square, initializer=_init) as pool:
+        assert future.done()
+        pool.map(range(2))